@@ -0,0 +1,165 @@
+"""
+Comprobación y benchmark del motor de filtros de Adblock Plus (FilterEngine).
+
+1. Carga 'fixtures/easylist_excerpt.txt' como lo hace el bloqueador (BlockListPart) y
+   comprueba cada caso de 'fixtures/filter_engine_cases.txt': anclas, `^`, `@@`,
+   `$third-party`, tipos de recurso, `$domain=`/`~domain` y `$match-case`. Los casos de
+   terceros usan la Public Suffix List de 'assets/' en la raíz del repositorio.
+2. Amplía el extracto hasta el tamaño de EasyList (o usa la lista que se pase con
+   --list) y mide la compilación y las peticiones por segundo del índice por tokens
+   frente a comparar cada petición con todas las reglas.
+
+Uso: python benchmarks/bench_filter_engine.py [--list easylist.txt] [--rules N] [--requests N]
+"""
+import argparse
+import os
+import random
+import string
+import sys
+import time
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import main as wemphix  # noqa: E402
+from main import BlockListPart, PublicSuffixList, registrable_domain  # noqa: E402
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+PUBLIC_SUFFIX_LIST = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                                  "assets", "public_suffix_list.dat")
+RESOURCE_TYPES = ("script", "image", "stylesheet", "xmlhttprequest", "subdocument", "font", "media", "other")
+
+def _host(url):
+    return urlsplit(url).hostname or ""
+
+def decide(part, url, page_url, resource_type):
+    """Reproduce la consulta de `AdBlockInterceptor._block_reason` para una sola lista."""
+    host = _host(url)
+    domain_blocked = part.domain_index.contains(host)
+    return part.filter_engine.should_block(url, host, _host(page_url), resource_type, domain_blocked)
+
+def read_lines(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read().splitlines()
+
+def load_public_suffix_list():
+    """
+    Carga la Public Suffix List del repositorio en lugar de la que busca `get_asset_path`
+    junto a main.py, para que los casos de terceros no usen solo el último nivel del dominio.
+    """
+    try:
+        public_suffix_list = PublicSuffixList.load(PUBLIC_SUFFIX_LIST)
+    except OSError as e:
+        sys.exit(f"No se pudo cargar la Public Suffix List: {e}")
+    with wemphix._public_suffix_list_lock:
+        wemphix._public_suffix_list = public_suffix_list
+    registrable_domain.cache_clear()
+    if registrable_domain("news.bbc.co.uk") != "bbc.co.uk":
+        sys.exit("La Public Suffix List cargada no reconoce co.uk")
+
+def check_fixture():
+    part = BlockListPart.from_text("\n".join(read_lines(os.path.join(FIXTURES, "easylist_excerpt.txt"))))
+    failures = []
+    cases = [line.split() for line in read_lines(os.path.join(FIXTURES, "filter_engine_cases.txt"))
+             if line.strip() and not line.startswith("#")]
+    for expected, resource_type, page_url, url in cases:
+        blocked = decide(part, url, page_url, resource_type)
+        if blocked != (expected == "block"):
+            failures.append(f"  se esperaba {expected}: {resource_type} {url} (página {page_url})")
+    engine = part.filter_engine
+    print(f"Extracto: {len(part.domain_index)} dominios, {engine.rule_count} reglas de red, "
+          f"{engine.skipped_count} omitidas, {len(part.cosmetic_rules)} de ocultación; "
+          f"{len(cases) - len(failures)}/{len(cases)} casos correctos")
+    if engine.skipped_count != 3:
+        failures.append(f"  se esperaban 3 reglas omitidas, hay {engine.skipped_count}")
+    return failures
+
+def _word(rng, low=4, high=10):
+    return "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(low, high)))
+
+def synthetic_rules(count, rng):
+    """Reglas con la proporción aproximada de EasyList: sobre todo `||dominio^$opciones` y rutas."""
+    rules = []
+    for _ in range(count):
+        kind = rng.random()
+        if kind < 0.45:
+            rules.append(f"||{_word(rng)}.{rng.choice(('com', 'net', 'io'))}^$third-party")
+        elif kind < 0.75:
+            rules.append(f"/{_word(rng)}/{_word(rng, 3, 6)}_")
+        elif kind < 0.85:
+            rules.append(f"&{_word(rng, 3, 8)}=")
+        elif kind < 0.93:
+            rules.append(f"||{_word(rng)}.com/{_word(rng)}/$script,domain={_word(rng)}.com|{_word(rng)}.net")
+        else:
+            rules.append(f"@@||{_word(rng)}.com/{_word(rng)}.js$script")
+    return rules
+
+def synthetic_requests(count, rng):
+    requests = []
+    for _ in range(count):
+        page = f"https://www.{_word(rng)}.com/"
+        url = f"https://{_word(rng, 3, 5)}.{_word(rng)}.com/{_word(rng)}/{_word(rng)}.js?{_word(rng, 2, 4)}={rng.randint(0, 999)}"
+        requests.append((url, page, rng.choice(RESOURCE_TYPES)))
+    return requests
+
+def linear_scan(part, url, page_url, resource_type):
+    """Referencia sin índice: compara la petición con cada regla de bloqueo y de excepción."""
+    engine = part.filter_engine
+    host, first_party_host = _host(url), _host(page_url)
+    type_bit = engine.RESOURCE_TYPES.get(resource_type, engine.RESOURCE_TYPES["other"])
+    is_third_party = registrable_domain(host) != registrable_domain(first_party_host)
+
+    def any_match(is_exception):
+        return any(network_filter.matches(url, type_bit, is_third_party, first_party_host)
+                   for bucket in engine._filters[is_exception].values() for network_filter in bucket)
+    blocked = part.domain_index.contains(host) or any_match(False)
+    return blocked and not any_match(True)
+
+def benchmark(list_path, rule_count, request_count):
+    rng = random.Random(1)
+    lines = read_lines(list_path or os.path.join(FIXTURES, "easylist_excerpt.txt"))
+    if not list_path:
+        lines += synthetic_rules(rule_count, rng)
+    requests = synthetic_requests(request_count, rng)
+    # Las peticiones reales comparten pocos tokens con la lista; se añaden las del extracto para que haya aciertos.
+    requests += [(url, page, resource_type) for _, resource_type, page, url in
+                 (line.split() for line in read_lines(os.path.join(FIXTURES, "filter_engine_cases.txt"))
+                  if line.strip() and not line.startswith("#"))]
+
+    start = time.perf_counter()
+    part = BlockListPart.from_text("\n".join(lines))
+    compile_ms = (time.perf_counter() - start) * 1000
+    engine = part.filter_engine
+    print(f"Lista de {len(lines)} líneas: {len(part.domain_index)} dominios, {engine.rule_count} reglas de red, "
+          f"{engine.skipped_count} omitidas; compilada en {compile_ms:.0f} ms")
+
+    start = time.perf_counter()
+    blocked = sum(decide(part, url, page, resource_type) for url, page, resource_type in requests)
+    elapsed = time.perf_counter() - start
+    print(f"Índice por tokens: {len(requests) / elapsed:,.0f} peticiones/s "
+          f"({elapsed / len(requests) * 1e6:.1f} µs por petición, {blocked} bloqueadas)")
+
+    sample = requests[-50:]
+    start = time.perf_counter()
+    scanned = [linear_scan(part, url, page, resource_type) for url, page, resource_type in sample]
+    elapsed = time.perf_counter() - start
+    if scanned != [decide(part, url, page, resource_type) for url, page, resource_type in sample]:
+        sys.exit("El índice por tokens y la comparación con todas las reglas no dan el mismo resultado")
+    print(f"Todas las reglas:  {len(sample) / elapsed:,.0f} peticiones/s "
+          f"({elapsed / len(sample) * 1e6:.1f} µs por petición, muestra de {len(sample)})")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--list", help="lista completa (p. ej. easylist.txt) en lugar del extracto ampliado")
+    parser.add_argument("--rules", type=int, default=60_000, help="reglas sintéticas que se añaden al extracto")
+    parser.add_argument("--requests", type=int, default=20_000)
+    args = parser.parse_args()
+
+    load_public_suffix_list()
+    failures = check_fixture()
+    if failures:
+        print("Casos fallidos:\n" + "\n".join(failures))
+        sys.exit(1)
+    benchmark(args.list, args.rules, args.requests)
+
+if __name__ == "__main__":
+    main()
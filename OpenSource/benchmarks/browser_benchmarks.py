@@ -0,0 +1,432 @@
+"""
+Benchmarks y pruebas que necesitan una ventana real del navegador (Qt y QtWebEngine).
+
+Cada prueba abre una ventana Navegador con ajustes y carpeta de perfil temporales y un
+perfil de Chromium que no guarda nada en disco. No se restaura la sesión del usuario ni
+se leen sus ajustes, así que nunca se tocan ~/Wemphix ni sus pestañas.
+
+Uso: python benchmarks/browser_benchmarks.py <prueba> [opciones]
+
+  newtab [--runs N]  primer pintado de N pestañas nuevas seguidas (por defecto 20)
+  tab-title          coste de procesar titleChanged con 10, 100 y 500 pestañas
+  tab-widgets        widgets y memoria que añaden 100 pestañas
+  tab-list           abrir y cerrar una pestaña con 5 y con 500 abiertas
+  tab-discard        simula falta de memoria y comprueba qué pestañas se hibernan
+  page-load [--mode callback|resolver] [--runs N] [--domains N]
+                     tiempo de carga de una página con anuncios y pausas del hilo principal,
+                     solo con el interceptor (callback) o además con el PAC de la lista
+                     (resolver); sin --mode ejecuta los dos y los compara
+
+El código de salida es 0 si la prueba se ha completado (y cumplido su objetivo, si tiene).
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import string
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from PyQt6.QtCore import QSettings, Qt, QTimer, QUrl
+from PyQt6.QtWidgets import QApplication, QWidget
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import main as wemphix  # noqa: E402
+from main import InternalPageSchemeHandler, ListProxyAutoConfig, Navegador, NewTabPaintStats, TabDiscardScheduler  # noqa: E402
+
+PAGE_LOAD_MODES = ("callback", "resolver")
+# Dominios de anuncios de la página de prueba; todos los *.test se resuelven a 127.0.0.1.
+AD_DOMAINS = tuple(f"ads{n}.test" for n in range(10))
+LISTED_IMAGES = 60
+ALLOWED_IMAGES = 30
+PRECONNECTS = 20
+# Intervalo del temporizador que vigila el hilo principal; cada retraso sobre él es una pausa.
+STALL_TICK_MS = 5
+LONG_STALL_MS = 16
+
+def create_window(settings, profile_path):
+    """Ventana con los ajustes `settings` y el perfil en `profile_path`; empieza con una sola pestaña nueva."""
+    window = Navegador(settings=settings, profile_path=profile_path)
+    window.show()
+    return window
+
+def finish(exit_code=0):
+    QApplication.instance().exit(exit_code)
+
+def memory_usage_mb():
+    """Memoria residente del proceso del navegador y la de este junto con sus renderizadores."""
+    total, by_pid = TabDiscardScheduler.process_memory_mb()
+    return by_pid.get(os.getpid(), 0.0), total
+
+def run_newtab(window, args):
+    """Abre y cierra pestañas nuevas seguidas y muestra sus tiempos de primer pintado."""
+    runs = args.runs
+    print(f"INFO: Midiendo el primer pintado de {runs} pestañas nuevas...")
+    window.newtab_paint_stats = NewTabPaintStats()
+    state = {"remaining": runs, "webview": None, "done": False}
+    watchdog = QTimer(window)
+    watchdog.setSingleShot(True)
+    watchdog.setInterval(10000)
+
+    def done(error=None):
+        if state["done"]:
+            return
+        state["done"] = True
+        watchdog.stop()
+        stats = window.newtab_paint_stats
+        if error:
+            print(f"ERROR: Prueba de nueva pestaña interrumpida: {error}.")
+        print(f"INFO: Nueva pestaña: {stats.summary()}")
+        print("INFO: Objetivo de primer pintado " + ("cumplido." if stats.meets_target() else "NO cumplido."))
+        finish(0 if stats.meets_target() and not error else 1)
+
+    def next_tab():
+        if state["done"]:
+            return
+        if state["webview"] is not None:
+            record = window.tab_registry.by_webview(state["webview"])
+            if record and record.index != -1 and window.tabs.count() > 1:
+                window.cerrar_pestana(record.index)
+            state["webview"] = None
+        if state["remaining"] <= 0:
+            done()
+            return
+        state["remaining"] -= 1
+        watchdog.start()
+        state["webview"] = window.agregar_pestana()
+
+    watchdog.timeout.connect(lambda: done("una pestaña no ha informado de su primer pintado en 10 s"))
+    window.newTabPainted.connect(lambda: QTimer.singleShot(0, next_tab))
+    next_tab()
+
+def run_tab_title(window, args, tab_counts=(10, 100, 500), updates=2000):
+    """
+    Mide cuánto cuesta procesar un cambio de título (`titleChanged`) con 10, 100 y 500
+    pestañas abiertas. Con el registro de pestañas el coste debería ser el mismo en los tres casos.
+    """
+    results = []
+    for count in tab_counts:
+        while window.tabs.count() < count:
+            window.agregar_pestana("about:blank", focus=False, lazy=False)
+        webviews = [record.webview for record in window.tab_registry if record.webview and record.index != -1]
+        start = time.perf_counter()
+        for n in range(updates):
+            window._set_tab_title(webviews[n % len(webviews)], f"Título {n}")
+        elapsed_us = (time.perf_counter() - start) * 1e6 / updates
+        results.append((count, elapsed_us))
+        print(f"INFO: Cambio de título con {count} pestañas: {elapsed_us:.1f} µs por señal.")
+    print(f"INFO: De {results[0][0]} a {results[-1][0]} pestañas el coste se multiplica por {results[-1][1] / results[0][1]:.2f}.")
+    finish()
+
+def run_tab_widgets(window, args, count=100):
+    """Abre `count` pestañas y muestra cuántos widgets y cuánta memoria añaden."""
+    widgets_before = len(QApplication.allWidgets())
+    own_before, total_before = memory_usage_mb()
+    for _ in range(count):
+        window.agregar_pestana("about:blank", focus=False, lazy=False)
+    widgets = len(QApplication.allWidgets()) - widgets_before
+
+    def report():
+        own, total = memory_usage_mb()
+        shared = len(window.nav_bar.findChildren(QWidget)) + len(window.find_bar.findChildren(QWidget)) + 2
+        print(f"INFO: {count} pestañas: {widgets} widgets nuevos ({widgets / count:.1f} por pestaña); "
+              f"barras de navegación y búsqueda compartidas: {shared} widgets.")
+        print(f"INFO: {count} pestañas: +{own - own_before:.0f} MB en el proceso del navegador, "
+              f"+{total - total_before:.0f} MB contando los renderizadores ({(total - total_before) / count:.1f} MB por pestaña).")
+        finish()
+    # Se da tiempo a que arranquen los renderizadores antes de medir la memoria.
+    QTimer.singleShot(3000, report)
+
+def run_tab_list(window, args, tab_counts=(5, 500), cycles=200):
+    """
+    Mide cuánto cuesta abrir y cerrar una pestaña con 5 y con 500 abiertas. Se usan pestañas
+    provisionales para que el tiempo sea el de la ventana y la lista de pestañas verticales,
+    no el de crear webviews.
+    """
+    results = []
+    for count in tab_counts:
+        while window.tabs.count() < count:
+            window.agregar_pestana("about:blank", focus=False)
+        start = time.perf_counter()
+        for _ in range(cycles):
+            window.agregar_pestana("about:blank", focus=False)
+            window.cerrar_pestana(window.tabs.count() - 1)
+        elapsed_us = (time.perf_counter() - start) * 1e6 / cycles
+        results.append((count, elapsed_us))
+        print(f"INFO: Abrir y cerrar una pestaña con {count} abiertas: {elapsed_us:.0f} µs.")
+    print(f"INFO: De {results[0][0]} a {results[-1][0]} pestañas el coste se multiplica por {results[-1][1] / results[0][1]:.2f}.")
+    finish()
+
+def run_tab_discard(window, args, tab_count=6):
+    """
+    Simula falta de memoria y comprueba las decisiones de TabDiscardScheduler. Abre
+    `tab_count` pestañas en segundo plano, cada una inactiva desde hace más tiempo que la
+    anterior, y hace una pasada con 0 MB disponibles y otra con memoria de sobra.
+    """
+    scheduler = window.tab_discard_scheduler
+    now = time.time()
+    for i in range(tab_count):
+        webview = window.agregar_pestana("about:blank", focus=False, lazy=False)
+        window.tab_last_active_time[window._find_widget_for_webview(webview)] = now - (i + 1) * 600
+    errors = []
+
+    def check_enough_memory(decisions):
+        if decisions and scheduler.budget_mb <= 0:
+            errors.append("con memoria de sobra se han hibernado pestañas")
+        for error in errors:
+            print(f"ERROR: Prueba de hibernación: {error}.")
+        print("INFO: Prueba de hibernación " + ("superada." if not errors else "FALLIDA."))
+        finish(1 if errors else 0)
+
+    def check_low_memory(decisions):
+        if not decisions:
+            errors.append("sin memoria no se ha hibernado ninguna pestaña")
+        if any(candidate.key is window.tabs.currentWidget() for candidate, _ in decisions):
+            errors.append("se ha hibernado la pestaña activa")
+        ages = [candidate.last_active for candidate, _ in decisions]
+        if ages != sorted(ages):
+            errors.append("no se ha empezado por las pestañas que llevan más tiempo sin usarse")
+        if decisions:
+            newest_discarded = max(ages)
+            for i in range(window.tabs.count()):
+                widget = window.tabs.widget(i)
+                if widget is not window.tabs.currentWidget() and not widget.property("is_hibernated") and \
+                   window.tab_last_active_time.get(widget, time.time()) < newest_discarded:
+                    errors.append(f"la pestaña {i} es más antigua que otra hibernada y sigue activa")
+        scheduler.simulated_available_mb = 1024.0 * 1024
+        window._check_tabs_for_hibernation(on_done=check_enough_memory)
+
+    def low_memory_pass():
+        scheduler.simulated_available_mb = 0.0
+        window._check_tabs_for_hibernation(on_done=check_low_memory)
+    # Se espera a que las páginas terminen de cargar y tengan renderizador.
+    QTimer.singleShot(3000, low_memory_pass)
+
+class PageServer(ThreadingHTTPServer):
+    """Sirve la página de prueba y cuenta las conexiones aceptadas y las peticiones por host."""
+    daemon_threads = True
+
+    def __init__(self, port=0):
+        super().__init__(("127.0.0.1", port), PageHandler)
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.connections = 0
+            self.requests = {}
+
+    def process_request(self, request, client_address):
+        with self.lock:
+            self.connections += 1
+        super().process_request(request, client_address)
+
+    def listed_requests(self):
+        with self.lock:
+            return sum(count for host, count in self.requests.items() if host.endswith(AD_DOMAINS))
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+def ad_domain(n):
+    return AD_DOMAINS[n % len(AD_DOMAINS)]
+
+def page_html(port, run):
+    """Página con imágenes propias, imágenes y un script de dominios de la lista y preconnect a esos dominios."""
+    parts = ["<!DOCTYPE html><html><head><meta charset='utf-8'><title>Página de prueba</title>"]
+    parts += [f"<link rel='preconnect' href='http://pre{n}.{ad_domain(n)}:{port}'>" for n in range(PRECONNECTS)]
+    parts.append(f"<script src='http://cdn.{ad_domain(0)}:{port}/ads.js?run={run}'></script></head><body>")
+    parts += [f"<img src='http://static.site.test:{port}/img{n}.gif?run={run}'>" for n in range(ALLOWED_IMAGES)]
+    parts += [f"<img src='http://t{n}.{ad_domain(n)}:{port}/pixel.gif?run={run}'>" for n in range(LISTED_IMAGES)]
+    parts.append("</body></html>")
+    return "".join(parts).encode("utf-8")
+
+class PageHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    PIXEL = bytes.fromhex("47494638396101000100800000000000ffffff21f90401000000002c00000000010001000002024401003b")
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        host = self.headers.get("Host", "").rsplit(":", 1)[0]
+        with server.lock:
+            server.requests[host] = server.requests.get(host, 0) + 1
+        if self.path.startswith("/page"):
+            body, content_type = page_html(server.server_port, self.path.rpartition("=")[2]), "text/html; charset=utf-8"
+        elif self.path.startswith("/ads.js"):
+            body, content_type = b"window.adsLoaded = true;", "application/javascript"
+        else:
+            body, content_type = self.PIXEL, "image/gif"
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(body)
+
+def prepare_page_load(args, settings, profile_path):
+    """Escribe la lista de bloqueo del perfil temporal y devuelve los argumentos de Chromium del modo elegido."""
+    rng = random.Random(1)
+    with open(os.path.join(profile_path, "adblock_list.txt"), "w", encoding="utf-8") as f:
+        f.writelines(f"||{domain}^\n" for domain in AD_DOMAINS)
+        for _ in range(args.domains):
+            f.write("".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(5, 12))) + ".com\n")
+    arguments = ["--host-resolver-rules=MAP *.test 127.0.0.1"]
+    if args.mode == "resolver":
+        settings.setValue("hostResolverBlocking", True)
+        if not (pac_argument := ListProxyAutoConfig.command_line_argument(settings, profile_path)):
+            sys.exit("ERROR: No se ha podido generar el PAC de la lista de bloqueo.")
+        arguments.append(pac_argument)
+    return arguments
+
+def run_page_load(window, args):
+    """
+    Carga `runs` veces la página de prueba (más una de calentamiento que no cuenta) y mide
+    el tiempo hasta `loadFinished` y los retrasos de un temporizador de STALL_TICK_MS en el
+    hilo principal mientras carga, que es donde se notan las esperas por el GIL.
+    """
+    server = PageServer().start() if args.port is None else None
+    port = server.server_port if server else args.port
+    webview = window.agregar_pestana("about:blank", lazy=False)
+    loads, gaps, errors = [], [], []
+    state = {"run": 0, "start": None, "last_tick": 0.0}
+    monitor = QTimer(window)
+    monitor.setTimerType(Qt.TimerType.PreciseTimer)
+    monitor.setInterval(STALL_TICK_MS)
+
+    def tick():
+        now = time.perf_counter()
+        if state["run"] > 1:
+            gaps.append((now - state["last_tick"]) * 1000)
+        state["last_tick"] = now
+
+    def start_load():
+        if state["run"] > args.runs:
+            report()
+            return
+        state["run"] += 1
+        if state["run"] == 2:
+            window.ad_blocker.stats.reset()
+        state["start"] = state["last_tick"] = time.perf_counter()
+        monitor.start()
+        webview.load(QUrl(f"http://www.site.test:{port}/page?run={state['run']}"))
+
+    def on_load_finished(ok):
+        if state["start"] is None:
+            return
+        monitor.stop()
+        tick()
+        if state["run"] > 1:
+            loads.append((time.perf_counter() - state["start"]) * 1000)
+        state["start"] = None
+        if not ok:
+            errors.append(f"la carga {state['run']} ha fallado")
+        QTimer.singleShot(200, start_load)
+
+    def report():
+        stats = window.ad_blocker.stats
+        long_stalls = [gap - STALL_TICK_MS for gap in gaps if gap > LONG_STALL_MS]
+        result = {
+            "mode": args.mode,
+            "load_median_ms": statistics.median(loads),
+            "load_p95_ms": sorted(loads)[max(0, int(len(loads) * 0.95) - 1)],
+            "max_stall_ms": max(gaps, default=STALL_TICK_MS) - STALL_TICK_MS,
+            "long_stalls": len(long_stalls),
+            "long_stall_ms": sum(long_stalls),
+            "interceptor_requests": stats.seen,
+            "interceptor_blocked": stats.blocked,
+            "interceptor_mean_us": stats.mean_latency_us(),
+        }
+        print(f"INFO: {args.mode}: carga mediana {result['load_median_ms']:.0f} ms (p95 {result['load_p95_ms']:.0f} ms) en {len(loads)} cargas.")
+        print(f"INFO: {args.mode}: pausa máxima del hilo principal {result['max_stall_ms']:.1f} ms; "
+              f"{len(long_stalls)} pausas de más de {LONG_STALL_MS} ms ({result['long_stall_ms']:.0f} ms en total).")
+        print(f"INFO: {args.mode}: el interceptor ha visto {stats.seen} peticiones, ha bloqueado {stats.blocked}, "
+              f"{result['interceptor_mean_us']:.1f} µs de media por petición.")
+        if server:
+            print(f"INFO: {args.mode}: el servidor ha aceptado {server.connections} conexiones y "
+                  f"{server.listed_requests()} peticiones a dominios de la lista.")
+            server.shutdown()
+        for error in errors:
+            print(f"ERROR: Prueba de carga: {error}.")
+        print("RESULT " + json.dumps(result))
+        finish(1 if errors else 0)
+
+    monitor.timeout.connect(tick)
+    webview.loadFinished.connect(on_load_finished)
+    # Se deja terminar la carga de about:blank antes de empezar.
+    QTimer.singleShot(500, start_load)
+
+def compare_page_load(args, qt_arguments):
+    """Ejecuta page-load en un proceso por modo contra un mismo servidor y compara los resultados."""
+    server = PageServer().start()
+    results = {}
+    for mode in PAGE_LOAD_MODES:
+        server.reset()
+        command = [sys.executable, os.path.abspath(__file__), "page-load", "--mode", mode, "--port", str(server.server_port),
+                   "--runs", str(args.runs), "--domains", str(args.domains), *qt_arguments]
+        process = subprocess.run(command, stdout=subprocess.PIPE, text=True)
+        for line in process.stdout.splitlines():
+            if line.startswith("RESULT "):
+                results[mode] = dict(json.loads(line[len("RESULT "):]), connections=server.connections,
+                                     listed_requests=server.listed_requests())
+            else:
+                print(line)
+        if process.returncode != 0 or mode not in results:
+            print(f"ERROR: La prueba de carga en modo {mode} ha terminado con el código {process.returncode}.")
+            return 1
+    server.shutdown()
+    print(f"{'modo':<10} {'carga (mediana/p95)':>20} {'pausa máx':>10} {'pausas >16 ms':>14} "
+          f"{'interceptor':>12} {'conexiones':>11} {'a la lista':>11}")
+    for mode, result in results.items():
+        print(f"{mode:<10} {result['load_median_ms']:>10.0f}/{result['load_p95_ms']:<6.0f} ms {result['max_stall_ms']:>7.1f} ms "
+              f"{result['long_stalls']:>5} ({result['long_stall_ms']:.0f} ms) {result['interceptor_mean_us']:>8.1f} µs "
+              f"{result['connections']:>11} {result['listed_requests']:>11}")
+    return 0
+
+TESTS = {
+    "newtab": run_newtab,
+    "tab-title": run_tab_title,
+    "tab-widgets": run_tab_widgets,
+    "tab-list": run_tab_list,
+    "tab-discard": run_tab_discard,
+    "page-load": run_page_load,
+}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("test", choices=sorted(TESTS))
+    parser.add_argument("--runs", type=int, default=20, help="pestañas nuevas (newtab) o cargas de la página (page-load)")
+    parser.add_argument("--mode", choices=PAGE_LOAD_MODES, help="page-load: mide solo este modo en lugar de comparar los dos")
+    parser.add_argument("--port", type=int, help="page-load: puerto de un servidor de la página de prueba ya en marcha")
+    parser.add_argument("--domains", type=int, default=100_000, help="page-load: dominios de relleno de la lista de bloqueo")
+    args, qt_arguments = parser.parse_known_args()
+    if args.test == "page-load" and args.mode is None:
+        sys.exit(compare_page_load(args, qt_arguments))
+
+    os.environ.setdefault("QTWEBENGINE_CHROMIUM_FLAGS", wemphix.CHROMIUM_FLAGS)
+    InternalPageSchemeHandler.register_scheme()
+    with tempfile.TemporaryDirectory(prefix="wemphix-benchmark-", ignore_cleanup_errors=True) as profile_dir:
+        settings = QSettings(os.path.join(profile_dir, "settings.ini"), QSettings.Format.IniFormat)
+        settings.setValue("homepage", Navegador.NEW_TAB_URL)
+        profile_path = os.path.join(profile_dir, "Wemphix")
+        os.makedirs(profile_path)
+        if args.test == "page-load":
+            # Chromium toma las reglas de resolución y el PAC de los argumentos de QApplication.
+            qt_arguments += prepare_page_load(args, settings, profile_path)
+        app = QApplication([sys.argv[0], *qt_arguments])
+        window = create_window(settings, profile_path)
+        QTimer.singleShot(1000, lambda: TESTS[args.test](window, args))
+        exit_code = app.exec()
+        window.close()
+    sys.exit(exit_code)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+Comprueba BlocklistSubscriptions contra un servidor HTTP local que imita a los de las listas.
+
+El servidor responde con ETag y Last-Modified, devuelve 304 a las peticiones
+condicionales, comprime con gzip si se pide y puede enviar respuestas truncadas (gzip
+cortado o menos bytes de los que anuncia Content-Length). El script comprueba que:
+
+- la primera descarga guarda las listas sin comentarios y las une en el archivo final;
+- la segunda envía If-None-Match / If-Modified-Since, recibe 304 y no reescribe nada;
+- una lista que cambia se vuelve a descargar;
+- una respuesta truncada falla sin tocar la copia anterior ni dejar temporales;
+- si fallan todas las listas de una categoría, `update_category` lanza la excepción;
+- dos ventanas actualizando a la vez el mismo perfil no se pisan los temporales.
+
+Uso: python benchmarks/check_subscriptions.py
+"""
+import gzip
+import os
+import sys
+import tempfile
+import threading
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from main import BlocklistSubscriptions  # noqa: E402
+
+LAST_MODIFIED = formatdate(0, usegmt=True)
+
+class ListServer(ThreadingHTTPServer):
+    """Guarda el contenido de cada lista y las cabeceras condicionales que ha recibido."""
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), ListHandler)
+        self.lists = {
+            "/plain.txt": "! Lista de prueba\n# comentario\nads.example\ntracker.example\n",
+            "/gzip.txt": "[Adblock Plus 2.0]\n||banners.example^\n##.ad-banner\n" * 2000,
+            "/truncated-gzip.txt": "||cut.example^\n" * 5000,
+            "/short.txt": "short.example\n" * 100,
+        }
+        self.versions = dict.fromkeys(self.lists, 1)
+        self.conditional_requests = []
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.server_port}{path}"
+
+class ListHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        if self.path not in server.lists:
+            self.send_error(404)
+            return
+        etag = f'"{self.path}-v{server.versions[self.path]}"'
+        if self.headers.get("If-None-Match") or self.headers.get("If-Modified-Since"):
+            server.conditional_requests.append((self.path, self.headers.get("If-None-Match"),
+                                                self.headers.get("If-Modified-Since")))
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        body = server.lists[self.path].encode("utf-8")
+        gzip_requested = "gzip" in self.headers.get("Accept-Encoding", "")
+        if self.path != "/plain.txt" and gzip_requested:
+            body = gzip.compress(body)
+        if self.path == "/truncated-gzip.txt":
+            # Content-Length coincide con lo enviado, pero el flujo gzip queda incompleto.
+            body = body[:len(body) // 2]
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", LAST_MODIFIED)
+        if self.path != "/plain.txt" and gzip_requested:
+            self.send_header("Content-Encoding", "gzip")
+        if self.path == "/short.txt":
+            # Anuncia el cuerpo completo y cierra la conexión a mitad.
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.wfile.write(body[:len(body) // 2])
+            self.close_connection = True
+            return
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+def read(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+def temp_files(directory):
+    return [name for name in os.listdir(directory) if name.endswith(".tmp")]
+
+def check(condition, message):
+    print(f"{'OK ' if condition else 'FALLO'} {message}")
+    return condition
+
+def main():
+    server = ListServer()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    results = []
+    with tempfile.TemporaryDirectory() as profile:
+        output = os.path.join(profile, "adblock_list.txt")
+        subscriptions = BlocklistSubscriptions(profile)
+        subscriptions.set_urls("adblock", [server.url("/plain.txt"), server.url("/gzip.txt")])
+
+        first = subscriptions.update_category("adblock", output)
+        merged = read(output)
+        results.append(check(first["updated"] == 2 and first["changed"], f"primera descarga: {first}"))
+        results.append(check("ads.example" in merged and "! Lista" not in merged and "# comentario" not in merged
+                             and merged.count("||banners.example^") == 2000, "lista unida sin comentarios, gzip descomprimido"))
+
+        second = subscriptions.update_category("adblock", output)
+        sent = {path: (etag, since) for path, etag, since in server.conditional_requests}
+        results.append(check(second["not_modified"] == 2 and not second["changed"], f"segunda descarga con 304: {second}"))
+        results.append(check(sent.get("/plain.txt", (None, None))[0] == '"/plain.txt-v1"'
+                             and sent["/plain.txt"][1] == LAST_MODIFIED, "envía If-None-Match e If-Modified-Since"))
+        saved = BlocklistSubscriptions(profile).categories["adblock"]["lists"]
+        results.append(check(all(sub["etag"] and sub["last_modified"] for sub in saved),
+                             "ETag y Last-Modified guardados en subscriptions.json"))
+
+        server.lists["/plain.txt"] += "new.example\n"
+        server.versions["/plain.txt"] += 1
+        third = subscriptions.update_category("adblock", output)
+        results.append(check(third["updated"] == 1 and third["not_modified"] == 1 and "new.example" in read(output),
+                             f"lista modificada se vuelve a descargar: {third}"))
+
+        before = read(output)
+        subscriptions.set_urls("adblock", subscriptions.urls("adblock") +
+                               [server.url("/truncated-gzip.txt"), server.url("/short.txt")])
+        fourth = subscriptions.update_category("adblock", output)
+        failed = {url.rsplit("/", 1)[1]: type(error).__name__ for url, error in fourth["failed"]}
+        results.append(check(set(failed) == {"truncated-gzip.txt", "short.txt"}, f"respuestas truncadas rechazadas: {failed}"))
+        results.append(check(read(output) == before and not temp_files(subscriptions.lists_dir) and not temp_files(profile),
+                             "la lista anterior sigue intacta y no quedan temporales"))
+
+        subscriptions.set_urls("adblock", [server.url("/short.txt")])
+        try:
+            subscriptions.update_category("adblock", output)
+            results.append(check(False, "una categoría sin ninguna lista válida debería lanzar la excepción"))
+        except Exception as e:
+            results.append(check(True, f"categoría sin listas válidas lanza {type(e).__name__}"))
+
+        windows = [BlocklistSubscriptions(profile) for _ in range(2)]
+        for window in windows:
+            window.set_urls("adblock", [server.url("/gzip.txt")])
+            window.categories["adblock"]["lists"][0]["etag"] = ""
+        errors = []
+
+        def update(window):
+            try:
+                for _ in range(10):
+                    window.update_category("adblock", output)
+                    window.categories["adblock"]["lists"][0]["etag"] = ""
+            except Exception as e:
+                errors.append(e)
+        threads = [threading.Thread(target=update, args=(window,)) for window in windows]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        results.append(check(not errors and read(output).count("||banners.example^") == 2000 and not temp_files(profile),
+                             f"dos ventanas a la vez: {errors or 'sin errores'}"))
+    server.shutdown()
+    if not all(results):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -9,21 +9,23 @@ import traceback
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QTabWidget, QWidget, QFormLayout, QComboBox, QLabel, QCompleter, QGroupBox,
     QVBoxLayout, QLineEdit, QPushButton, QHBoxLayout, QProgressBar, QFileDialog, QDialog, QTextEdit, QDialogButtonBox, QStackedWidget,
-    QMessageBox, QMenu, QDockWidget, QListWidget, QListWidgetItem, QButtonGroup, QFrame, QCheckBox, QGridLayout, QTableView,
+    QMessageBox, QMenu, QDockWidget, QListWidget, QListWidgetItem, QButtonGroup, QFrame, QCheckBox, QGridLayout,
     QColorDialog, QStyle, QTableWidget, QTableWidgetItem, QHeaderView, QFileIconProvider, QStatusBar,
-    QAbstractItemView
+    QListView, QStyledItemDelegate, QStyleOptionViewItem, QInputDialog
 )
 from PyQt6.QtNetwork import QLocalServer, QLocalSocket
 from PyQt6.QtWebEngineWidgets import QWebEngineView
 from PyQt6.QtWebEngineCore import (
     QWebEngineProfile, QWebEnginePage, QWebEngineSettings, QWebEngineDownloadRequest, QWebEngineFullScreenRequest,
-    QWebEngineUrlRequestInterceptor, QWebEngineScript
+    QWebEngineUrlRequestInterceptor, QWebEngineUrlRequestInfo, QWebEngineScript, QWebEngineLoadingInfo,
+    QWebEngineUrlScheme, QWebEngineUrlSchemeHandler, QWebEngineUrlRequestJob
 )
 from PyQt6.QtWebChannel import QWebChannel
 from PyQt6.QtCore import (
     QUrl, Qt, qVersion, QSettings, QObject, pyqtSlot, QVariant, pyqtSignal, QPoint,
-    QStringListModel, QTimer, QEvent, QFileInfo, QSize, QRunnable, QThreadPool, QAbstractTableModel, QSortFilterProxyModel, QModelIndex,
-    QTranslator, QLocale, QLibraryInfo, QSignalBlocker
+    QStringListModel, QTimer, QEvent, QFileInfo, QSize, QRunnable, QThreadPool,
+    QTranslator, QLocale, QLibraryInfo, QSignalBlocker, QBuffer, QIODevice, QByteArray,
+    QAbstractListModel, QModelIndex
 )
 from PyQt6.QtGui import QIcon, QDesktopServices, QActionGroup, QShortcut, QKeySequence, QPixmap, QPalette, QColor, QAction, QImage, QPainter, QDragEnterEvent, QDropEvent, QMouseEvent
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
@@ -31,16 +33,31 @@ from cryptography.hazmat.primitives import hashes
 from cryptography.fernet import Fernet, InvalidToken
 
 import itertools
+import functools
 import json
+import html
 import urllib.request
+import urllib.error
+import http.client
+import codecs
 import base64
-from urllib.parse import urlparse, quote_plus
+from urllib.parse import urlparse, quote_plus, urlsplit, urlunsplit, parse_qsl, unquote_plus, urlencode
 import uuid
 import fnmatch
 import zipfile
 import string
+import re
 import time
 import tempfile
+import threading
+from collections import OrderedDict, deque
+import mmap
+import struct
+import zlib
+import hashlib
+import heapq
+from bisect import bisect_left
+from array import array
 import psutil # type: ignore
 from datetime import timedelta
 
@@ -148,54 +165,2617 @@ class UrlBar(QLineEdit):
         self.setAlignment(Qt.AlignmentFlag.AlignRight)
         super().focusOutEvent(event)
 
+class DomainSuffixIndex:
+    """
+    Índice precompilado de dominios que responde si un host o cualquiera de sus
+    dominios padre está en la lista.
+
+    Se construye una sola vez al cargar la lista: normaliza las entradas y descarta
+    las que ya quedan cubiertas por un dominio padre. La búsqueda recorre los sufijos
+    del host con `str.find`, sin crear listas ni reconstruir cadenas con `join`; solo
+    corta una cadena por dominio padre, porque un `frozenset` no se puede consultar sin
+    ella (ver benchmarks/bench_suffix_index.py).
+    """
+    __slots__ = ("_domains",)
+
+    def __init__(self, domains=()):
+        normalized = {d for d in (self.normalize(domain) for domain in domains) if d}
+        # Un subdominio cuyo padre ya está en la lista nunca cambia el resultado.
+        self._domains = frozenset(d for d in normalized if not self._has_listed_parent(d, normalized))
+
+    @staticmethod
+    def normalize(domain: str) -> str:
+        domain = domain.strip().lower().rstrip('.')
+        if domain.startswith("*."):
+            domain = domain[2:]
+        return domain
+
+    @staticmethod
+    def _has_listed_parent(domain: str, domains) -> bool:
+        dot = domain.find('.')
+        while dot != -1:
+            if domain[dot + 1:] in domains:
+                return True
+            dot = domain.find('.', dot + 1)
+        return False
+
+    def __len__(self):
+        return len(self._domains)
+
+    def __iter__(self):
+        return iter(self._domains)
+
+    def contains(self, host: str) -> bool:
+        """Comprueba si `host` (ya en minúsculas, como lo devuelve QUrl) o un dominio padre está en el índice."""
+        domains = self._domains
+        if host in domains:
+            return True
+        dot = host.find('.')
+        while dot != -1:
+            if host[dot + 1:] in domains:
+                return True
+            dot = host.find('.', dot + 1)
+        return False
+
+class PublicSuffixList:
+    """
+    Public Suffix List compilada en tres conjuntos (reglas, comodines y excepciones) para
+    calcular el dominio registrable (eTLD+1) de un host.
+
+    La búsqueda recorre los sufijos del host del más largo al más corto, así que la primera
+    regla que coincide es la más larga, como pide el algoritmo de la PSL. Las reglas con
+    caracteres Unicode se guardan en punycode, que es como llegan los hosts desde QUrl.
+    """
+    __slots__ = ("_rules", "_wildcards", "_exceptions")
+
+    def __init__(self, lines=()):
+        rules, wildcards, exceptions = set(), set(), set()
+        for line in lines:
+            line = line.strip()
+            if not line or line.startswith("//"):
+                continue
+            rule, target = line.split()[0].lower(), rules
+            if rule.startswith("!"):
+                rule, target = rule[1:], exceptions
+            elif rule.startswith("*."):
+                rule, target = rule[2:], wildcards
+            target.add(self._to_ascii(rule))
+        self._rules, self._wildcards, self._exceptions = frozenset(rules), frozenset(wildcards), frozenset(exceptions)
+
+    @staticmethod
+    def _to_ascii(domain: str) -> str:
+        if domain.isascii():
+            return domain
+        try:
+            return domain.encode("idna").decode("ascii")
+        except UnicodeError:
+            return domain
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(f)
+
+    def __len__(self):
+        return len(self._rules) + len(self._wildcards) + len(self._exceptions)
+
+    def registrable_domain(self, host: str) -> str:
+        """
+        Devuelve el dominio registrable de `host` (p. ej. 'news.bbc.co.uk' -> 'bbc.co.uk').
+        Las direcciones IP y los hosts que ya son un sufijo público se devuelven tal cual.
+        """
+        host = host.rstrip('.').lower()
+        if not host or ':' in host or host.replace('.', '').isdigit():
+            return host
+        rules, wildcards, exceptions = self._rules, self._wildcards, self._exceptions
+        start, label_before = 0, -1
+        while True:
+            suffix = host[start:]
+            if suffix in exceptions:
+                return suffix
+            dot = suffix.find('.')
+            # Sin regla que coincida, la regla por defecto "*" hace público el último nivel.
+            if dot == -1 or suffix in rules or suffix[dot + 1:] in wildcards:
+                return host[label_before:] if label_before >= 0 else host
+            label_before, start = start, start + dot + 1
+
+_public_suffix_list = None
+_public_suffix_list_lock = threading.Lock()
+
+def get_public_suffix_list() -> PublicSuffixList:
+    """Carga la Public Suffix List incluida en 'assets' la primera vez que se necesita."""
+    global _public_suffix_list
+    with _public_suffix_list_lock:
+        if _public_suffix_list is None:
+            try:
+                _public_suffix_list = PublicSuffixList.load(get_asset_path("public_suffix_list.dat"))
+            except OSError as e:
+                print(f"ADVERTENCIA: No se pudo cargar la Public Suffix List: {e}. Se usará solo el último nivel del dominio.")
+                _public_suffix_list = PublicSuffixList()
+        return _public_suffix_list
+
+@functools.lru_cache(maxsize=8192)
+def registrable_domain(host: str) -> str:
+    """Devuelve el dominio registrable (eTLD+1) de un host según la Public Suffix List. Memorizado por host."""
+    return get_public_suffix_list().registrable_domain(host)
+
+class _NetworkFilter:
+    """Regla de red de Adblock Plus ya analizada. La expresión regular se compila la primera vez que se usa."""
+    __slots__ = ("pattern", "_regex", "match_case", "is_exception", "third_party",
+                 "type_mask", "include_domains", "exclude_domains")
+
+    def __init__(self, pattern, is_exception, match_case, third_party, type_mask, include_domains, exclude_domains):
+        self.pattern = pattern
+        self._regex = None
+        self.is_exception = is_exception
+        self.match_case = match_case
+        self.third_party = third_party
+        self.type_mask = type_mask
+        self.include_domains = include_domains
+        self.exclude_domains = exclude_domains
+
+    @property
+    def regex(self):
+        if self._regex is None:
+            self._regex = re.compile(FilterEngine.pattern_to_regex(self.pattern), 0 if self.match_case else re.IGNORECASE)
+        return self._regex
+
+    def matches(self, url, type_bit, is_third_party, first_party_host):
+        if not self.type_mask & type_bit:
+            return False
+        if self.third_party is not None and self.third_party != is_third_party:
+            return False
+        if self.include_domains or self.exclude_domains:
+            if not FilterEngine.domain_option_matches(first_party_host, self.include_domains, self.exclude_domains):
+                return False
+        return self.regex.search(url) is not None
+
+    def exempted_host(self):
+        """Host de una excepción `@@||host^` sin ruta ni opciones, que permite todo el host; si no, None."""
+        if not self.is_exception or self.third_party is not None or self.include_domains or self.exclude_domains \
+           or self.type_mask != FilterEngine.DEFAULT_TYPE_MASK or not self.pattern.startswith("||"):
+            return None
+        host = self.pattern[2:].removesuffix("^")
+        return host.lower() if FilterEngine._HOSTNAME_RE.match(host) else None
+
+class FilterEngine:
+    """
+    Motor de filtros de red con sintaxis de Adblock Plus / EasyList.
+
+    Soporta anclas (`||`, `|`), separadores (`^`), comodines (`*`), excepciones (`@@`) y las
+    opciones `$third-party`, `$~third-party`, tipos de recurso (`$script`, `$image`, ...),
+    `$domain=` y `$match-case`. Las reglas con opciones que no se pueden aplicar aquí
+    (`$redirect`, `$csp`, `$popup`...) y las expresiones regulares se omiten.
+
+    Cada regla se indexa por el token más raro de su patrón, así que una petición solo se
+    compara con las reglas que comparten algún token con su URL.
+    """
+    RESOURCE_TYPES = {
+        "script": 1 << 0, "image": 1 << 1, "stylesheet": 1 << 2, "object": 1 << 3,
+        "xmlhttprequest": 1 << 4, "subdocument": 1 << 5, "font": 1 << 6, "media": 1 << 7,
+        "websocket": 1 << 8, "ping": 1 << 9, "other": 1 << 10, "document": 1 << 11,
+    }
+    TYPE_ALIASES = {"xhr": "xmlhttprequest", "css": "stylesheet", "frame": "subdocument", "object-subrequest": "object"}
+    # Como en ABP, las reglas sin tipo explícito no se aplican al documento principal.
+    DEFAULT_TYPE_MASK = (1 << 11) - 1
+    IGNORED_OPTIONS = frozenset({"important", "all", "collapse", "~collapse"})
+    _TOKEN_RE = re.compile(r"[a-z0-9%]{2,}")
+    _HOSTNAME_RE = re.compile(r"^(?:\*\.)?(?:[a-z0-9_](?:[a-z0-9_-]*[a-z0-9])?\.)+[a-z0-9-]*[a-z0-9]\.?$", re.IGNORECASE)
+
+    def __init__(self, rules=()):
+        self._filters = {False: {}, True: {}}
+        self._token_counts = {}
+        self.rule_count = 0
+        self.skipped_count = 0
+        for rule in rules:
+            self.add_rule(rule)
+
+    def __bool__(self):
+        return self.rule_count > 0
+
+    @staticmethod
+    def is_network_rule(line: str) -> bool:
+        """Descarta comentarios, cabeceras y reglas cosméticas."""
+        if not line or line[0] in "![" or line.startswith('#'):
+            return False
+        return not any(marker in line for marker in ("##", "#@#", "#?#", "#$#"))
+
+    @staticmethod
+    def domain_from_rule(line: str):
+        """Si la línea es un dominio suelto o una regla `||dominio^` sin opciones, devuelve el dominio."""
+        domain = line[2:-1] if line.startswith("||") and line.endswith("^") else line
+        return domain if FilterEngine._HOSTNAME_RE.match(domain) else None
+
+    @staticmethod
+    def pattern_to_regex(pattern: str) -> str:
+        prefix, suffix = "", ""
+        if pattern.startswith("||"):
+            prefix, pattern = r"^[a-z][a-z0-9+.-]*://(?:[^/?#]*\.)?", pattern[2:]
+        elif pattern.startswith("|"):
+            prefix, pattern = "^", pattern[1:]
+        else:
+            pattern = pattern.lstrip("*")
+        if pattern.endswith("|"):
+            suffix, pattern = "$", pattern[:-1]
+        else:
+            pattern = pattern.rstrip("*")
+        body = re.escape(pattern).replace(r"\*", ".*").replace(r"\^", r"(?:[^\w.%-]|$)")
+        return prefix + body + suffix
+
+    @staticmethod
+    def domain_option_matches(host, include_domains, exclude_domains) -> bool:
+        """Aplica `$domain=`: el host (o un dominio padre) debe estar incluido y no excluido."""
+        included = not include_domains
+        candidate = host
+        while candidate:
+            if candidate in exclude_domains:
+                return False
+            if not included and candidate in include_domains:
+                included = True
+            dot = candidate.find('.')
+            candidate = candidate[dot + 1:] if dot != -1 else ""
+        return included
+
+    def _parse_options(self, options_text):
+        third_party, match_case = None, False
+        include_mask, exclude_mask = 0, 0
+        include_domains, exclude_domains = set(), set()
+        for option in options_text.split(","):
+            option = option.strip().lower()
+            negated = option.startswith("~")
+            name = option[1:] if negated else option
+            name = self.TYPE_ALIASES.get(name, name)
+            if name in ("third-party", "3p"):
+                third_party = not negated
+            elif name in ("first-party", "1p"):
+                third_party = negated
+            elif name in self.RESOURCE_TYPES:
+                if negated:
+                    exclude_mask |= self.RESOURCE_TYPES[name]
+                else:
+                    include_mask |= self.RESOURCE_TYPES[name]
+            elif name.startswith("domain="):
+                for domain in option[len("domain="):].split("|"):
+                    domain = domain.strip()
+                    if domain.startswith("~"):
+                        exclude_domains.add(domain[1:])
+                    elif domain:
+                        include_domains.add(domain)
+            elif name == "match-case":
+                match_case = True
+            elif option not in self.IGNORED_OPTIONS:
+                return None
+        type_mask = (include_mask or self.DEFAULT_TYPE_MASK) & ~exclude_mask
+        if not type_mask:
+            return None
+        return third_party, match_case, type_mask, frozenset(include_domains), frozenset(exclude_domains)
+
+    def _pick_token(self, pattern: str) -> str:
+        """Elige el token del patrón con menos reglas asociadas; '' si no tiene ninguno utilizable."""
+        body = pattern.lower()
+        anchored_start = body.startswith("|")
+        body = body.lstrip("|")
+        anchored_end = body.endswith("|")
+        body = body.rstrip("|")
+        counts = self._token_counts
+        best, best_key = "", None
+        # Solo sirven tokens completos: los que no pueden continuar en la URL por ninguno de los dos lados.
+        for match in self._TOKEN_RE.finditer(body):
+            start, end = match.span()
+            if (body[start - 1] == "*") if start else not anchored_start:
+                continue
+            if (body[end] == "*") if end < len(body) else not anchored_end:
+                continue
+            key = (counts.get(match.group(), 0), -(end - start))
+            if best_key is None or key < best_key:
+                best, best_key = match.group(), key
+        return best
+
+    def add_rule(self, line: str) -> bool:
+        """Analiza una regla de red y la indexa. Devuelve False si la regla no está soportada."""
+        line = line.strip()
+        if not self.is_network_rule(line):
+            return False
+        is_exception = line.startswith("@@")
+        if is_exception:
+            line = line[2:]
+        pattern, options = line, None
+        dollar = line.rfind("$")
+        if dollar != -1 and not line.endswith("/"):
+            pattern, options = line[:dollar], line[dollar + 1:]
+        if len(pattern) > 1 and pattern.startswith("/") and pattern.endswith("/"):
+            self.skipped_count += 1
+            return False
+        parsed = self._parse_options(options) if options else (None, False, self.DEFAULT_TYPE_MASK, frozenset(), frozenset())
+        if parsed is None:
+            self.skipped_count += 1
+            return False
+        third_party, match_case, type_mask, include_domains, exclude_domains = parsed
+        network_filter = _NetworkFilter(pattern, is_exception, match_case, third_party,
+                                        type_mask, include_domains, exclude_domains)
+        token = self._pick_token(pattern)
+        self._filters[is_exception].setdefault(token, []).append(network_filter)
+        self._token_counts[token] = self._token_counts.get(token, 0) + 1
+        self.rule_count += 1
+        return True
+
+    def _find_match(self, is_exception, url, tokens, type_bit, is_third_party, first_party_host):
+        buckets = self._filters[is_exception]
+        if not buckets:
+            return None
+        for token in tokens:
+            for network_filter in buckets.get(token, ()):
+                if network_filter.matches(url, type_bit, is_third_party, first_party_host):
+                    return network_filter
+        return None
+
+    def _request_context(self, url, host, first_party_host, resource_type):
+        """(tokens de la URL, bit del tipo de recurso, si es de terceros) para comparar una petición con las reglas."""
+        type_bit = self.RESOURCE_TYPES.get(resource_type, self.RESOURCE_TYPES["other"])
+        is_third_party = bool(first_party_host) and registrable_domain(host) != registrable_domain(first_party_host)
+        tokens = set(self._TOKEN_RE.findall(url.lower()))
+        tokens.add("")
+        return tokens, type_bit, is_third_party
+
+    def matching_exceptions(self, url: str, host: str, first_party_host: str, resource_type: str):
+        """Todas las reglas de excepción (`@@`) que se aplican a la petición."""
+        if not self.rule_count:
+            return
+        tokens, type_bit, is_third_party = self._request_context(url, host, first_party_host, resource_type)
+        for token in tokens:
+            for network_filter in self._filters[True].get(token, ()):
+                if network_filter.matches(url, type_bit, is_third_party, first_party_host):
+                    yield network_filter
+
+    def should_block(self, url: str, host: str, first_party_host: str, resource_type: str, domain_blocked=False) -> bool:
+        """
+        Decide si se bloquea una petición. `domain_blocked` indica que el host ya está en la
+        lista de dominios; en ese caso solo se buscan excepciones.
+        """
+        if not self.rule_count:
+            return domain_blocked
+        tokens, type_bit, is_third_party = self._request_context(url, host, first_party_host, resource_type)
+        if not domain_blocked and not self._find_match(False, url, tokens, type_bit, is_third_party, first_party_host):
+            return False
+        return self._find_match(True, url, tokens, type_bit, is_third_party, first_party_host) is None
+
+class CosmeticFilterIndex:
+    """
+    Reglas de ocultación de elementos (`##selector`) precompiladas en hojas de estilo.
+
+    Las reglas genéricas forman una única hoja compartida por todas las páginas; las que
+    llevan dominios se guardan por dominio registrable, de modo que la hoja de cada sitio
+    solo contiene sus propias reglas. Las excepciones (`#@#`) se resuelven al generar la hoja.
+    """
+    _generations = itertools.count(1)
+    # Selectores procedurales o de scriptlets que una hoja CSS no puede expresar.
+    UNSUPPORTED_SELECTOR_MARKERS = (
+        ":-abp-", ":has-text(", ":xpath(", ":style(", ":upward(", ":matches-css", ":remove(",
+        ":min-text-length(", ":watch-attr(", ":others(", ":if(", ":if-not(", ":matches-path(",
+        ":matches-attr(", ":matches-prop(", ":contains(",
+    )
+    # Un selector no válido invalida toda su regla CSS, así que se agrupan en bloques pequeños.
+    SELECTORS_PER_RULE = 50
+    CSS_CACHE_SIZE = 256
+
+    def __init__(self, rules=()):
+        self.generation = next(self._generations)
+        self.rule_count = 0
+        generic, generic_exceptions = set(), set()
+        specific, exceptions = {}, {}
+        for line in rules:
+            parsed = self.parse_rule(line)
+            if not parsed:
+                continue
+            domains, selector, is_exception = parsed
+            included = [d for d in domains if not d.startswith("~")]
+            excluded = [d[1:] for d in domains if d.startswith("~")]
+            if is_exception:
+                if not included:
+                    generic_exceptions.add(selector)
+                for domain in included:
+                    exceptions.setdefault(domain, set()).add(selector)
+            else:
+                for domain in included:
+                    specific.setdefault(domain, set()).add(selector)
+                if not included:
+                    generic.add(selector)
+                # `~dominio` en una regla equivale a una excepción para ese dominio.
+                for domain in excluded:
+                    exceptions.setdefault(domain, set()).add(selector)
+            self.rule_count += 1
+
+        self.generic_selectors = frozenset(generic - generic_exceptions)
+        self.generic_css = self.build_css(self.generic_selectors)
+        self._by_site = {}
+        for domain in specific.keys() | exceptions.keys():
+            selectors = frozenset(specific.get(domain, set()) - generic_exceptions)
+            self._by_site.setdefault(registrable_domain(domain), []).append(
+                (domain, selectors, frozenset(exceptions.get(domain, ()))))
+        self._css_cache = {}
+
+    def __bool__(self):
+        return bool(self.generic_selectors or self._by_site)
+
+    @classmethod
+    def parse_rule(cls, line: str):
+        """Devuelve (dominios, selector, es_excepción) para una regla de ocultación soportada, o None."""
+        for separator in ("#@#", "##"):
+            position = line.find(separator)
+            if position != -1:
+                break
+        else:
+            return None
+        selector = line[position + len(separator):].strip()
+        if not selector or selector.startswith(("+js(", "^")):
+            return None
+        if any(marker in selector for marker in cls.UNSUPPORTED_SELECTOR_MARKERS):
+            return None
+        domains = [domain.strip().lower() for domain in line[:position].split(",") if domain.strip()]
+        if any("*" in domain or "/" in domain for domain in domains):
+            return None
+        return domains, selector, separator == "#@#"
+
+    @classmethod
+    def build_css(cls, selectors) -> str:
+        selectors = sorted(selectors)
+        return "\n".join(
+            ",".join(selectors[i:i + cls.SELECTORS_PER_RULE]) + "{display:none!important}"
+            for i in range(0, len(selectors), cls.SELECTORS_PER_RULE))
+
+    def stylesheets_for_host(self, host: str):
+        """
+        Devuelve (usar_hoja_genérica, css_del_dominio) para `host`. Si el sitio tiene
+        excepciones a reglas genéricas, la hoja del dominio ya incluye las genéricas que
+        le aplican y no se debe inyectar la compartida.
+        """
+        cached = self._css_cache.get(host)
+        if cached is not None:
+            return cached
+        selectors, unhidden = set(), set()
+        for domain, domain_selectors, domain_exceptions in self._by_site.get(registrable_domain(host), ()):
+            if host == domain or host.endswith("." + domain):
+                selectors |= domain_selectors
+                unhidden |= domain_exceptions
+        selectors -= unhidden
+        use_generic = not (unhidden & self.generic_selectors)
+        if not use_generic:
+            selectors |= self.generic_selectors - unhidden
+        result = (use_generic, self.build_css(selectors))
+        if len(self._css_cache) >= self.CSS_CACHE_SIZE:
+            self._css_cache.clear()
+        self._css_cache[host] = result
+        return result
+
+class HashedDomainSet:
+    """
+    Conjunto compacto de dominios para listas muy grandes (100k o más entradas).
+
+    No guarda las cadenas: guarda un hash BLAKE2b de 64 bits de cada dominio en un array
+    ordenado (8 bytes por dominio frente a los más de 100 de un `set` de str) y responde con
+    búsqueda binaria. Opcionalmente añade delante un filtro de Bloom, que descarta la mayoría
+    de los hosts ausentes sin tocar la tabla de hashes. A cambio admite falsos positivos con
+    probabilidad ~n/2^64 por consulta, despreciable incluso con millones de dominios.
+
+    La tabla y el filtro pueden ser un `array` en memoria o vistas de un archivo mapeado.
+    """
+    __slots__ = ("_hashes", "_count", "_bloom", "_bloom_mask")
+    BLOOM_HASHES = 4
+
+    def __init__(self, hashes=None, bloom=None):
+        self._hashes = hashes if hashes is not None else array('Q')
+        self._count = len(self._hashes)
+        self._bloom = bloom if bloom else None
+        self._bloom_mask = len(bloom) * 8 - 1 if bloom else 0
+
+    @staticmethod
+    def hash_domain(encoded: bytes) -> int:
+        return int.from_bytes(hashlib.blake2b(encoded, digest_size=8).digest(), "little")
+
+    @staticmethod
+    def bloom_size(count: int, bits_per_entry: int) -> int:
+        """Tamaño en bytes del filtro de Bloom: la potencia de dos que da al menos `bits_per_entry` bits por dominio."""
+        if not count or not bits_per_entry:
+            return 0
+        return max(8, 1 << (count * bits_per_entry - 1).bit_length()) // 8
+
+    @classmethod
+    def from_domains(cls, domains, bloom_bits_per_entry=0):
+        """Construye el conjunto a partir de dominios en texto, descartando los cubiertos por un dominio padre."""
+        hashes = array('Q', sorted({cls.hash_domain(domain.encode("utf-8")) for domain in DomainSuffixIndex(domains)}))
+        return cls(hashes, cls.build_bloom(hashes, bloom_bits_per_entry))
+
+    @classmethod
+    def build_bloom(cls, hashes, bits_per_entry):
+        size = cls.bloom_size(len(hashes), bits_per_entry)
+        if not size:
+            return None
+        bloom, mask = bytearray(size), size * 8 - 1
+        for value in hashes:
+            # Doble hashing: las k posiciones salen de las dos mitades del hash de 64 bits.
+            low, step = value & 0xFFFFFFFF, (value >> 32) | 1
+            for k in range(cls.BLOOM_HASHES):
+                bit = (low + k * step) & mask
+                bloom[bit >> 3] |= 1 << (bit & 7)
+        return bloom
+
+    @property
+    def hashes(self):
+        return self._hashes
+
+    @property
+    def bloom(self):
+        return self._bloom
+
+    def __len__(self):
+        return self._count
+
+    def memory_usage(self) -> int:
+        """Bytes que ocupan la tabla de hashes y el filtro de Bloom."""
+        return 8 * self._count + (len(self._bloom) if self._bloom else 0)
+
+    def _bloom_may_contain(self, value: int) -> bool:
+        bloom, mask = self._bloom, self._bloom_mask
+        low, step = value & 0xFFFFFFFF, (value >> 32) | 1
+        for k in range(self.BLOOM_HASHES):
+            bit = (low + k * step) & mask
+            if not bloom[bit >> 3] & (1 << (bit & 7)):
+                return False
+        return True
+
+    def contains(self, host: str) -> bool:
+        """Comprueba si `host` o cualquiera de sus dominios padre está en el conjunto."""
+        count = self._count
+        if not count:
+            return False
+        hashes, use_bloom = self._hashes, self._bloom is not None
+        blake2b = hashlib.blake2b
+        encoded = host.encode("utf-8")
+        start = 0
+        while True:
+            value = int.from_bytes(blake2b(encoded[start:], digest_size=8).digest(), "little")
+            if not use_bloom or self._bloom_may_contain(value):
+                i = bisect_left(hashes, value)
+                if i < count and hashes[i] == value:
+                    return True
+            start = encoded.find(b'.', start) + 1
+            if not start:
+                return False
+
+class CompiledDomainList:
+    """
+    Lista de dominios compilada a un formato binario que se consulta directamente desde `mmap`.
+
+    El archivo `.bin` se guarda junto a la lista de texto y contiene una tabla de hashes
+    CRC32 ordenada, los offsets de cada dominio y los dominios en UTF-8. Al final se guardan,
+    como texto, las reglas de Adblock Plus que no son un dominio suelto. Abrirlo solo lee
+    la cabecera, así que el coste de carga no depende del tamaño de la lista. La búsqueda
+    hace `bisect` sobre la tabla y compara el dominio completo, por lo que no hay falsos
+    positivos por colisiones.
+
+    La cabecera guarda el mtime, el tamaño y el SHA-1 de la lista de texto; solo se
+    recompila cuando el archivo de texto ha cambiado de verdad.
+
+    Con `compact_format` activado se usa en su lugar el formato compacto de
+    `HashedDomainSet`: solo hashes de 64 bits (y opcionalmente un filtro de Bloom), sin
+    guardar los dominios. Ocupa menos de la mitad en disco y en la caché de páginas.
+    """
+    MAGIC = b"WXBL"
+    VERSION = 2
+    # magic, versión, opciones, nº de dominios, tamaño de las reglas, mtime_ns, tamaño y SHA-1 de la lista de texto
+    HEADER = struct.Struct("<4sHHIIqQ20s")
+    # Opciones de la cabecera: el bit 0 indica formato compacto; el byte alto, los bits por dominio del filtro de Bloom.
+    FLAG_COMPACT = 0x1
+
+    # Formato con el que se compilan las listas; se configura desde los ajustes al iniciar.
+    compact_format = False
+    bloom_bits_per_entry = 0
+
+    def __init__(self, buffer=b"", header=None):
+        self._buffer = buffer
+        self._count = header[3] if header else 0
+        rules_size = header[4] if header else 0
+        view = memoryview(buffer)
+        self._rules = view[len(view) - rules_size:]
+        self._hashed = None
+        if self._count and header[2] & self.FLAG_COMPACT:
+            start = self.HEADER.size
+            hashes = view[start:start + 8 * self._count].cast('Q')
+            start += 8 * self._count
+            bloom = view[start:start + HashedDomainSet.bloom_size(self._count, header[2] >> 8)]
+            self._hashed = HashedDomainSet(hashes, bloom)
+            self._hashes = self._offsets = self._blob = memoryview(b"")
+        elif self._count:
+            start = self.HEADER.size
+            self._hashes = view[start:start + 4 * self._count].cast('I')
+            start += 4 * self._count
+            self._offsets = view[start:start + 4 * (self._count + 1)].cast('I')
+            start += 4 * (self._count + 1)
+            self._blob = view[start:len(view) - rules_size]
+        else:
+            self._hashes = self._offsets = self._blob = memoryview(b"")
+
+    def __len__(self):
+        return self._count
+
+    def filter_rules(self):
+        """Devuelve las reglas de filtro de red y de ocultación guardadas en el archivo compilado."""
+        return bytes(self._rules).decode("utf-8").splitlines()
+
+    def contains(self, host: str) -> bool:
+        """Comprueba si `host` o cualquiera de sus dominios padre está en la lista compilada."""
+        count = self._count
+        if not count:
+            return False
+        if self._hashed is not None:
+            return self._hashed.contains(host)
+        hashes, offsets, blob = self._hashes, self._offsets, self._blob
+        encoded = host.encode("utf-8")
+        start = 0
+        while True:
+            suffix = encoded[start:]
+            crc = zlib.crc32(suffix)
+            i = bisect_left(hashes, crc)
+            while i < count and hashes[i] == crc:
+                if blob[offsets[i]:offsets[i + 1]] == suffix:
+                    return True
+                i += 1
+            start = encoded.find(b'.', start) + 1
+            if not start:
+                return False
+
+    @staticmethod
+    def parse_lines(lines):
+        """
+        Separa una lista de texto en dominios y reglas de filtro (de red y de ocultación),
+        ignorando líneas vacías y comentarios. Devuelve (dominios, reglas).
+        """
+        domains, rules = set(), []
+        for line in lines:
+            line = line.strip()
+            if not line or line.startswith(("!", "[")) or (line.startswith("#") and not line.startswith(("##", "#@#"))):
+                continue
+            if not FilterEngine.is_network_rule(line):
+                rules.append(line)
+                continue
+            entries = CompiledDomainList.domains_from_line(line)
+            if entries is None:
+                rules.append(line)
+            else:
+                domains.update(entries)
+        return domains, rules
+
+    # "127.0.0.1 dominio", "0.0.0.0 dominio" o "::1 dominio" de un archivo hosts.
+    _HOSTS_LINE_RE = re.compile(r"^(?:\d{1,3}(?:\.\d{1,3}){3}|[0-9a-fA-F]*:[0-9a-fA-F:.]*)\s+(.+)$")
+    _HOSTS_IGNORED_NAMES = frozenset({
+        "localhost", "localhost.localdomain", "local", "broadcasthost", "0.0.0.0",
+        "ip6-localhost", "ip6-loopback", "ip6-localnet", "ip6-mcastprefix", "ip6-allnodes", "ip6-allrouters",
+    })
+
+    @classmethod
+    def domains_from_line(cls, line: str):
+        """
+        Normaliza una línea de cualquiera de los formatos de lista admitidos (archivo hosts,
+        dominio suelto, comodín `*.dominio` o regla `||dominio^`) y devuelve sus dominios.
+        Devuelve None si la línea no es una entrada de dominio (p. ej. una regla con ruta).
+        """
+        if (hosts_match := cls._HOSTS_LINE_RE.match(line)):
+            names = hosts_match.group(1).split("#", 1)[0].split()
+            return [name for name in names
+                    if name.lower() not in cls._HOSTS_IGNORED_NAMES and FilterEngine.domain_from_rule(name)]
+        domain = FilterEngine.domain_from_rule(line)
+        return [domain] if domain else None
+
+    @classmethod
+    def layout_flags(cls) -> int:
+        """Opciones de cabecera que corresponden al formato configurado."""
+        if not cls.compact_format:
+            return 0
+        return cls.FLAG_COMPACT | (max(0, min(cls.bloom_bits_per_entry, 32)) << 8)
+
+    @classmethod
+    def build(cls, domains, rules=(), source_mtime_ns=0, source_size=0, source_sha1=b"\0" * 20, flags=None) -> bytes:
+        """Serializa un conjunto de dominios y las reglas de filtro restantes al formato binario."""
+        flags = cls.layout_flags() if flags is None else flags
+        rules_blob = "\n".join(rules).encode("utf-8")
+        if flags & cls.FLAG_COMPACT:
+            hashed = HashedDomainSet.from_domains(domains, flags >> 8)
+            return b"".join((
+                cls.HEADER.pack(cls.MAGIC, cls.VERSION, flags, len(hashed), len(rules_blob),
+                                source_mtime_ns, source_size, source_sha1),
+                struct.pack(f"<{len(hashed)}Q", *hashed.hashes),
+                bytes(hashed.bloom or b""),
+                rules_blob,
+            ))
+        entries = sorted((zlib.crc32(encoded), encoded) for encoded in
+                         (domain.encode("utf-8") for domain in DomainSuffixIndex(domains)))
+        offsets, position = [], 0
+        for _, encoded in entries:
+            offsets.append(position)
+            position += len(encoded)
+        offsets.append(position)
+        return b"".join((
+            cls.HEADER.pack(cls.MAGIC, cls.VERSION, 0, len(entries), len(rules_blob),
+                            source_mtime_ns, source_size, source_sha1),
+            struct.pack(f"<{len(entries)}I", *(crc for crc, _ in entries)),
+            struct.pack(f"<{len(offsets)}I", *offsets),
+            *(encoded for _, encoded in entries),
+            rules_blob,
+        ))
+
+    @staticmethod
+    def _hash_file(path) -> bytes:
+        digest = hashlib.sha1()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        return digest.digest()
+
+    @classmethod
+    def compile_file(cls, text_path, compiled_path) -> bytes:
+        """Compila la lista de texto y escribe el archivo binario de forma atómica. Devuelve los datos compilados."""
+        stat = os.stat(text_path)
+        with open(text_path, "r", encoding="utf-8", errors="replace") as f:
+            domains, rules = cls.parse_lines(f)
+        data = cls.build(domains, rules, stat.st_mtime_ns, stat.st_size, cls._hash_file(text_path))
+        # Varias tareas del mismo proceso pueden compilar la misma lista a la vez: cada una usa su propio temporal.
+        temp_path = None
+        try:
+            with tempfile.NamedTemporaryFile("wb", dir=os.path.dirname(compiled_path) or None,
+                                             prefix=os.path.basename(compiled_path) + ".", suffix=".tmp", delete=False) as f:
+                temp_path = f.name
+                f.write(data)
+            os.replace(temp_path, compiled_path)
+        except OSError as e:
+            # En Windows no se puede reemplazar un archivo que otra ventana tiene mapeado.
+            print(f"ADVERTENCIA: No se pudo guardar la lista compilada '{compiled_path}': {e}")
+            if temp_path and os.path.exists(temp_path):
+                os.remove(temp_path)
+        return data
+
+    @classmethod
+    def _read_header(cls, buffer):
+        if len(buffer) < cls.HEADER.size:
+            return None
+        header = cls.HEADER.unpack_from(buffer)
+        magic, version, flags, count = header[:4]
+        if magic != cls.MAGIC or version != cls.VERSION:
+            return None
+        if flags & cls.FLAG_COMPACT:
+            compact_size = cls.HEADER.size + 8 * count + HashedDomainSet.bloom_size(count, flags >> 8) + header[4]
+            return header if len(buffer) == compact_size else None
+        tables_end = cls.HEADER.size + 4 * count + 4 * (count + 1)
+        if len(buffer) < tables_end:
+            return None
+        blob_size = struct.unpack_from("<I", buffer, tables_end - 4)[0]
+        if len(buffer) != tables_end + blob_size + header[4]:
+            return None
+        return header
+
+    @classmethod
+    def _is_current(cls, header, text_path, compiled_path) -> bool:
+        if header[2] != cls.layout_flags():
+            return False
+        stat = os.stat(text_path)
+        mtime_ns, size, sha1 = header[5:]
+        if (mtime_ns, size) == (stat.st_mtime_ns, stat.st_size):
+            return True
+        if size != stat.st_size or cls._hash_file(text_path) != sha1:
+            return False
+        # Mismo contenido con otro mtime (p. ej. tras copiar el perfil): basta con actualizar la cabecera.
+        try:
+            with open(compiled_path, "r+b") as f:
+                f.write(cls.HEADER.pack(*header[:5], stat.st_mtime_ns, size, sha1))
+        except OSError:
+            pass
+        return True
+
+    @classmethod
+    def load(cls, text_path, compiled_path):
+        """
+        Abre la lista compilada si está al día con la lista de texto; si no, la recompila.
+        Lanza FileNotFoundError si no existe la lista de texto.
+        """
+        if not os.path.exists(text_path):
+            raise FileNotFoundError(text_path)
+        compiled = cls._open_mapped(compiled_path)
+        if compiled is not None:
+            if cls._is_current(compiled[1], text_path, compiled_path):
+                return cls(*compiled)
+            compiled[0].close()
+
+        print(f"Compilando lista de bloqueo '{os.path.basename(text_path)}'...")
+        data = cls.compile_file(text_path, compiled_path)
+        compiled = cls._open_mapped(compiled_path)
+        if compiled is not None and compiled[1][7] == cls._read_header(data)[7]:
+            return cls(*compiled)
+        if compiled is not None:
+            compiled[0].close()
+        # No se pudo escribir el archivo compilado: se usa la copia en memoria.
+        return cls(data, cls._read_header(data))
+
+    @classmethod
+    def _open_mapped(cls, compiled_path):
+        """Mapea el archivo compilado y devuelve (mmap, cabecera), o None si no existe o no es válido."""
+        try:
+            with open(compiled_path, "rb") as f:
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+        header = cls._read_header(buffer)
+        if header is None:
+            buffer.close()
+            return None
+        return buffer, header
+
+class BlocklistSubscriptions:
+    """
+    Suscripciones a listas de bloqueo, agrupadas por categoría ('adblock', 'malware').
+
+    Cada lista se descarga con peticiones condicionales (ETag / If-Modified-Since) y
+    compresión gzip, y se procesa línea a línea según llega, sin cargar el cuerpo entero
+    en memoria. Todos los archivos se escriben en un temporal y se renombran, así que una
+    descarga fallida o truncada nunca deja una lista a medias.
+    """
+    DEFAULT_SUBSCRIPTIONS = {
+        "adblock": ["https://pgl.yoyo.org/adservers/serverlist.php?hostformat=nohtml&showintro=0&mimetype=plaintext"],
+        "malware": ["https://urlhaus.abuse.ch/downloads/hostfile/"],
+    }
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, profile_path):
+        self.path = os.path.join(profile_path, "subscriptions.json")
+        self.lists_dir = os.path.join(profile_path, "lists")
+        self._lock = threading.Lock()
+        self.categories = self._load()
+
+    def _load(self):
+        data = {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            pass
+        except (IOError, json.JSONDecodeError) as e:
+            print(f"ADVERTENCIA: No se pudo leer '{self.path}': {e}")
+        for category, urls in self.DEFAULT_SUBSCRIPTIONS.items():
+            if category not in data:
+                data[category] = {"lists": [self._new_subscription(category, url) for url in urls], "merged": []}
+        return data
+
+    @staticmethod
+    def _new_subscription(category, url):
+        file_name = f"{category}_{hashlib.sha1(url.encode('utf-8')).hexdigest()[:12]}.txt"
+        return {"url": url, "enabled": True, "etag": "", "last_modified": "", "file": file_name}
+
+    @staticmethod
+    def _temp_file(target_path):
+        """
+        Abre un temporal con nombre único junto a `target_path`. Cada ventana tiene su propio
+        objeto de suscripciones, así que un nombre basado solo en el PID podría coincidir.
+        """
+        return tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=os.path.dirname(target_path),
+                                           prefix=os.path.basename(target_path) + ".", suffix=".tmp", delete=False)
+
+    def save(self):
+        with self._lock:
+            temp_file = self._temp_file(self.path)
+            try:
+                with temp_file:
+                    json.dump(self.categories, temp_file, indent=4)
+                os.replace(temp_file.name, self.path)
+            finally:
+                if os.path.exists(temp_file.name):
+                    os.remove(temp_file.name)
+
+    def urls(self, category):
+        return [sub["url"] for sub in self.categories[category]["lists"]]
+
+    def set_urls(self, category, urls):
+        """Sustituye las listas de una categoría conservando el estado de las que ya existían."""
+        existing = {sub["url"]: sub for sub in self.categories[category]["lists"]}
+        self.categories[category]["lists"] = [existing.get(url) or self._new_subscription(category, url)
+                                              for url in dict.fromkeys(url.strip() for url in urls if url.strip())]
+        self.save()
+
+    @staticmethod
+    def _is_comment(line: str) -> bool:
+        return line.startswith(("!", "[")) or (line.startswith("#") and not line.startswith(("##", "#@#")))
+
+    def _iter_response_lines(self, response):
+        """Descomprime y decodifica la respuesta por bloques, produciendo líneas a medida que llegan."""
+        expected_length = response.headers.get("Content-Length")
+        decompressor = None
+        if response.headers.get("Content-Encoding", "").lower() in ("gzip", "x-gzip"):
+            decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        received, pending = 0, ""
+        while chunk := response.read(self.CHUNK_SIZE):
+            received += len(chunk)
+            if decompressor:
+                chunk = decompressor.decompress(chunk)
+            pending += decoder.decode(chunk)
+            lines = pending.split("\n")
+            pending = lines.pop()
+            yield from lines
+        if expected_length is not None and received != int(expected_length):
+            raise ValueError(f"Respuesta truncada: {received} de {expected_length} bytes")
+        if decompressor and not decompressor.eof:
+            raise ValueError("Respuesta gzip truncada")
+        pending += decoder.decode(b"", final=True)
+        if pending:
+            yield pending
+
+    def _fetch(self, subscription) -> bool:
+        """Descarga una lista si ha cambiado. Devuelve False si el servidor respondió 304."""
+        cache_path = os.path.join(self.lists_dir, subscription["file"])
+        request = urllib.request.Request(subscription["url"], headers={"Accept-Encoding": "gzip", "User-Agent": "Wemphix"})
+        if os.path.exists(cache_path):
+            if subscription.get("etag"):
+                request.add_header("If-None-Match", subscription["etag"])
+            if subscription.get("last_modified"):
+                request.add_header("If-Modified-Since", subscription["last_modified"])
+        try:
+            response = urllib.request.urlopen(request, timeout=20)
+        except urllib.error.HTTPError as e:
+            if e.code == 304:
+                return False
+            raise
+
+        temp_file = self._temp_file(cache_path)
+        try:
+            with response, temp_file:
+                for line in self._iter_response_lines(response):
+                    line = line.strip()
+                    if line and not self._is_comment(line):
+                        temp_file.write(line + "\n")
+            os.replace(temp_file.name, cache_path)
+        finally:
+            if os.path.exists(temp_file.name):
+                os.remove(temp_file.name)
+        subscription["etag"] = response.headers.get("ETag", "")
+        subscription["last_modified"] = response.headers.get("Last-Modified", "")
+        return True
+
+    def _merge(self, category, output_path, files):
+        temp_file = self._temp_file(output_path)
+        try:
+            with temp_file:
+                for file_name in files:
+                    with open(os.path.join(self.lists_dir, file_name), "r", encoding="utf-8") as f:
+                        shutil.copyfileobj(f, temp_file)
+            os.replace(temp_file.name, output_path)
+        finally:
+            if os.path.exists(temp_file.name):
+                os.remove(temp_file.name)
+        self.categories[category]["merged"] = files
+
+    def update_category(self, category, output_path) -> dict:
+        """
+        Actualiza todas las listas activas de una categoría y, si alguna cambió, reescribe
+        `output_path` con la unión de todas. Lanza la primera excepción si fallaron todas.
+        """
+        os.makedirs(self.lists_dir, exist_ok=True)
+        result = {"changed": False, "updated": 0, "not_modified": 0, "failed": []}
+        for subscription in self.categories[category]["lists"]:
+            if not subscription.get("enabled", True):
+                continue
+            try:
+                if self._fetch(subscription):
+                    result["updated"] += 1
+                else:
+                    result["not_modified"] += 1
+            except (OSError, ValueError, zlib.error, http.client.HTTPException) as e:
+                print(f"ERROR: Falló la descarga de '{subscription['url']}': {e}")
+                result["failed"].append((subscription["url"], e))
+
+        if result["failed"] and not (result["updated"] or result["not_modified"]):
+            self.save()
+            raise result["failed"][0][1]
+
+        files = [sub["file"] for sub in self.categories[category]["lists"]
+                 if sub.get("enabled", True) and os.path.exists(os.path.join(self.lists_dir, sub["file"]))]
+        if result["updated"] or files != self.categories[category]["merged"] or not os.path.exists(output_path):
+            self._merge(category, output_path, files)
+            result["changed"] = True
+        self.save()
+        return result
+
+class HostDecisionCache:
+    """
+    LRU acotada de decisiones por host (marcas de bloqueo) delante de los índices de dominios.
+
+    La mayoría de las peticiones de una página van a unos pocos hosts, así que se evita
+    recorrer los dominios padre en cada una. Los contadores de aciertos, fallos y
+    expulsiones sirven para ajustar la capacidad.
+    """
+    def __init__(self, capacity=4096, hits=0, misses=0, evictions=0):
+        self.capacity = capacity
+        self.hits = hits
+        self.misses = misses
+        self.evictions = evictions
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, host):
+        """Devuelve la decisión guardada para `host` o None si no está en la caché."""
+        with self._lock:
+            decision = self._entries.get(host)
+            if decision is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(host)
+            self.hits += 1
+            return decision
+
+    def put(self, host, decision):
+        with self._lock:
+            self._entries[host] = decision
+            self._entries.move_to_end(host)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidated(self):
+        """Devuelve una caché vacía con la misma capacidad que conserva los contadores acumulados."""
+        with self._lock:
+            return HostDecisionCache(self.capacity, self.hits, self.misses, self.evictions)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries), "capacity": self.capacity,
+                "hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+class RequestStats:
+    """
+    Contadores del interceptor: peticiones vistas, bloqueadas y permitidas, desglosadas por
+    origen de primera parte, y un histograma (escala log2 en µs) del tiempo de decisión.
+    """
+    # El cubo i cuenta decisiones de menos de 2^i µs; el último acumula las de 16 ms o más.
+    LATENCY_BUCKETS = 16
+    MAX_ORIGINS = 500
+
+    def __init__(self, track_origins=True):
+        self.track_origins = track_origins
+        self.reset()
+
+    def reset(self):
+        self.seen = 0
+        self.blocked = 0
+        self.total_latency_ns = 0
+        self.latency_buckets = [0] * self.LATENCY_BUCKETS
+        self.origins = OrderedDict()
+
+    @property
+    def allowed(self):
+        return self.seen - self.blocked
+
+    def record(self, origin, blocked: bool, elapsed_ns=None):
+        self.seen += 1
+        if blocked:
+            self.blocked += 1
+        if elapsed_ns is not None:
+            self.total_latency_ns += elapsed_ns
+            self.latency_buckets[min((elapsed_ns // 1000).bit_length(), self.LATENCY_BUCKETS - 1)] += 1
+        if self.track_origins and origin:
+            counts = self.origins.get(origin)
+            if counts is None:
+                if len(self.origins) >= self.MAX_ORIGINS:
+                    self.origins.popitem(last=False)
+                counts = self.origins[origin] = [0, 0]
+            else:
+                self.origins.move_to_end(origin)
+            counts[0] += 1
+            if blocked:
+                counts[1] += 1
+
+    def latency_percentile_us(self, fraction: float) -> int:
+        """Cota superior (en µs) del percentil pedido según el histograma."""
+        measured = sum(self.latency_buckets)
+        if not measured:
+            return 0
+        threshold = fraction * measured
+        accumulated = 0
+        for bucket, count in enumerate(self.latency_buckets):
+            accumulated += count
+            if accumulated >= threshold:
+                return 1 << bucket
+        return 1 << (self.LATENCY_BUCKETS - 1)
+
+    def mean_latency_us(self) -> float:
+        measured = sum(self.latency_buckets)
+        return self.total_latency_ns / measured / 1000 if measured else 0.0
+
+    def top_origins(self, limit=10):
+        """Orígenes con más peticiones bloqueadas: lista de (origen, vistas, bloqueadas)."""
+        ranked = sorted(self.origins.items(), key=lambda item: (item[1][1], item[1][0]), reverse=True)
+        return [(origin, seen, blocked) for origin, (seen, blocked) in ranked[:limit]]
+
+class DataSaverPolicy:
+    """
+    Modo de ahorro aplicado en el interceptor: qué tipos de recurso se dejan de descargar.
+
+    Se consulta en cada petición, así que cambiar de modo afecta a las peticiones nuevas
+    sin recargar las pestañas. `image_budget` limita las imágenes por carga de página (las
+    primeras suelen ser las visibles sin desplazarse); lo aplica el interceptor de cada
+    pestaña, que es el que sabe a qué página pertenece la petición.
+    """
+    __slots__ = ("mode", "blocked_types", "block_third_party_scripts", "image_budget")
+    # Tamaño medio aproximado de cada tipo de recurso en la web, para estimar los bytes evitados.
+    ESTIMATED_BYTES = {"image": 40_000, "media": 1_000_000, "font": 30_000, "script": 25_000, "stylesheet": 10_000}
+    # modo de rendimiento -> (tipos bloqueados, bloquear scripts de terceros, imágenes por página; 0 = sin límite)
+    MODES = {
+        "data": (frozenset({"media", "font"}), True, 10),
+        "battery": (frozenset({"image"}), False, 0),
+        "super": (frozenset({"image", "media", "font", "script"}), True, 0),
+    }
+    # Solo cuestan datos las descargas de red; las páginas internas (wemphix:), data:, blob:... nunca se bloquean.
+    NETWORK_SCHEMES = frozenset({"http", "https"})
+
+    def __init__(self, mode, blocked_types=frozenset(), block_third_party_scripts=False, image_budget=0):
+        self.mode = mode
+        self.blocked_types = blocked_types
+        self.block_third_party_scripts = block_third_party_scripts
+        self.image_budget = image_budget
+
+    @classmethod
+    def for_mode(cls, mode):
+        """Devuelve la política del modo de rendimiento, o None si el modo no ahorra datos."""
+        preset = cls.MODES.get(mode)
+        return cls(mode, *preset) if preset else None
+
+    def blocks(self, resource_type: str, host: str, first_party_host: str) -> bool:
+        if resource_type in self.blocked_types:
+            return True
+        return (resource_type == "script" and self.block_third_party_scripts and bool(first_party_host)
+                and registrable_domain(host) != registrable_domain(first_party_host))
+
+class DataSaverSavings:
+    """Peticiones y bytes (estimados) evitados por cada modo de ahorro de datos."""
+
+    def __init__(self):
+        self.by_mode = {}
+
+    def record(self, mode: str, resource_type: str):
+        counts = self.by_mode.setdefault(mode, [0, 0])
+        counts[0] += 1
+        counts[1] += DataSaverPolicy.ESTIMATED_BYTES.get(resource_type, 5_000)
+
+    def items(self):
+        """Lista de (modo, peticiones evitadas, bytes estimados)."""
+        return [(mode, requests, estimated_bytes) for mode, (requests, estimated_bytes) in self.by_mode.items()]
+
+class ListProxyAutoConfig:
+    """
+    Archivo PAC (autoconfiguración de proxy) generado a partir de la lista de bloqueo.
+    Chromium lo recibe con `--proxy-pac-url` y lo evalúa fuera de Python: a los dominios
+    sueltos de la lista (y sus subdominios) les asigna un proxy que rechaza la conexión, así
+    que fallan dentro de Chromium, incluido el preconnect y la precarga de DNS, que nunca
+    llegan al interceptor.
+
+    El PAC cubre la lista entera: va en una URL `data:` que solo lee el proceso principal,
+    así que no le afecta el límite de la línea de órdenes de los subprocesos. Como no puede
+    aplicar excepciones por página, deja pasar los hosts que nombra una regla `@@||host` de
+    la lista, los que menciona la lista del usuario y los que el interceptor ha permitido
+    alguna vez pese a estar en la lista. El interceptor sigue aplicando todas las reglas a
+    todas las peticiones; el PAC solo se lee al arrancar, así que lo que se cambie después
+    (desactivar el bloqueador, "solo terceros", excepciones nuevas) no lo afecta hasta reiniciar.
+    """
+    FILE_NAME = "adblock.pac"
+    ALLOWED_FILE_NAME = "adblock_pac_allowed.json"
+    MAX_ALLOWED_HOSTS = 5000
+    # Puerto "discard" de localhost: la conexión se rechaza al momento.
+    BLOCKED_PROXY = "PROXY 127.0.0.1:9"
+    PROXY_ENVIRONMENT = ("http_proxy", "https_proxy", "all_proxy", "HTTP_PROXY", "HTTPS_PROXY", "ALL_PROXY")
+    _SCRIPT = """\
+// {key}
+var BLOCKED_HOSTS = "{blocked}";
+var ALLOWED_HOSTS = "{allowed}";
+var blocked = Object.create(null), allowed = Object.create(null);
+BLOCKED_HOSTS.split(" ").forEach(function (host) {{ if (host) blocked[host] = true; }});
+ALLOWED_HOSTS.split(" ").forEach(function (host) {{ if (host) allowed[host] = true; }});
+function FindProxyForURL(url, host) {{
+    var listed = false;
+    host = host.toLowerCase();
+    while (true) {{
+        if (allowed[host]) return "DIRECT";
+        if (blocked[host]) listed = true;
+        var dot = host.indexOf(".");
+        if (dot < 0) return listed ? "{proxy}" : "DIRECT";
+        host = host.substring(dot + 1);
+    }}
+}}
+"""
+    _HOST_LIST_RE = re.compile(r'^var (BLOCKED|ALLOWED)_HOSTS = "([^"]*)";$', re.MULTILINE)
+    # PAC con el que arrancó Chromium en este proceso (None si el modo está desactivado).
+    active = None
+
+    def __init__(self, script: str):
+        self.script = script
+        lists = dict(self._HOST_LIST_RE.findall(script))
+        self.blocked_hosts = lists.get("BLOCKED", "").split()
+        self.allowed_hosts = lists.get("ALLOWED", "").split()
+        self._indexes = None
+
+    def __len__(self):
+        return len(self.blocked_hosts)
+
+    def blocks(self, host: str) -> bool:
+        """La misma decisión que `FindProxyForURL`: True si Chromium no deja conectar con `host`."""
+        if self._indexes is None:
+            # Solo se necesita cuando el interceptor permite un host de la lista, así que se construye al usarlo.
+            self._indexes = (DomainSuffixIndex(self.blocked_hosts), DomainSuffixIndex(self.allowed_hosts))
+        blocked, allowed = self._indexes
+        return blocked.contains(host) and not allowed.contains(host)
+
+    def data_url(self) -> str:
+        return "data:application/x-ns-proxy-autoconfig;base64," + base64.b64encode(self.script.encode("utf-8")).decode("ascii")
+
+    @staticmethod
+    def _user_list_domains(user_text: str):
+        domains = []
+        for line in user_text.splitlines():
+            line = line.strip().removeprefix("@@")
+            if (domain := FilterEngine.domain_from_rule(line)) or \
+               (line.startswith("||") and (domain := re.split(r"[/^$*|:]", line[2:], maxsplit=1)[0])):
+                domains.append(domain)
+        return domains
+
+    @classmethod
+    def build(cls, listed, rules, user_text="", allowed_hosts=(), key=""):
+        """
+        Genera el PAC para los dominios de la lista (`listed`, un DomainSuffixIndex) y sus
+        reglas, la lista del usuario y los hosts ya permitidos.
+        """
+        allowed = [re.split(r"[/^$*|:]", rule[4:], maxsplit=1)[0] for rule in rules if rule.startswith("@@||")]
+        allowed += cls._user_list_domains(user_text)
+        allowed += allowed_hosts
+        allowed = DomainSuffixIndex(host for host in allowed if FilterEngine._HOSTNAME_RE.match(host))
+        return cls(cls._SCRIPT.format(key=key, blocked=" ".join(sorted(listed)),
+                                      allowed=" ".join(sorted(allowed)), proxy=cls.BLOCKED_PROXY))
+
+    @classmethod
+    def load_allowed(cls, directory):
+        """Hosts que una excepción `@@||host^` ha permitido en sesiones anteriores: {host: última vez (epoch)}."""
+        try:
+            with open(os.path.join(directory, cls.ALLOWED_FILE_NAME), "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return {str(host): float(seen) for host, seen in data.items()}
+        except (IOError, ValueError, TypeError, AttributeError):
+            return {}
+
+    @classmethod
+    def _write_allowed(cls, directory, allowed):
+        # Si hay demasiados, se quedan los vistos más recientemente.
+        newest = sorted(allowed.items(), key=lambda item: item[1])[-cls.MAX_ALLOWED_HOSTS:]
+        try:
+            with open(os.path.join(directory, cls.ALLOWED_FILE_NAME), "w", encoding="utf-8") as f:
+                json.dump(dict(newest), f)
+        except IOError as e:
+            print(f"No se pudieron guardar los hosts permitidos del PAC: {e}")
+
+    @classmethod
+    def save_allowed(cls, directory, session_allowed):
+        """Añade los hosts permitidos en esta sesión ({host: última vez}); el próximo PAC los dejará pasar."""
+        if not session_allowed:
+            return
+        allowed = cls.load_allowed(directory)
+        allowed.update(session_allowed)
+        cls._write_allowed(directory, allowed)
+
+    @classmethod
+    def _cache_key(cls, list_path, user_text, allowed_hosts) -> str:
+        stat = os.stat(list_path)
+        digest = hashlib.sha1(f"{cls.BLOCKED_PROXY}\n{stat.st_mtime_ns}:{stat.st_size}\n{user_text}\n".encode("utf-8"))
+        digest.update(" ".join(sorted(allowed_hosts)).encode("utf-8"))
+        return digest.hexdigest()
+
+    @classmethod
+    def load(cls, directory, user_text=""):
+        """
+        Devuelve el PAC de la lista de `directory`, regenerándolo solo si la lista, la del
+        usuario o los hosts permitidos han cambiado desde el que se guardó. None si no hay lista.
+        """
+        list_path, pac_path = os.path.join(directory, "adblock_list.txt"), os.path.join(directory, cls.FILE_NAME)
+        allowed_hosts = cls.load_allowed(directory)
+        try:
+            key = cls._cache_key(list_path, user_text, allowed_hosts)
+        except OSError:
+            return None
+        try:
+            with open(pac_path, "r", encoding="utf-8") as f:
+                script = f.read()
+            if script.startswith(f"// {key}\n"):
+                return cls(script)
+        except IOError:
+            pass
+        with open(list_path, "r", encoding="utf-8", errors="replace") as f:
+            domains, rules = CompiledDomainList.parse_lines(f)
+        listed = DomainSuffixIndex(domains)
+        # Los hosts permitidos que ya no están en la lista no hace falta seguir guardándolos.
+        kept = {host: seen for host, seen in allowed_hosts.items() if listed.contains(host)}
+        if len(kept) != len(allowed_hosts):
+            cls._write_allowed(directory, kept)
+            allowed_hosts, key = kept, cls._cache_key(list_path, user_text, kept)
+        pac = cls.build(listed, rules, user_text, allowed_hosts, key)
+        # Si no se puede guardar, se usa el PAC generado y se vuelve a generar en el próximo inicio.
+        temp_path = None
+        try:
+            with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=directory, prefix=cls.FILE_NAME + ".",
+                                             suffix=".tmp", delete=False) as f:
+                temp_path = f.name
+                f.write(pac.script)
+            os.replace(temp_path, pac_path)
+        except OSError as e:
+            print(f"ADVERTENCIA: No se pudo guardar '{cls.FILE_NAME}': {e}")
+            if temp_path and os.path.exists(temp_path):
+                os.remove(temp_path)
+        return pac
+
+    @classmethod
+    def command_line_argument(cls, settings, directory):
+        """Argumento para Chromium si el bloqueo por PAC está activado y hay una lista que aplicar."""
+        if not settings.value("hostResolverBlocking", False, type=bool) or \
+           settings.value("adBlockThirdPartyOnly", False, type=bool):
+            return None
+        if any(os.environ.get(name) for name in cls.PROXY_ENVIRONMENT):
+            print("ADVERTENCIA: Hay un proxy configurado en el entorno; el bloqueo por PAC lo sustituiría y no se activa.")
+            return None
+        try:
+            pac = cls.load(directory, settings.value("user_block_list", ""))
+        except OSError as e:
+            print(f"ERROR: No se pudo generar el PAC de la lista de bloqueo: {e}")
+            return None
+        if pac is None or not len(pac):
+            return None
+        cls.active = pac
+        print(f"INFO: Bloqueo por PAC activo para {len(pac)} dominios ({len(pac.script) // 1024} KB).")
+        return f"--proxy-pac-url={pac.data_url()}"
+
+class _UrlCleanRule:
+    """Regla de limpieza de URL de un dominio: un redirector de rebote o parámetros propios que se quitan."""
+    __slots__ = ("name", "path_prefix", "target_params", "strip_params", "hits")
+
+    def __init__(self, name, path_prefix="/", target_params=(), strip_params=()):
+        self.name = name
+        self.path_prefix = path_prefix
+        self.target_params = tuple(target_params)
+        self.strip_params = frozenset(strip_params)
+        self.hits = 0
+
+    def matches_path(self, path: str) -> bool:
+        """El prefijo solo vale por segmentos completos: '/url' sirve para '/url' y '/url/...', no para '/urlshortener'."""
+        prefix = self.path_prefix.rstrip("/")
+        return path == prefix or path.startswith(prefix + "/")
+
+class UrlCleaner:
+    """
+    Limpia las URL de navegación: quita parámetros de seguimiento conocidos (utm_*, fbclid...)
+    y salta los redirectores de rebote (p. ej. google.com/url?q=...) yendo directamente a la
+    URL de destino que llevan dentro, lo que ahorra esos saltos y deja la URL final apta para
+    la caché HTTP. Las reglas se compilan por dominio al crear el objeto y cada una cuenta
+    cuántas veces se ha aplicado.
+    """
+    TRACKING_PARAMS = frozenset({
+        "fbclid", "gclid", "dclid", "gbraid", "wbraid", "msclkid", "yclid", "twclid", "ttclid", "igshid",
+        "mc_cid", "mc_eid", "_hsenc", "_hsmi", "mkt_tok", "oly_anon_id", "oly_enc_id", "vero_id", "vero_conv",
+    })
+    TRACKING_PREFIXES = ("utm_",)
+    # Un redirector puede llevar a otro; se siguen como mucho estos saltos.
+    MAX_HOPS = 3
+    # (dominio, nombre, prefijo de la ruta, parámetros con la URL de destino, parámetros propios que se quitan).
+    # "nombre.*" vale para el dominio con cualquier sufijo público (google.es, google.co.uk...).
+    DEFAULT_RULES = (
+        ("google.*", "Google (redirección)", "/url", ("q", "url"), ()),
+        ("youtube.com", "YouTube (redirección)", "/redirect", ("q",), ()),
+        ("l.facebook.com", "Facebook (l.php)", "/l.php", ("u",), ()),
+        ("lm.facebook.com", "Facebook móvil (l.php)", "/l.php", ("u",), ()),
+        ("l.messenger.com", "Messenger (l.php)", "/l.php", ("u",), ()),
+        ("l.instagram.com", "Instagram (redirección)", "/", ("u",), ()),
+        ("out.reddit.com", "Reddit (redirección)", "/", ("url",), ()),
+        ("steamcommunity.com", "Steam (linkfilter)", "/linkfilter/", ("u", "url"), ()),
+        ("duckduckgo.com", "DuckDuckGo (redirección)", "/l/", ("uddg",), ()),
+        ("slack-redir.net", "Slack (redirección)", "/link", ("url",), ()),
+        ("disq.us", "Disqus (redirección)", "/url", ("url",), ()),
+        ("vk.com", "VK (away.php)", "/away.php", ("to",), ()),
+        ("amazon.*", "Amazon (parámetros de seguimiento)", "/", (),
+         ("pd_rd_r", "pd_rd_w", "pd_rd_wg", "pd_rd_i", "pf_rd_r", "pf_rd_p", "pf_rd_s", "pf_rd_t", "pf_rd_i", "pf_rd_m", "ref_")),
+    )
+
+    def __init__(self, rules=DEFAULT_RULES):
+        self.tracking_rule = _UrlCleanRule("Parámetros de seguimiento (utm_*, fbclid...)")
+        self._by_domain = {}
+        for domain, *rule in rules:
+            self._by_domain.setdefault(domain, []).append(_UrlCleanRule(*rule))
+
+    def rules(self):
+        """Todas las reglas, con sus contadores, empezando por la de parámetros genéricos."""
+        return [self.tracking_rule, *itertools.chain.from_iterable(self._by_domain.values())]
+
+    def _rules_for_host(self, host: str):
+        by_domain, found = self._by_domain, []
+        start = 0
+        while True:
+            found.extend(by_domain.get(host[start:], ()))
+            start = host.find('.', start) + 1
+            if not start:
+                break
+        site = registrable_domain(host)
+        found.extend(by_domain.get(site.split('.', 1)[0] + ".*", ()))
+        return found
+
+    @staticmethod
+    def _embedded_url(query: str, target_params):
+        values = dict(parse_qsl(query))
+        for param in target_params:
+            target = values.get(param, "")
+            if target.startswith(("https://", "http://")):
+                return target
+        return None
+
+    def _strip_params(self, parts, rules):
+        if not parts.query:
+            return None
+        kept, used_rules = [], set()
+        for item in parts.query.split("&"):
+            name = unquote_plus(item.split("=", 1)[0]).lower()
+            if name in self.TRACKING_PARAMS or name.startswith(self.TRACKING_PREFIXES):
+                used_rules.add(self.tracking_rule)
+                continue
+            rule = next((rule for rule in rules if name in rule.strip_params), None)
+            if rule is not None:
+                used_rules.add(rule)
+                continue
+            kept.append(item)
+        if not used_rules:
+            return None
+        for rule in used_rules:
+            rule.hits += 1
+        return urlunsplit(parts._replace(query="&".join(kept)))
+
+    def clean(self, url: str):
+        """Devuelve la URL limpia, o None si no hay nada que cambiar."""
+        cleaned = url
+        for _ in range(self.MAX_HOPS):
+            parts = urlsplit(cleaned)
+            if parts.scheme not in ("http", "https") or not parts.hostname:
+                break
+            rules = self._rules_for_host(parts.hostname)
+            for rule in rules:
+                if rule.target_params and rule.matches_path(parts.path) and \
+                   (target := self._embedded_url(parts.query, rule.target_params)):
+                    rule.hits += 1
+                    cleaned = target
+                    break
+            else:
+                cleaned = self._strip_params(parts, rules) or cleaned
+                break
+        return cleaned if cleaned != url else None
+
+class HttpsUpgrader:
+    """
+    Navegación HTTPS primero: decide qué hacer con una navegación principal por http:.
+
+    Los hosts de la lista de precarga HSTS (compilada desde 'assets/hsts_preload.txt') y los
+    que ya funcionaron por HTTPS se actualizan directamente; los que fallaron hace poco van
+    directos a la advertencia; el resto se prueba por HTTPS con un tiempo límite y, si falla,
+    se muestra la advertencia. Los resultados se guardan por host en 'https_upgrades.json'.
+
+    Para probarlo con servidores locales, WEMPHIX_HTTPS_UPGRADE_PORTS="8080:8443,..." indica
+    a qué puerto HTTPS se actualiza cada puerto HTTP (también en localhost).
+    """
+    UPGRADE, PROBE, WARN = "upgrade", "probe", "warn"
+    SUCCESS_TTL = 30 * 24 * 3600
+    FAILURE_TTL = 7 * 24 * 3600
+    MAX_HOSTS = 5000
+    LOOPBACK_HOSTS = frozenset({"localhost", "127.0.0.1", "::1"})
+
+    def __init__(self, preload_path=None, cache_path=None):
+        self.cache_path = cache_path
+        self._preload_exact, self._preload_subdomains = self.load_preload_list(preload_path)
+        self._outcomes = self._load_outcomes()
+        self.port_map = self._parse_port_map(os.environ.get("WEMPHIX_HTTPS_UPGRADE_PORTS", ""))
+
+    @staticmethod
+    def load_preload_list(path):
+        """Compila la lista de precarga: devuelve (dominios exactos, índice de dominios con subdominios)."""
+        exact, with_subdomains = set(), []
+        if path:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        fields = line.split("#", 1)[0].split()
+                        if not fields:
+                            continue
+                        domain = DomainSuffixIndex.normalize(fields[0])
+                        if fields[1:] == ["exact"]:
+                            exact.add(domain)
+                        else:
+                            with_subdomains.append(domain)
+            except IOError as e:
+                print(f"ADVERTENCIA: No se pudo leer la lista de precarga HSTS: {e}")
+        return frozenset(exact), DomainSuffixIndex(with_subdomains)
+
+    @staticmethod
+    def _parse_port_map(value: str):
+        port_map = {}
+        for pair in value.split(","):
+            http_port, _, https_port = pair.partition(":")
+            if http_port.strip().isdigit() and https_port.strip().isdigit():
+                port_map[int(http_port)] = int(https_port)
+        return port_map
+
+    def _load_outcomes(self):
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return {}
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                return {host: (bool(ok), float(timestamp)) for host, (ok, timestamp) in json.load(f).items()}
+        except (IOError, ValueError, TypeError) as e:
+            print(f"No se pudo leer la caché de actualizaciones HTTPS: {e}")
+            return {}
+
+    def save(self):
+        if not self.cache_path:
+            return
+        now = time.time()
+        current = {host: [ok, timestamp] for host, (ok, timestamp) in self._outcomes.items()
+                   if now - timestamp < (self.SUCCESS_TTL if ok else self.FAILURE_TTL)}
+        newest = dict(sorted(current.items(), key=lambda item: item[1][1], reverse=True)[:self.MAX_HOSTS])
+        try:
+            with open(self.cache_path, "w", encoding="utf-8") as f:
+                json.dump(newest, f)
+        except IOError as e:
+            print(f"No se pudo guardar la caché de actualizaciones HTTPS: {e}")
+
+    def is_preloaded(self, host: str) -> bool:
+        return host in self._preload_exact or self._preload_subdomains.contains(host)
+
+    def decide(self, host: str) -> str:
+        """Devuelve UPGRADE (se sabe que funciona), PROBE (hay que probar) o WARN (falló hace poco)."""
+        outcome = self._outcomes.get(host)
+        if outcome is not None:
+            ok, timestamp = outcome
+            if time.time() - timestamp < (self.SUCCESS_TTL if ok else self.FAILURE_TTL):
+                return self.UPGRADE if ok else self.WARN
+        return self.UPGRADE if self.is_preloaded(host) else self.PROBE
+
+    def record(self, host: str, ok: bool):
+        self._outcomes[host] = (ok, time.time())
+
+    def upgraded_url(self, url: str):
+        """Versión https: de una URL http:, o None si no se puede actualizar (puerto no estándar, localhost)."""
+        parts = urlsplit(url)
+        if parts.scheme != "http" or not parts.hostname:
+            return None
+        try:
+            port = parts.port
+        except ValueError:
+            return None
+        host = parts.hostname
+        netloc_host = f"[{host}]" if ":" in host else host
+        if port in self.port_map:
+            netloc = f"{netloc_host}:{self.port_map[port]}"
+        elif port in (None, 80) and host not in self.LOOPBACK_HOSTS:
+            netloc = netloc_host
+        else:
+            return None
+        if parts.username or parts.password:
+            return None
+        return urlunsplit(("https", netloc, parts.path, parts.query, parts.fragment))
+
+class InternalListPager:
+    """
+    Paginación por cursor de las listas que muestran las páginas internas (historial,
+    favoritos, descargas). El cursor es la posición de la lista por la que seguir y cada
+    petición examina como mucho MAX_SCAN entradas, así que pedir una página cuesta lo
+    mismo con mil entradas que con un millón, aunque haya un filtro de búsqueda.
+    """
+    DEFAULT_LIMIT = 50
+    MAX_LIMIT = 200
+    MAX_SCAN = 20000
+
+    @staticmethod
+    def _parse_int(value, default):
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return default
+
+    @classmethod
+    def page(cls, entries, query="", cursor=None, limit=DEFAULT_LIMIT, newest_first=True, fields=("title", "url")):
+        """
+        Devuelve (elementos, siguiente_cursor). Los elementos son pares (posición, entrada);
+        el cursor es None cuando no quedan más entradas que examinar. Si el filtro no
+        encuentra nada en MAX_SCAN entradas se devuelve una página vacía con cursor, y la
+        página interna sigue pidiendo.
+        """
+        count = len(entries)
+        limit = max(1, min(cls._parse_int(limit, cls.DEFAULT_LIMIT), cls.MAX_LIMIT))
+        step = -1 if newest_first else 1
+        position = cls._parse_int(cursor, count - 1 if newest_first else 0)
+        # Un cursor antiguo (p. ej. después de borrar entradas) se ajusta a la lista actual.
+        position = max(-1, min(position, count - 1)) if newest_first else max(0, min(position, count))
+        needle = query.strip().casefold()
+        items = []
+        scanned = 0
+        while 0 <= position < count and len(items) < limit and scanned < cls.MAX_SCAN:
+            entry = entries[position]
+            if not needle or any(needle in str(entry.get(field, "")).casefold() for field in fields):
+                items.append((position, entry))
+            position += step
+            scanned += 1
+        return items, (position if 0 <= position < count else None)
+
+class TopSites:
+    """
+    Sitios más visitados que muestra wemphix:newtab, con sus iconos y miniaturas.
+
+    Las visitas se cuentan por origen (esquema + host) a medida que se añaden al historial
+    y se guardan en 'top_sites.json', así que ni el arranque ni la página de nueva pestaña
+    recorren el historial. La lista ordenada se recalcula solo cuando una visita puede
+    cambiarla; las imágenes se guardan en la misma carpeta y se sirven desde memoria.
+    """
+    MAX_TILES = 8
+    MAX_TRACKED_SITES = 2000
+    FILE_NAME = "top_sites.json"
+    # Las miniaturas se vuelven a capturar como mucho una vez al día.
+    THUMBNAIL_MAX_AGE = 24 * 3600
+    IMAGE_EXTENSIONS = {"icon": ".png", "thumb": ".jpg"}
+    _IMAGE_NAME_RE = re.compile(r"^[0-9a-f]{16}-(icon\.png|thumb\.jpg)$")
+
+    def __init__(self, directory=None):
+        self.directory = directory
+        # origen -> [visitas, última visita, título]
+        self._sites = {}
+        self._top = None
+        # nombre de archivo -> [versión (mtime), datos o None si aún no se han leído]
+        self._images = {}
+        self._dirty = False
+
+    @staticmethod
+    def site_key(url: str):
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            return None
+        return f"{parts.scheme}://{parts.netloc.rpartition('@')[2].lower()}"
+
+    @classmethod
+    def load(cls, directory, history=()):
+        top_sites = cls(directory)
+        path = os.path.join(directory, cls.FILE_NAME) if directory else None
+        if not path or not os.path.exists(path):
+            top_sites.rebuild(history)
+            return top_sites
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            top_sites._sites = {key: [int(site[0]), float(site[1]), str(site[2])] for key, site in data["sites"].items()}
+        except (OSError, ValueError, TypeError, KeyError, IndexError, AttributeError) as e:
+            print(f"ADVERTENCIA: No se pudieron leer los sitios más visitados ({e}). Se recalculan desde el historial.")
+            top_sites.rebuild(history)
+        return top_sites
+
+    def save(self):
+        if not self.directory or not self._dirty:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(os.path.join(self.directory, self.FILE_NAME), "w", encoding="utf-8") as f:
+                json.dump({"sites": self._sites}, f, ensure_ascii=False)
+            self._dirty = False
+        except OSError as e:
+            print(f"No se pudieron guardar los sitios más visitados: {e}")
+
+    @staticmethod
+    def _rank(site):
+        return site[0], site[1]
+
+    def record(self, url: str, title: str, timestamp: float):
+        key = self.site_key(url)
+        if key is None:
+            return
+        site = self._sites.get(key)
+        if site is None:
+            if len(self._sites) >= self.MAX_TRACKED_SITES:
+                self._prune()
+            site = self._sites[key] = [0, 0.0, ""]
+        site[0] += 1
+        site[1] = max(site[1], timestamp)
+        # Se prefiere el título de la portada del sitio al de cualquier página interior.
+        if title and (not site[2] or urlsplit(url).path in ("", "/")):
+            site[2] = title
+        self._dirty = True
+        top = self._top
+        if top is not None and (key in top or len(top) < self.MAX_TILES
+                                or self._rank(site) > self._rank(self._sites[top[-1]])):
+            self._top = None
+
+    def _prune(self):
+        """Olvida la mitad menos visitada para que el archivo y la memoria no crezcan sin límite."""
+        ranked = sorted(self._sites, key=lambda key: self._rank(self._sites[key]))
+        for key in ranked[:len(ranked) // 2]:
+            del self._sites[key]
+        self._top = None
+
+    def rebuild(self, history):
+        """Recalcula las visitas desde el historial (al borrar entradas o importar)."""
+        self._sites = {}
+        self._top = None
+        for entry in history:
+            self.record(entry.get("url", ""), entry.get("title", ""), entry.get("timestamp", 0))
+        self._dirty = True
+
+    def top(self):
+        if self._top is None:
+            self._top = heapq.nlargest(self.MAX_TILES, self._sites, key=lambda key: self._rank(self._sites[key]))
+        return [{"key": key, "url": key + "/", "title": self._sites[key][2], "visits": self._sites[key][0]}
+                for key in self._top]
+
+    @classmethod
+    def image_name(cls, key: str, kind: str) -> str:
+        return f"{hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]}-{kind}{cls.IMAGE_EXTENSIONS[kind]}"
+
+    def _image_entry(self, name: str):
+        entry = self._images.get(name)
+        if entry is None:
+            try:
+                version = int(os.stat(os.path.join(self.directory, name)).st_mtime) if self.directory else 0
+            except OSError:
+                version = 0
+            entry = self._images[name] = [version, None]
+        return entry
+
+    def image_version(self, key: str, kind: str) -> int:
+        """Versión (mtime) de la imagen guardada, o 0 si no hay."""
+        return self._image_entry(self.image_name(key, kind))[0]
+
+    def image(self, name: str):
+        """Datos de una imagen por su nombre de archivo, o None."""
+        if not self.directory or not self._IMAGE_NAME_RE.match(name):
+            return None
+        entry = self._image_entry(name)
+        if entry[0] and entry[1] is None:
+            try:
+                with open(os.path.join(self.directory, name), "rb") as f:
+                    entry[1] = f.read()
+            except OSError:
+                return None
+        return entry[1]
+
+    def set_image(self, key: str, kind: str, data: bytes):
+        if not self.directory or not data:
+            return
+        name = self.image_name(key, kind)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(os.path.join(self.directory, name), "wb") as f:
+                f.write(data)
+        except OSError as e:
+            print(f"No se pudo guardar la imagen de '{key}': {e}")
+            return
+        self._images[name] = [int(time.time()), data]
+
+    def _is_top(self, key) -> bool:
+        return key is not None and any(site["key"] == key for site in self.top())
+
+    def needs_thumbnail(self, key) -> bool:
+        return self._is_top(key) and time.time() - self.image_version(key, "thumb") > self.THUMBNAIL_MAX_AGE
+
+    def needs_icon(self, key) -> bool:
+        return self._is_top(key) and not self.image_version(key, "icon")
+
+class NewTabPaintStats:
+    """
+    Tiempos de primer pintado de wemphix:newtab que informa la propia página
+    (first-contentful-paint), y desde que se pidió la pestaña hasta ese pintado.
+    """
+    # Objetivo para el p95 desde que se pide la pestaña hasta que se ve algo.
+    TARGET_MS = 150
+    MAX_SAMPLES = 200
+
+    def __init__(self):
+        self.first_paint_ms = deque(maxlen=self.MAX_SAMPLES)
+        self.open_to_paint_ms = deque(maxlen=self.MAX_SAMPLES)
+        # Si cada muestra de `open_to_paint_ms` vino de la reserva; se descarta con ella.
+        self.pooled_samples = deque(maxlen=self.MAX_SAMPLES)
+
+    def record(self, first_paint_ms=None, open_to_paint_ms=None, pooled=False):
+        """
+        `first_paint_ms` cuenta desde que empezó la navegación, así que no tiene sentido en las
+        pestañas de reserva (cargadas de antemano) y para ellas se pasa None.
+        """
+        if first_paint_ms is not None:
+            self.first_paint_ms.append(first_paint_ms)
+        if open_to_paint_ms is not None:
+            self.open_to_paint_ms.append(open_to_paint_ms)
+            self.pooled_samples.append(bool(pooled))
+
+    @property
+    def pooled(self) -> int:
+        """Cuántas de las muestras de `open_to_paint_ms` que se conservan vinieron de la reserva."""
+        return sum(self.pooled_samples)
+
+    @staticmethod
+    def percentile(samples, fraction: float) -> float:
+        if not samples:
+            return 0.0
+        ordered = sorted(samples)
+        return ordered[max(0, min(len(ordered) - 1, int(fraction * len(ordered) + 0.999999) - 1))]
+
+    def meets_target(self) -> bool:
+        samples = self.open_to_paint_ms or self.first_paint_ms
+        return bool(samples) and self.percentile(samples, 0.95) <= self.TARGET_MS
+
+    def summary(self) -> str:
+        if not self.first_paint_ms and not self.open_to_paint_ms:
+            return "sin mediciones"
+        parts = []
+        if self.first_paint_ms:
+            parts.append(f"primer pintado p50 {self.percentile(self.first_paint_ms, 0.5):.0f} ms · "
+                         f"p95 {self.percentile(self.first_paint_ms, 0.95):.0f} ms")
+        if self.open_to_paint_ms:
+            parts.append(f"desde que se pide la pestaña p50 {self.percentile(self.open_to_paint_ms, 0.5):.0f} ms · "
+                         f"p95 {self.percentile(self.open_to_paint_ms, 0.95):.0f} ms "
+                         f"({self.pooled} de {len(self.open_to_paint_ms)} desde la reserva)")
+        samples = max(len(self.first_paint_ms), len(self.open_to_paint_ms))
+        return f"{' · '.join(parts)} (objetivo p95 ≤ {self.TARGET_MS} ms, {samples} muestras)"
+
+class TabRecord:
+    """Lo que el navegador necesita de una pestaña, para no buscarlo en su árbol de widgets en cada señal."""
+    __slots__ = ("tab_id", "widget", "webview", "page", "index")
+
+    def __init__(self, tab_id, widget):
+        self.tab_id = tab_id
+        self.widget = widget
+        # Posición en la barra de pestañas (-1 si no está en ella). La mantiene TabListModel.
+        self.index = -1
+        # Se rellenan al crear el webview; en las pestañas provisionales siguen a None.
+        self.webview = None
+        self.page = None
+
+class TabRegistry:
+    """
+    Pestañas abiertas indexadas por `tab_id`, widget, webview y página. Los manejadores de
+    señales (título, icono, audio...) encuentran su pestaña con una consulta en vez de
+    recorrer todas con `findChild`, así que su coste no crece con el número de pestañas.
+    """
+    def __init__(self):
+        self._by_id = {}
+        self._by_widget = {}
+        self._by_webview = {}
+        self._by_page = {}
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def __iter__(self):
+        return iter(self._by_id.values())
+
+    def add(self, record: TabRecord):
+        self._by_id[record.tab_id] = record
+        self._by_widget[record.widget] = record
+        if record.webview is not None:
+            self._by_webview[record.webview] = record
+        if record.page is not None:
+            self._by_page[record.page] = record
+
+    def set_contents(self, record: TabRecord, webview, page):
+        """Asocia a la pestaña el webview creado al materializarla."""
+        self._by_webview.pop(record.webview, None)
+        self._by_page.pop(record.page, None)
+        record.webview, record.page = webview, page
+        self.add(record)
+
+    def remove(self, widget) -> TabRecord | None:
+        record = self._by_widget.pop(widget, None)
+        if record is not None:
+            self._by_id.pop(record.tab_id, None)
+            self._by_webview.pop(record.webview, None)
+            self._by_page.pop(record.page, None)
+        return record
+
+    def clear(self):
+        for index in (self._by_id, self._by_widget, self._by_webview, self._by_page):
+            index.clear()
+
+    def by_id(self, tab_id) -> TabRecord | None:
+        return self._by_id.get(tab_id)
+
+    def by_widget(self, widget) -> TabRecord | None:
+        return self._by_widget.get(widget)
+
+    def by_webview(self, webview) -> TabRecord | None:
+        return self._by_webview.get(webview)
+
+    def by_page(self, page) -> TabRecord | None:
+        return self._by_page.get(page)
+
+class TabDiscardCandidate:
+    """Lo que el programador de descarte necesita saber de una pestaña en segundo plano."""
+    __slots__ = ("key", "title", "last_active", "audible", "form_dirty", "grouped", "renderer_pid")
+
+    def __init__(self, key, title="", last_active=0.0, audible=False, form_dirty=False, grouped=False, renderer_pid=0):
+        self.key = key
+        self.title = title
+        self.last_active = last_active
+        self.audible = audible
+        self.form_dirty = form_dirty
+        self.grouped = grouped
+        self.renderer_pid = renderer_pid
+
+class TabDiscardScheduler:
+    """
+    Decide qué pestañas descartar (hibernar) cuando falta memoria, en vez de hacerlo con
+    todas las que llevan un rato inactivas.
+
+    Falta memoria si el navegador (con sus renderizadores) supera `budget_mb` o si la memoria
+    disponible del sistema baja de `min_available_mb`; un valor de 0 desactiva esa condición.
+    Entonces se descartan, empezando por las que llevan más tiempo sin usarse y dejando para
+    el final las que están en un grupo, solo las pestañas necesarias para cubrir lo que falta.
+    Nunca se descartan las que suenan, las que tienen un formulario a medio rellenar ni las
+    usadas en el último `MIN_IDLE_S`.
+
+    Lo que libera cada pestaña se estima con la memoria de su renderizador repartida entre las
+    pestañas que lo comparten; si se queda corto, la siguiente pasada descarta alguna más.
+
+    Para probarlo sin quedarse de verdad sin memoria, WEMPHIX_SIMULATED_AVAILABLE_MB="300" hace
+    que la memoria disponible del sistema se lea como ese valor.
+    """
+    DEFAULT_BUDGET_MB = 0
+    DEFAULT_MIN_AVAILABLE_MB = 512
+    MIN_IDLE_S = 60
+
+    def __init__(self, budget_mb=DEFAULT_BUDGET_MB, min_available_mb=DEFAULT_MIN_AVAILABLE_MB):
+        self.budget_mb = budget_mb
+        self.min_available_mb = min_available_mb
+        self.simulated_available_mb = self._parse_mb(os.environ.get("WEMPHIX_SIMULATED_AVAILABLE_MB", ""))
+
+    @staticmethod
+    def _parse_mb(value: str):
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            return None
+
+    def available_mb(self) -> float:
+        if self.simulated_available_mb is not None:
+            return self.simulated_available_mb
+        return psutil.virtual_memory().available / 1024 / 1024
+
+    @staticmethod
+    def process_memory_mb(pid=None) -> tuple:
+        """Memoria residente del proceso y sus hijos: (total en MB, {pid: MB}) ."""
+        process = psutil.Process(pid or os.getpid())
+        by_pid = {}
+        for proc in [process] + process.children(recursive=True):
+            try:
+                by_pid[proc.pid] = proc.memory_info().rss / 1024 / 1024
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                pass
+        return sum(by_pid.values()), by_pid
+
+    def excess_mb(self, browser_mb: float, available_mb: float) -> float:
+        """Cuánta memoria hay que liberar para volver a estar dentro de los límites."""
+        excess = 0.0
+        if self.budget_mb > 0:
+            excess = browser_mb - self.budget_mb
+        if self.min_available_mb > 0:
+            excess = max(excess, self.min_available_mb - available_mb)
+        return max(excess, 0.0)
+
+    def rank(self, candidates, now: float) -> list:
+        """Pestañas que se pueden descartar, en el orden en que se descartarían."""
+        eligible = [c for c in candidates
+                    if not c.audible and not c.form_dirty and now - c.last_active >= self.MIN_IDLE_S]
+        return sorted(eligible, key=lambda c: (c.grouped, c.last_active))
+
+    def plan(self, candidates, renderer_mb: dict, browser_mb: float, available_mb: float, now=None) -> list:
+        """Devuelve [(candidata, MB estimados)] con las pestañas que hay que descartar, en orden."""
+        excess = self.excess_mb(browser_mb, available_mb)
+        if excess <= 0:
+            return []
+        now = time.time() if now is None else now
+        sharing = {}
+        for candidate in candidates:
+            sharing[candidate.renderer_pid] = sharing.get(candidate.renderer_pid, 0) + 1
+        decisions, freed = [], 0.0
+        for candidate in self.rank(candidates, now):
+            if freed >= excess:
+                break
+            estimate = renderer_mb.get(candidate.renderer_pid, 0.0) / sharing[candidate.renderer_pid]
+            decisions.append((candidate, estimate))
+            freed += estimate
+        return decisions
+
+class BlockListPart:
+    """Índices ya construidos de una fuente de reglas: la lista descargada o la del usuario."""
+    __slots__ = ("domain_index", "filter_engine", "cosmetic_rules")
+
+    def __init__(self, domain_index=None, filter_engine=None, cosmetic_rules=()):
+        self.domain_index = domain_index if domain_index is not None else DomainSuffixIndex()
+        self.filter_engine = filter_engine if filter_engine is not None else FilterEngine()
+        self.cosmetic_rules = tuple(cosmetic_rules)
+
+    @staticmethod
+    def _split_cosmetic(rules):
+        return [rule for rule in rules if not FilterEngine.is_network_rule(rule)]
+
+    @classmethod
+    def from_list_file(cls, path):
+        """Carga la lista desde su versión compilada (`.bin`), recompilándola si el texto cambió."""
+        compiled_path = os.path.splitext(path)[0] + ".bin"
+        try:
+            domain_index = CompiledDomainList.load(path, compiled_path)
+            print(f"Lista de bloqueo de anuncios cargada con {len(domain_index)} dominios.")
+        except FileNotFoundError:
+            print("Archivo de lista de bloqueo no encontrado. El bloqueador estará inactivo hasta que se actualice.")
+            return cls()
+        except (OSError, struct.error) as e:
+            print(f"ERROR: No se pudo cargar la lista de bloqueo: {e}")
+            return cls()
+        rules = domain_index.filter_rules()
+        return cls(domain_index, FilterEngine(rules), cls._split_cosmetic(rules))
+
+    @classmethod
+    def from_text(cls, text: str):
+        domains, rules = CompiledDomainList.parse_lines(text.splitlines())
+        return cls(DomainSuffixIndex(domains), FilterEngine(rules), cls._split_cosmetic(rules))
+
+class _BlockState:
+    """Todo lo que consulta `interceptRequest`, agrupado para poder sustituirlo con una sola asignación."""
+    __slots__ = ("list_part", "user_part", "has_rules", "cosmetic_index", "malware_index", "host_cache")
+
+    def __init__(self, list_part, user_part, cosmetic_index, malware_index, host_cache):
+        self.list_part = list_part
+        self.user_part = user_part
+        self.has_rules = any(part.domain_index or part.filter_engine for part in (list_part, user_part))
+        self.cosmetic_index = cosmetic_index
+        self.malware_index = malware_index
+        self.host_cache = host_cache
+
 class AdBlockInterceptor(QWebEngineUrlRequestInterceptor):
     """Intercepta peticiones de red para bloquear anuncios y rastreadores."""
+    _RESOURCE_TYPE_NAMES = {
+        QWebEngineUrlRequestInfo.ResourceType.ResourceTypeMainFrame: "document",
+        QWebEngineUrlRequestInfo.ResourceType.ResourceTypeNavigationPreloadMainFrame: "document",
+        QWebEngineUrlRequestInfo.ResourceType.ResourceTypeSubFrame: "subdocument",
+        QWebEngineUrlRequestInfo.ResourceType.ResourceTypeNavigationPreloadSubFrame: "subdocument",
+        QWebEngineUrlRequestInfo.ResourceType.ResourceTypeStylesheet: "stylesheet",
+        QWebEngineUrlRequestInfo.ResourceType.ResourceTypeScript: "script",
+        QWebEngineUrlRequestInfo.ResourceType.ResourceTypeImage: "image",
+        QWebEngineUrlRequestInfo.ResourceType.ResourceTypeFavicon: "image",
+        QWebEngineUrlRequestInfo.ResourceType.ResourceTypeFontResource: "font",
+        QWebEngineUrlRequestInfo.ResourceType.ResourceTypeMedia: "media",
+        QWebEngineUrlRequestInfo.ResourceType.ResourceTypeObject: "object",
+        QWebEngineUrlRequestInfo.ResourceType.ResourceTypePluginResource: "object",
+        QWebEngineUrlRequestInfo.ResourceType.ResourceTypeXhr: "xmlhttprequest",
+        QWebEngineUrlRequestInfo.ResourceType.ResourceTypePing: "ping",
+    }
+    if hasattr(QWebEngineUrlRequestInfo.ResourceType, "ResourceTypeWebSocket"):
+        _RESOURCE_TYPE_NAMES[QWebEngineUrlRequestInfo.ResourceType.ResourceTypeWebSocket] = "websocket"
+    _NAVIGATION_RESOURCE_TYPES = (
+        QWebEngineUrlRequestInfo.ResourceType.ResourceTypeMainFrame,
+        QWebEngineUrlRequestInfo.ResourceType.ResourceTypeSubFrame,
+    )
+    # Marcas que se guardan por host en la caché de decisiones.
+    HOST_BLOCKED = 1
+    HOST_MALWARE = 2
+    HOST_USER_BLOCKED = 4
+
     def __init__(self, parent=None):
         super().__init__(parent)
-        self.enabled = True
-        self.ad_block_list = set()
-        self.user_block_list = set()
-        self.full_block_list = set()
+        self.enabled = True
+        # Si está activo, nunca se bloquean las peticiones al mismo sitio (eTLD+1) que la página.
+        self.third_party_only = False
+        self.list_part = BlockListPart()
+        self.user_part = BlockListPart()
+        self.state = _BlockState(self.list_part, self.user_part, CosmeticFilterIndex(), CompiledDomainList(), HostDecisionCache())
+        self.stats = RequestStats()
+        self.last_decision = None
+        self.data_saver = None
+        self.data_saver_savings = DataSaverSavings()
+        # PAC con el que arrancó Chromium (ListProxyAutoConfig), hosts de la lista que una excepción
+        # `@@||host^` ha permitido ({host: última vez}, el próximo PAC los dejará pasar) y hosts ya revisados.
+        self.proxy_auto_config = None
+        self.allowed_listed_hosts = {}
+        self._checked_allowed_hosts = set()
+        self.url_cleaner = None
+
+    def setEnabled(self, enabled):
+        self.enabled = enabled
+
+    def set_third_party_only(self, third_party_only):
+        self.third_party_only = third_party_only
+
+    def set_data_saver(self, policy):
+        """Activa (o desactiva con None) el modo de ahorro de datos para las peticiones siguientes."""
+        self.data_saver = policy
+
+    @staticmethod
+    def build_parts(list_part, user_part, list_path=None, user_text=None):
+        """
+        Construye los índices que cambian (la lista descargada si se da `list_path`, la del
+        usuario si se da `user_text`) y la hoja de ocultación combinada. No toca el estado
+        del interceptor, así que puede ejecutarse en un hilo aparte.
+        Devuelve (list_part, user_part, cosmetic_index).
+        """
+        if list_path is not None:
+            list_part = BlockListPart.from_list_file(list_path)
+        if user_text is not None:
+            user_part = BlockListPart.from_text(user_text)
+        cosmetic_index = CosmeticFilterIndex(itertools.chain(list_part.cosmetic_rules, user_part.cosmetic_rules))
+        return list_part, user_part, cosmetic_index
+
+    def set_parts(self, list_part, user_part, cosmetic_index):
+        """Sustituye de una vez todo el estado que consulta `interceptRequest`."""
+        self.list_part, self.user_part = list_part, user_part
+        # La lista del usuario es una capa aparte: se consulta después de la principal, sin unirlas.
+        self.state = _BlockState(
+            list_part,
+            user_part,
+            cosmetic_index,
+            self.state.malware_index,
+            self.state.host_cache.invalidated(),
+        )
+        print(f"Índices de bloqueo actualizados: {len(list_part.domain_index)} dominios de la lista, "
+              f"{len(user_part.domain_index)} del usuario, "
+              f"{list_part.filter_engine.rule_count + user_part.filter_engine.rule_count} reglas de filtro, "
+              f"{cosmetic_index.rule_count} reglas de ocultación.")
+
+    def load_ad_block_list(self, path, user_text=None):
+        """Carga de forma síncrona la lista de bloqueo (y opcionalmente la del usuario)."""
+        self.set_parts(*self.build_parts(self.list_part, self.user_part, path, user_text))
+
+    def set_malware_index(self, malware_index):
+        """Sustituye la lista de sitios peligrosos, que se comprueba para todo tipo de recurso."""
+        state = self.state
+        self.state = _BlockState(state.list_part, state.user_part, state.cosmetic_index,
+                                 malware_index, state.host_cache.invalidated())
+
+    def set_host_cache_capacity(self, capacity: int):
+        self.state.host_cache.capacity = max(0, capacity)
+
+    def interceptRequest(self, info):
+        info.setHttpHeader(b"DNT", b"1")
+        start = time.perf_counter_ns()
+        reason = self._block_reason(info)
+        if reason is None and self.data_saver is not None:
+            reason = self._data_saver_reason(info)
+        elapsed_ns = time.perf_counter_ns() - start
+        if reason:
+            info.block(True)
+        elif self.url_cleaner is not None and info.resourceType() in self._NAVIGATION_RESOURCE_TYPES \
+                and info.requestMethod().data() == b"GET":
+            # Aquí llegan también las redirecciones del servidor, que no pasan por acceptNavigationRequest.
+            if (cleaned := self.url_cleaner.clean(info.requestUrl().toString())):
+                info.redirect(QUrl(cleaned))
+
+        first_party = info.firstPartyUrl()
+        self.stats.record(f"{first_party.scheme()}://{first_party.host()}", reason is not None, elapsed_ns)
+        # Qt llama a los interceptores de página justo después de este, en el mismo hilo.
+        self.last_decision = (info.requestUrl(), reason)
+
+    def _data_saver_reason(self, info):
+        request_url = info.requestUrl()
+        if request_url.scheme() not in DataSaverPolicy.NETWORK_SCHEMES:
+            return None
+        resource_type = self._RESOURCE_TYPE_NAMES.get(info.resourceType(), "other")
+        policy = self.data_saver
+        if not policy.blocks(resource_type, request_url.host(), info.firstPartyUrl().host()):
+            return None
+        self.data_saver_savings.record(policy.mode, resource_type)
+        return "datasaver"
+
+    def _block_reason(self, info):
+        """Devuelve "malware", "adblock" o None según si hay que bloquear la petición."""
+        state = self.state
+        ad_block_active = self.enabled and state.has_rules
+        if not (ad_block_active or state.malware_index):
+            return None
+
+        request_url = info.requestUrl()
+        host = request_url.host()
+        flags = state.host_cache.get(host)
+        if flags is None:
+            # Para "ads.example.com" cada índice comprueba "ads.example.com" y "example.com".
+            flags = 0
+            if state.list_part.domain_index.contains(host):
+                flags |= self.HOST_BLOCKED
+            if state.user_part.domain_index.contains(host):
+                flags |= self.HOST_USER_BLOCKED
+            if state.malware_index.contains(host):
+                flags |= self.HOST_MALWARE
+            state.host_cache.put(host, flags)
+
+        resource_type = info.resourceType()
+        # El marco principal lo comprueba `acceptNavigationRequest`, que muestra la advertencia.
+        if flags & self.HOST_MALWARE and resource_type != QWebEngineUrlRequestInfo.ResourceType.ResourceTypeMainFrame:
+            return "malware"
+        if not ad_block_active:
+            return None
+
+        first_party_host = info.firstPartyUrl().host()
+        if self.third_party_only and first_party_host and registrable_domain(host) == registrable_domain(first_party_host):
+            return None
+        blocked = bool(flags & self.HOST_BLOCKED)
+        list_engine, user_engine = state.list_part.filter_engine, state.user_part.filter_engine
+        if list_engine or user_engine:
+            url = request_url.toString()
+            resource_type_name = self._RESOURCE_TYPE_NAMES.get(resource_type, "other")
+            if list_engine:
+                blocked = list_engine.should_block(url, host, first_party_host, resource_type_name, blocked)
+        # Un dominio que bloqueó el usuario no lo desbloquean las excepciones de la lista descargada,
+        # pero sí las suyas: sus reglas van después y pueden anular cualquier bloqueo.
+        blocked = blocked or bool(flags & self.HOST_USER_BLOCKED)
+        if user_engine:
+            blocked = user_engine.should_block(url, host, first_party_host, resource_type_name, blocked)
+        if flags & self.HOST_BLOCKED and not blocked and self.proxy_auto_config is not None:
+            self._note_allowed_listed_host(host, url, first_party_host, resource_type_name)
+        return "adblock" if blocked else None
+
+    def _note_allowed_listed_host(self, host, url, first_party_host, resource_type):
+        """
+        Las reglas han permitido un host de la lista con el PAC activo. Solo se anota para el
+        próximo PAC si lo permite una excepción de todo el host (`@@||host^`): con una más
+        concreta (una ruta, `$domain=`, `$image`...) el PAC dejaría de bloquear el resto del host.
+        """
+        if host in self._checked_allowed_hosts:
+            return
+        self._checked_allowed_hosts.add(host)
+        state = self.state
+        exceptions = itertools.chain(
+            state.user_part.filter_engine.matching_exceptions(url, host, first_party_host, resource_type),
+            state.list_part.filter_engine.matching_exceptions(url, host, first_party_host, resource_type))
+        if (exempted := next(filter(None, (rule.exempted_host() for rule in exceptions)), None)):
+            self.allowed_listed_hosts[exempted] = time.time()
+        if self.proxy_auto_config.blocks(host):
+            print(f"ADVERTENCIA: Las reglas permiten '{host}', pero el PAC de la lista lo bloquea hasta reiniciar Wemphix.")
+
+class TabRequestInterceptor(QWebEngineUrlRequestInterceptor):
+    """
+    Interceptor de página que atribuye a su pestaña las decisiones del bloqueador.
+
+    Qt lo llama después del interceptor del perfil, que es el que bloquea; aquí se cuentan
+    las peticiones de esta página, se anotan en su registro de seguridad las que iban a
+    sitios peligrosos y se aplica el límite de imágenes por página del modo de ahorro de
+    datos. Los contadores se reinician en cada carga principal.
+    """
+    MAX_SECURITY_EVENTS = 100
+
+    def __init__(self, ad_blocker: AdBlockInterceptor, parent=None):
+        super().__init__(parent)
+        self.ad_blocker = ad_blocker
+        self.stats = RequestStats(track_origins=False)
+        self.security_events = deque(maxlen=self.MAX_SECURITY_EVENTS)
+        self.images_loaded = 0
 
-    def setEnabled(self, enabled):
-        self.enabled = enabled
+    def log_security_event(self, kind: str, url: str, detail: str = ""):
+        self.security_events.append({"time": time.time(), "kind": kind, "url": url, "detail": detail})
 
-    def _update_full_block_list(self):
-        """Reconstruye la lista de bloqueo unificada y cacheada."""
-        self.full_block_list = self.ad_block_list.union(self.user_block_list)
-        print(f"Lista de bloqueo unificada actualizada con {len(self.full_block_list)} dominios.")
+    def interceptRequest(self, info):
+        resource_type = info.resourceType()
+        if resource_type == QWebEngineUrlRequestInfo.ResourceType.ResourceTypeMainFrame:
+            self.stats.reset()
+            self.images_loaded = 0
+        request_url = info.requestUrl()
+        decision = self.ad_blocker.last_decision
+        reason = decision[1] if decision is not None and decision[0] == request_url else None
+        policy = self.ad_blocker.data_saver
+        if reason is None and policy is not None and policy.image_budget and \
+           resource_type == QWebEngineUrlRequestInfo.ResourceType.ResourceTypeImage and \
+           request_url.scheme() in DataSaverPolicy.NETWORK_SCHEMES:
+            self.images_loaded += 1
+            if self.images_loaded > policy.image_budget:
+                info.block(True)
+                self.ad_blocker.data_saver_savings.record(policy.mode, "image")
+                reason = "datasaver"
+        self.stats.record(None, reason is not None)
+        if reason == "malware":
+            resource_type_name = AdBlockInterceptor._RESOURCE_TYPE_NAMES.get(resource_type, "other")
+            self.log_security_event("malware", request_url.toString(), f"Recurso bloqueado ({resource_type_name})")
+
+class InternalPageSchemeHandler(QWebEngineUrlSchemeHandler):
+    """
+    Sirve las páginas internas `wemphix:` (error de conexión, advertencias, historial...) desde memoria.
 
-    def load_ad_block_list(self, path):
-        try:
-            with open(path, "r", encoding="utf-8") as f:
-                domains = {line.strip() for line in f if line.strip() and not line.startswith('#')}
-                self.ad_block_list = domains
-                print(f"Lista de bloqueo de anuncios cargada con {len(self.ad_block_list)} dominios.")
-        except FileNotFoundError:
-            print("Archivo de lista de bloqueo no encontrado. El bloqueador estará inactivo hasta que se actualice.")
-            self.ad_block_list = set()
-        self._update_full_block_list()
+    La primera vez que se crea carga las plantillas de 'assets/pages' y los recursos que
+    usan, y da a cada recurso una URL con el hash de su contenido
+    (`wemphix:assets/<hash>/<nombre>`) que se sirve como inmutable. Las páginas se generan
+    sustituyendo `{{parámetro}}` por los valores (escapados) de la query de la URL, así que
+    mostrar una página de error no lee nada del disco ni codifica imágenes en base64.
 
-    def update_user_block_list(self, domains_text: str):
-        self.user_block_list = {line.strip() for line in domains_text.splitlines() if line.strip()}
-        print(f"Lista de bloqueo de usuario actualizada con {len(self.user_block_list)} dominios.")
-        self._update_full_block_list()
+    Las páginas de historial, favoritos y descargas piden sus datos por páginas a
+    `wemphix:api/<lista>` (ver InternalListPager); la API solo responde a las páginas internas.
+    """
+    SCHEME = b"wemphix"
+    MIME_TYPES = {".html": b"text/html", ".css": b"text/css", ".js": b"text/javascript",
+                  ".png": b"image/png", ".svg": b"image/svg+xml"}
+    _ASSET_REFERENCE_RE = re.compile(r"\{\{asset:([\w.-]+)\}\}")
+    # `{{parámetro}}` se escapa; `{{{fragmento}}}` es HTML ya generado por el navegador.
+    _PARAMETER_RE = re.compile(r"\{\{\{(\w+)\}\}\}|\{\{(\w+)\}\}")
+    # Páginas cargadas: nombre -> plantilla; recursos: nombre -> (hash, datos, tipo MIME).
+    _templates = None
+    _assets = None
+    _cache_lock = threading.Lock()
+    # Rutas de la API: (método, ruta) -> nombre del método que la atiende.
+    API_ROUTES = {
+        (b"GET", "history"): "_api_history",
+        (b"POST", "history/delete"): "_api_history_delete",
+        (b"GET", "bookmarks"): "_api_bookmarks",
+        (b"POST", "bookmarks/delete"): "_api_bookmarks_delete",
+        (b"GET", "downloads"): "_api_downloads",
+        (b"POST", "downloads/action"): "_api_downloads_action",
+        (b"POST", "newtab/paint"): "_api_newtab_paint",
+    }
+
+    @classmethod
+    def register_scheme(cls):
+        """Registra el esquema `wemphix:`. Tiene que hacerse antes de crear QApplication."""
+        scheme = QWebEngineUrlScheme(cls.SCHEME)
+        scheme.setSyntax(QWebEngineUrlScheme.Syntax.Path)
+        # LocalScheme impide que las páginas web enlacen o incrusten las páginas internas.
+        flags = (QWebEngineUrlScheme.Flag.SecureScheme | QWebEngineUrlScheme.Flag.LocalScheme |
+                 QWebEngineUrlScheme.Flag.LocalAccessAllowed | QWebEngineUrlScheme.Flag.CorsEnabled)
+        # fetch() solo puede usar esquemas propios desde Qt 6.6.
+        if hasattr(QWebEngineUrlScheme.Flag, "FetchApiAllowed"):
+            flags |= QWebEngineUrlScheme.Flag.FetchApiAllowed
+        scheme.setFlags(flags)
+        QWebEngineUrlScheme.registerScheme(scheme)
+
+    def __init__(self, main_window=None):
+        super().__init__(main_window)
+        self.main_window = main_window
+        self.load_cache()
 
-    def interceptRequest(self, info):
-        info.setHttpHeader(b"DNT", b"1")
+    @classmethod
+    def load_cache(cls):
+        with cls._cache_lock:
+            if cls._templates is not None:
+                return
+            pages_dir = get_asset_path("pages")
+            raw_templates, assets = {}, {}
+            try:
+                file_names = sorted(os.listdir(pages_dir))
+            except OSError as e:
+                print(f"ADVERTENCIA: No se encontraron las páginas internas en '{pages_dir}': {e}")
+                file_names = []
+            for file_name in file_names:
+                name, extension = os.path.splitext(file_name)
+                with open(os.path.join(pages_dir, file_name), "rb") as f:
+                    data = f.read()
+                if extension == ".html":
+                    raw_templates[name] = data.decode("utf-8")
+                elif extension in cls.MIME_TYPES:
+                    assets[file_name] = data
+            # Las imágenes que usan las plantillas están en la carpeta 'assets' general.
+            for template in raw_templates.values():
+                for asset_name in cls._ASSET_REFERENCE_RE.findall(template):
+                    if asset_name not in assets:
+                        try:
+                            with open(get_asset_path(asset_name), "rb") as f:
+                                assets[asset_name] = f.read()
+                        except OSError:
+                            print(f"ADVERTENCIA: Falta el recurso '{asset_name}' de las páginas internas.")
+            cls._assets = {
+                name: (hashlib.sha256(data).hexdigest()[:16], data,
+                       cls.MIME_TYPES.get(os.path.splitext(name)[1], b"application/octet-stream"))
+                for name, data in assets.items()
+            }
+            # Las referencias a recursos se resuelven una sola vez, al cargar.
+            cls._templates = {name: cls._ASSET_REFERENCE_RE.sub(lambda m: cls.asset_url(m.group(1)), template)
+                              for name, template in raw_templates.items()}
 
-        if not self.enabled or not self.full_block_list:
-            return
+    @classmethod
+    def asset_url(cls, name: str) -> str:
+        asset = cls._assets.get(name)
+        return f"wemphix:assets/{asset[0]}/{name}" if asset else ""
 
-        host = info.requestUrl().host()
-        # Comprueba de forma eficiente si el host o cualquiera de sus dominios padre están en la lista de bloqueo.
-        # Ejemplo: para "ads.example.com", comprueba "ads.example.com", "example.com".
-        host_parts = host.split('.')
-        for i in range(len(host_parts)):
-            domain_to_check = ".".join(host_parts[i:])
-            if domain_to_check in self.full_block_list:
-                info.block(True)
+    @staticmethod
+    def page_url(page: str, **params) -> QUrl:
+        """URL de una página interna con sus parámetros, p. ej. page_url("error", url="https://...")."""
+        query = urlencode(params)
+        return QUrl(f"wemphix:{page}?{query}" if query else f"wemphix:{page}")
+
+    @staticmethod
+    def _page_parameters(url: QUrl) -> dict:
+        params = dict(parse_qsl(url.query(QUrl.ComponentFormattingOption.FullyEncoded)))
+        target = params.get("url", "")
+        # Solo se enlaza a destinos web: nada de `javascript:` ni otros esquemas en los botones.
+        if urlsplit(target).scheme not in ("http", "https"):
+            target = ""
+        params["url"] = target
+        params["host"] = urlsplit(target).hostname or ""
+        params["https_note"] = "Este sitio no está disponible por HTTPS. " if params.get("https_failed") else ""
+        palette = QApplication.instance().palette()
+        params["theme"] = "dark" if palette.color(QPalette.ColorRole.Window).lightness() < 128 else "light"
+        return params
+
+    @classmethod
+    def render(cls, page: str, params: dict, fragments=None):
+        """
+        Rellena una plantilla. Los fragmentos solo pueden venir del navegador, nunca de la
+        query de la URL, y se sustituyen en la misma pasada para no volver a interpretar su contenido.
+        """
+        template = cls._templates.get(page)
+        if template is None:
+            return None
+        fragments = fragments or {}
+
+        def substitute(match):
+            if match.group(1):
+                return fragments.get(match.group(1), "")
+            return html.escape(str(params.get(match.group(2), "")))
+        return cls._PARAMETER_RE.sub(substitute, template)
+
+    def _newtab_content(self, params: dict):
+        """Parámetros y mosaicos de wemphix:newtab, generados desde la lista ya calculada de TopSites."""
+        search_template = self.main_window.settings.value("search_engine", "https://www.google.com/search?q={}")
+        params["search_template"] = search_template if urlsplit(search_template).scheme in ("http", "https") else ""
+        top_sites = self.main_window.top_sites
+        tiles = []
+        for site in (top_sites.top() if top_sites else []):
+            label = urlsplit(site["url"]).hostname.removeprefix("www.")
+            thumbnail = self._top_site_image_url(site["key"], "thumb")
+            icon = self._top_site_image_url(site["key"], "icon")
+            if thumbnail:
+                preview = f'<img class="tile-thumb" src="{html.escape(thumbnail)}" alt="">'
+            else:
+                preview = f'<span class="tile-thumb tile-letter">{html.escape(label[:1].upper())}</span>'
+            icon_html = f'<img class="tile-icon" src="{html.escape(icon)}" alt="">' if icon else ""
+            tiles.append(f'<a class="tile" href="{html.escape(site["url"])}" title="{html.escape(site["title"] or label)}">'
+                         f'{preview}<span class="tile-label">{icon_html}{html.escape(label)}</span></a>')
+        if not tiles:
+            tiles.append('<p class="tiles-empty">Los sitios que más visites aparecerán aquí.</p>')
+        return params, {"tiles": "\n".join(tiles)}
+
+    def _top_site_image_url(self, key: str, kind: str) -> str:
+        # La versión va en la URL, así que la imagen se puede guardar en caché como inmutable.
+        version = self.main_window.top_sites.image_version(key, kind)
+        return f"wemphix:newtab-image/{TopSites.image_name(key, kind)}?v={version}" if version else ""
+
+    def requestStarted(self, job):
+        url = job.requestUrl()
+        path = url.path()
+        if path.startswith("assets/"):
+            _, content_hash, name = (path.split("/", 2) + ["", ""])[:3]
+            asset = self._assets.get(name)
+            if asset is None or asset[0] != content_hash:
+                job.fail(QWebEngineUrlRequestJob.Error.UrlNotFound)
+                return
+            self._reply(job, asset[2], asset[1], "public, max-age=31536000, immutable", asset[0])
+            return
+        if path.startswith("api/"):
+            self._handle_api(job, path[len("api/"):], parse_qsl(url.query(QUrl.ComponentFormattingOption.FullyEncoded)))
+            return
+        if path.startswith("newtab-image/"):
+            name = path[len("newtab-image/"):]
+            top_sites = self.main_window.top_sites if self.main_window else None
+            if not top_sites or (data := top_sites.image(name)) is None:
+                job.fail(QWebEngineUrlRequestJob.Error.UrlNotFound)
                 return
+            mime = b"image/jpeg" if name.endswith(".jpg") else b"image/png"
+            self._reply(job, mime, data, "private, max-age=31536000, immutable")
+            return
+        params, fragments = self._page_parameters(url), None
+        if path == "newtab" and self.main_window is not None:
+            params, fragments = self._newtab_content(params)
+        body = self.render(path, params, fragments)
+        if body is None:
+            job.fail(QWebEngineUrlRequestJob.Error.UrlNotFound)
+            return
+        self._reply(job, b"text/html; charset=utf-8", body.encode("utf-8"), "no-store")
+
+    def _handle_api(self, job, route: str, query: list):
+        # Las páginas web nunca pueden leer el historial ni tocar las descargas.
+        if self.main_window is None or job.initiator().scheme() not in ("", "wemphix"):
+            job.fail(QWebEngineUrlRequestJob.Error.RequestDenied)
+            return
+        handler_name = self.API_ROUTES.get((bytes(job.requestMethod()), route))
+        if handler_name is None:
+            job.fail(QWebEngineUrlRequestJob.Error.UrlNotFound)
+            return
+        try:
+            result = getattr(self, handler_name)(query)
+        except Exception as e:
+            print(f"Error en la API interna '{route}': {e}")
+            job.fail(QWebEngineUrlRequestJob.Error.RequestFailed)
+            return
+        data = json.dumps(result, ensure_ascii=False).encode("utf-8")
+        self._reply(job, b"application/json", data, "no-store", cors=True)
+
+    @staticmethod
+    def _list_response(items, cursor, serialize) -> dict:
+        return {"items": [serialize(entry) for _, entry in items], "next": cursor}
+
+    def _api_history(self, query: list) -> dict:
+        params = dict(query)
+        items, cursor = InternalListPager.page(self.main_window.history, params.get("q", ""), params.get("cursor"),
+                                               params.get("limit", InternalListPager.DEFAULT_LIMIT))
+        return self._list_response(items, cursor, lambda entry: {
+            "url": entry.get("url", ""), "title": entry.get("title", ""), "timestamp": entry.get("timestamp", 0)})
+
+    def _api_history_delete(self, query: list) -> dict:
+        # Cada entrada llega como un par t=<timestamp>&u=<url>, que es como la identifica el historial.
+        timestamps = [value for key, value in query if key == "t"]
+        urls = [value for key, value in query if key == "u"]
+        entries = []
+        for timestamp, url in zip(timestamps, urls):
+            try:
+                entries.append({"url": url, "timestamp": float(timestamp)})
+            except ValueError:
+                continue
+        count = len(self.main_window.history)
+        self.main_window._delete_history_entries(entries)
+        return {"deleted": count - len(self.main_window.history)}
+
+    def _api_bookmarks(self, query: list) -> dict:
+        params = dict(query)
+        manager = self.main_window._get_bookmark_manager()
+        items, cursor = InternalListPager.page(manager.bookmarks if manager else [], params.get("q", ""),
+                                               params.get("cursor"), params.get("limit", InternalListPager.DEFAULT_LIMIT),
+                                               newest_first=False)
+        return self._list_response(items, cursor, lambda bookmark: {
+            "url": bookmark.get("url", ""), "title": bookmark.get("title", "")})
+
+    def _api_bookmarks_delete(self, query: list) -> dict:
+        urls = {value for key, value in query if key == "url"}
+        return {"deleted": self.main_window._delete_bookmarks(urls)}
+
+    def _api_downloads(self, query: list) -> dict:
+        params = dict(query)
+        # Las descargas son solo las de esta sesión, así que se pueden describir todas.
+        downloads = [self.main_window._describe_download(download, info)
+                     for download, info in self.main_window.downloads.items()]
+        items, cursor = InternalListPager.page(downloads, params.get("q", ""), params.get("cursor"),
+                                               params.get("limit", InternalListPager.DEFAULT_LIMIT), fields=("file", "url"))
+        return self._list_response(items, cursor, lambda description: description)
+
+    def _api_downloads_action(self, query: list) -> dict:
+        params = dict(query)
+        actions = {
+            "pause": self.main_window._toggle_pause_resume_download,
+            "cancel": self.main_window._cancel_download,
+            "open": self.main_window._open_downloaded_file,
+            "show": self.main_window._show_download_in_folder,
+        }
+        action = actions.get(params.get("action"))
+        download_id = InternalListPager._parse_int(params.get("id"), -1)
+        download = next((d for d in self.main_window.downloads if d.id() == download_id), None)
+        if action is None or download is None:
+            return {"ok": False}
+        action(download)
+        return {"ok": True}
+
+    def _api_newtab_paint(self, query: list) -> dict:
+        params = dict(query)
+        try:
+            first_paint_ms, painted_at_ms = float(params["fcp"]), float(params["painted_at"])
+        except (KeyError, ValueError):
+            return {"ok": False}
+        self.main_window._record_newtab_paint(first_paint_ms, painted_at_ms)
+        return {"ok": True}
+
+    @staticmethod
+    def _reply(job, content_type: bytes, data: bytes, cache_control: str, etag: str = "", cors=False):
+        # Las cabeceras adicionales solo existen desde Qt 6.6.
+        if hasattr(job, "setAdditionalResponseHeaders"):
+            headers = {QByteArray(b"Cache-Control"): QByteArray(cache_control.encode())}
+            if etag:
+                headers[QByteArray(b"ETag")] = QByteArray(f'"{etag}"'.encode())
+            if cors:
+                # Las páginas `wemphix:` tienen un origen opaco, así que para fetch() la API es de otro origen.
+                headers[QByteArray(b"Access-Control-Allow-Origin")] = QByteArray(b"*")
+            job.setAdditionalResponseHeaders(headers)
+        # El buffer es hijo del trabajo, así que vive hasta que Chromium termina de leerlo.
+        buffer = QBuffer(job)
+        buffer.setData(data)
+        buffer.open(QIODevice.OpenModeFlag.ReadOnly)
+        job.reply(content_type, buffer)
 
 class CustomWebEnginePage(QWebEnginePage):
     """
@@ -204,17 +2784,34 @@ class CustomWebEnginePage(QWebEnginePage):
     """
     customDownloadRequested = pyqtSignal(QUrl)
 
+    # Tiempo que se espera a que responda por HTTPS un host que nunca se ha probado.
+    HTTPS_PROBE_TIMEOUT_MS = 4000
+    # Progreso que informa Chromium al empezar una carga, antes de recibir ninguna respuesta.
+    INITIAL_LOAD_PROGRESS = 10
+
     def __init__(self, profile, parent=None):
         super().__init__(profile, parent)
         self._is_showing_internal_page = False
+        self.tab_request_interceptor = None
+        # (host, URL http original) mientras se intenta cargar su versión https.
+        self._pending_https_upgrade = None
+        self._https_load_started = False
+        self._https_probe_timer = QTimer(self)
+        self._https_probe_timer.setSingleShot(True)
+        self._https_probe_timer.setInterval(self.HTTPS_PROBE_TIMEOUT_MS)
+        self._https_probe_timer.timeout.connect(lambda: self.triggerAction(QWebEnginePage.WebAction.Stop))
+        self.loadProgress.connect(self._on_load_progress)
+        self.loadingChanged.connect(self._on_loading_changed)
         self.loadFinished.connect(self._on_load_finished)
 
     def acceptNavigationRequest(self, url, type, isMainFrame):
-        if isMainFrame:
-            if self.url().toString() == "wemphix:security-warning":
-                # Permitir la navegación desde nuestra página de advertencia (p. ej., "Volver" o "Continuar").
-                self._is_showing_internal_page = False
-                return super().acceptNavigationRequest(url, type, isMainFrame)
+        if isMainFrame and self._is_warning_continue(url, type):
+            # El usuario ha pulsado "Continuar" en una de nuestras advertencias: se carga sin volver a comprobar.
+            if self.url().path() == "malware-warning" and self.tab_request_interceptor:
+                self.tab_request_interceptor.log_security_event("malware", url.toString(), "Advertencia ignorada por el usuario")
+            self._is_showing_internal_page = False
+            self._update_cosmetic_filters(url)
+            return super().acceptNavigationRequest(url, type, isMainFrame)
 
         if type == QWebEnginePage.NavigationType.NavigationTypeLinkClicked:
             scheme = url.scheme()
@@ -225,13 +2822,29 @@ class CustomWebEnginePage(QWebEnginePage):
 
         if isMainFrame:
             main_window = self.parent().window() if self.parent() and hasattr(self.parent(), 'window') else None
-            if main_window and hasattr(main_window, 'malware_blocker_list') and main_window.malware_blocker_list:
-                host = url.host()
-                if host in main_window.malware_blocker_list:
+            if type in (QWebEnginePage.NavigationType.NavigationTypeLinkClicked, QWebEnginePage.NavigationType.NavigationTypeTyped) \
+                    and (url_cleaner := getattr(main_window, 'url_cleaner', None)) \
+                    and (cleaned := url_cleaner.clean(url.toString())):
+                # Se navega directamente a la URL limpia; así la barra de direcciones y el historial no guardan la original.
+                self.setUrl(QUrl(cleaned))
+                return False
+
+            if main_window and hasattr(main_window, 'malware_index') and main_window.malware_index:
+                # Como en el bloqueador de anuncios, también se bloquean los subdominios de un dominio listado.
+                if main_window.malware_index.contains(url.host()):
+                    if self.tab_request_interceptor:
+                        self.tab_request_interceptor.log_security_event("malware", url.toString(), "Navegación bloqueada")
                     self._is_showing_internal_page = True
                     self._show_malware_warning_page(url)
                     return False
 
+            if self._pending_https_upgrade and type != QWebEnginePage.NavigationType.NavigationTypeRedirect:
+                # El usuario se ha ido a otro sitio antes de que terminara el intento por HTTPS.
+                self._cancel_https_upgrade()
+
+            if url.scheme() == 'http' and self._try_https_upgrade(url, type, main_window):
+                return False
+
             if url.scheme() == 'http':
                 if url.host() not in ["localhost", "127.0.0.1"]:
                     self._is_showing_internal_page = True
@@ -239,8 +2852,89 @@ class CustomWebEnginePage(QWebEnginePage):
                     return False
 
         self._is_showing_internal_page = False
+        if isMainFrame:
+            self._update_cosmetic_filters(url)
         return super().acceptNavigationRequest(url, type, isMainFrame)
 
+    def _is_warning_continue(self, url, type) -> bool:
+        current = self.url()
+        if current.scheme() != "wemphix" or current.path() not in ("security-warning", "malware-warning"):
+            return False
+        if type != QWebEnginePage.NavigationType.NavigationTypeLinkClicked:
+            return False
+        target = dict(parse_qsl(current.query(QUrl.ComponentFormattingOption.FullyEncoded))).get("url", "")
+        return QUrl(target) == url
+
+    def _try_https_upgrade(self, url, type, main_window) -> bool:
+        """
+        Intenta cargar la versión https de una navegación http:. Devuelve True si se ha
+        ocupado de la navegación (cargando la versión https o mostrando la advertencia).
+        """
+        upgrader = getattr(main_window, 'https_upgrader', None)
+        if upgrader is None:
+            return False
+        host = url.host()
+        if self._pending_https_upgrade and type == QWebEnginePage.NavigationType.NavigationTypeRedirect:
+            pending_host, original_url = self._pending_https_upgrade
+            self._cancel_https_upgrade()
+            if host == pending_host:
+                # La versión https ha redirigido de vuelta a http: el sitio no funciona por HTTPS.
+                upgrader.record(pending_host, False)
+                self._is_showing_internal_page = True
+                self._show_http_warning_page(original_url, https_failed=True)
+                return True
+            # Ha respondido por HTTPS y redirige a otro sitio por http:, que se prueba como una navegación nueva.
+            upgrader.record(pending_host, True)
+        if not (https_url := upgrader.upgraded_url(url.toString())):
+            return False
+        decision = upgrader.decide(host)
+        if decision == upgrader.WARN:
+            self._is_showing_internal_page = True
+            self._show_http_warning_page(url, https_failed=True)
+            return True
+        self._pending_https_upgrade = (host, QUrl(url))
+        self._https_load_started = False
+        if decision == upgrader.PROBE:
+            self._https_probe_timer.start()
+        self.setUrl(QUrl(https_url))
+        return True
+
+    def _cancel_https_upgrade(self):
+        self._pending_https_upgrade = None
+        self._https_load_started = False
+        self._https_probe_timer.stop()
+
+    def _on_load_progress(self, progress):
+        # Si la carga https avanza, ya ha recibido respuesta y el resto no tiene tiempo límite.
+        # `urlChanged` no sirve para esto: la URL visible cambia en cuanto empieza la navegación.
+        if self._https_load_started and progress > self.INITIAL_LOAD_PROGRESS:
+            self._https_probe_timer.stop()
+
+    def _on_loading_changed(self, loading_info):
+        """Anota el resultado del intento por HTTPS y, si ha fallado, muestra la advertencia."""
+        status = loading_info.status()
+        # Se ignoran los avisos de la navegación http: rechazada, que llegan después de iniciar la https.
+        if not self._pending_https_upgrade or loading_info.url().scheme() != "https":
+            return
+        if status == QWebEngineLoadingInfo.LoadStatus.LoadStartedStatus:
+            self._https_load_started = True
+            return
+        host, original_url = self._pending_https_upgrade
+        self._cancel_https_upgrade()
+        ok = status == QWebEngineLoadingInfo.LoadStatus.LoadSucceededStatus
+        main_window = self.parent().window() if self.parent() and hasattr(self.parent(), 'window') else None
+        if (upgrader := getattr(main_window, 'https_upgrader', None)) is not None:
+            upgrader.record(host, ok)
+        if not ok:
+            self._is_showing_internal_page = True
+            self._show_http_warning_page(original_url, https_failed=True)
+
+    def _update_cosmetic_filters(self, url):
+        """Prepara las hojas de ocultación de elementos para el sitio al que se va a navegar."""
+        main_window = self.parent().window() if self.parent() and hasattr(self.parent(), 'window') else None
+        if main_window and hasattr(main_window, '_update_cosmetic_filters'):
+            main_window._update_cosmetic_filters(self, url)
+
     def createStandardContextMenu(self):
         menu = super().createStandardContextMenu()
         context_data = self.contextMenuData()
@@ -308,8 +3002,12 @@ class CustomWebEnginePage(QWebEnginePage):
         self.runJavaScript(js_code)
 
     def _on_load_finished(self, ok):
+        if self._pending_https_upgrade:
+            # Lo resuelve `_on_loading_changed`, que sabe qué navegación ha terminado.
+            return
         if not ok:
-            if self._is_showing_internal_page:
+            # Si falla una página interna no se intenta mostrar otra, para no entrar en un bucle.
+            if self._is_showing_internal_page or self.url().scheme() == "wemphix":
                 return
 
             self._show_error_page()
@@ -317,160 +3015,17 @@ class CustomWebEnginePage(QWebEnginePage):
         self._is_showing_internal_page = False
 
     def _show_error_page(self):
-        image_path = get_asset_path("ConnectionFailed.png")
-
-        if not os.path.exists(image_path):
-            print(f"Advertencia: No se encontró la imagen de error en '{image_path}'")
-            self.setHtml("<h1>Error de Carga</h1><p>No se pudo cargar la página y no se encontró la imagen de error.</p>", self.url())
-            return
-
-        try:
-            with open(image_path, "rb") as image_file:
-                encoded_string = base64.b64encode(image_file.read()).decode('utf-8')
-            image_data_uri = f"data:image/png;base64,{encoded_string}"
-        except Exception as e:
-            print(f"Error al procesar la imagen de error: {e}")
-            self.setHtml("<h1>Error de Carga</h1><p>No se pudo cargar la página. Error al procesar recursos internos.</p>", self.url())
-            return
-
-        palette = QApplication.instance().palette()
-        is_dark_theme = palette.color(QPalette.ColorRole.Window).lightness() < 128
-
-        bg_color = "#2b2b2b" if is_dark_theme else "#f1f3f4"
-        text_color = "#dcdcdc" if is_dark_theme else "#202124"
-        secondary_text_color = "#9a9a9a" if is_dark_theme else "#5f6368"
-        img_filter = "filter: invert(1);" if not is_dark_theme else ""
-
-        html = f"""
-        <!DOCTYPE html>
-        <html><head><title>Error de conexión</title>
-        <style>
-            body {{ font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, "Helvetica Neue", Arial, sans-serif; background-color: {bg_color}; color: {text_color}; display: flex; justify-content: center; align-items: center; height: 100vh; margin: 0; }}
-            .container {{ display: flex; align-items: center; text-align: left; max-width: 600px; }}
-            .image-container {{ margin-right: 40px; }}
-            img {{ width: 80px; height: 80px; {img_filter} }}
-            h1 {{ font-size: 22px; font-weight: 500; margin-top: 0; margin-bottom: 16px; }}
-            p {{ font-size: 15px; color: {secondary_text_color}; line-height: 1.5; }}
-        </style>
-        </head><body>
-            <div class="container">
-                <div class="image-container">
-                    <img src="{image_data_uri}" alt="Sin conexión">
-                </div>
-                <div>
-                    <h1>No se puede acceder a este sitio</h1>
-                    <p>Necesitas una conexión a Internet para poder navegar.<br>Comprueba tu red y vuelve a intentarlo.</p>
-                </div>
-            </div>
-        </body></html>
-        """
-        self.setHtml(html, self.url())
-
-    def _show_http_warning_page(self, target_url: QUrl):
-        image_path = get_asset_path("WarningSecurity.png")
-
-        if not os.path.exists(image_path):
-            self.setHtml(f"<h1>Conexión no segura</h1><p>Estás intentando acceder a {target_url.host()}, que no es seguro.</p>", QUrl("wemphix:security-warning"))
-            return
+        self.setUrl(InternalPageSchemeHandler.page_url("error", url=self.url().toString()))
 
-        try:
-            with open(image_path, "rb") as image_file:
-                encoded_string = base64.b64encode(image_file.read()).decode('utf-8')
-            image_data_uri = f"data:image/png;base64,{encoded_string}"
-        except Exception as e:
-            self.setHtml(f"<h1>Conexión no segura</h1><p>Error al cargar recursos de advertencia. Estás intentando acceder a {target_url.host()}, que no es seguro.</p>", QUrl("wemphix:security-warning"))
-            return
-
-        palette = QApplication.instance().palette()
-        is_dark_theme = palette.color(QPalette.ColorRole.Window).lightness() < 128
-        bg_color = "#3c2e2e" if is_dark_theme else "#fef7f7"
-        text_color = "#dcdcdc" if is_dark_theme else "#202124"
-        secondary_text_color = "#9a9a9a" if is_dark_theme else "#5f6368"
-        button_bg_color = "#5a5a5a" if is_dark_theme else "#e0e0e0"
-        danger_color = "#f28b82" if is_dark_theme else "#d93025"
-        danger_hover_bg = "rgba(242, 139, 130, 0.1)" if is_dark_theme else "#fce8e6"
-
-        html = f"""
-        <!DOCTYPE html>
-        <html><head><title>Conexión no segura</title>
-        <style>
-            body {{ font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, "Helvetica Neue", Arial, sans-serif; background-color: {bg_color}; color: {text_color}; display: flex; justify-content: center; align-items: center; height: 100vh; margin: 0; }}
-            .container {{ display: flex; align-items: center; text-align: left; max-width: 650px; padding: 20px; }}
-            .image-container {{ margin-right: 40px; flex-shrink: 0; }}
-            img {{ width: 80px; height: 80px; }}
-            h1 {{ font-size: 22px; font-weight: 500; margin-top: 0; margin-bottom: 16px; }}
-            p {{ font-size: 15px; color: {secondary_text_color}; line-height: 1.5; margin-bottom: 24px;}}
-            .buttons a {{ text-decoration: none; padding: 10px 20px; border-radius: 5px; font-weight: 500; margin-right: 10px; display: inline-block; border: 1px solid transparent;}}
-            .back-button {{ background-color: {button_bg_color}; color: {text_color}; border: 1px solid #9a9a9a; }}
-            .proceed-button {{ background-color: transparent; color: {danger_color}; border: 1px solid {danger_color}; }}
-            .proceed-button:hover {{ background-color: {danger_hover_bg}; }}
-        </style>
-        </head><body>
-            <div class="container">
-                <div class="image-container">
-                    <img src="{image_data_uri}" alt="Advertencia de seguridad">
-                </div>
-                <div>
-                    <h1>Tu conexión con este sitio no es segura</h1>
-                    <p>El acceso a sitios no seguros (HTTP) está bloqueado para proteger tu información. Los atacantes podrían ver o cambiar los datos que envías o recibes a través de este sitio (como contraseñas o tarjetas de crédito).</p>
-                    <div class="buttons">
-                        <a href="javascript:history.back()" class="back-button">Volver</a>
-                        <a href="{target_url.toString()}" class="proceed-button">Continuar a {target_url.host()}</a>
-                    </div>
-                </div>
-            </div>
-        </body></html>
-        """
-        self.setHtml(html, QUrl("wemphix:security-warning"))
+    def _show_http_warning_page(self, target_url: QUrl, https_failed=False):
+        params = {"url": target_url.toString()}
+        if https_failed:
+            params["https_failed"] = "1"
+        self.setUrl(InternalPageSchemeHandler.page_url("security-warning", **params))
 
     def _show_malware_warning_page(self, target_url: QUrl):
         """Muestra una advertencia de página completa para sitios peligrosos."""
-        image_path = get_asset_path("Danger.png") # Asume que existe un icono de peligro
-
-        try:
-            with open(image_path, "rb") as image_file:
-                encoded_string = base64.b64encode(image_file.read()).decode('utf-8')
-            image_data_uri = f"data:image/png;base64,{encoded_string}"
-        except Exception:
-            image_data_uri = ""
-
-        bg_color = "#3c2e2e"
-        text_color = "#f28b82"
-        secondary_text_color = "#dcdcdc"
-        button_bg_color = "#5a5a5a"
-        button_text_color = "#ffffff"
-
-        html = f"""
-        <!DOCTYPE html>
-        <html><head><title>Sitio Engañoso</title>
-        <style>
-            body {{ font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, "Helvetica Neue", Arial, sans-serif; background-color: {bg_color}; color: {text_color}; display: flex; justify-content: center; align-items: center; height: 100vh; margin: 0; }}
-            .container {{ display: flex; align-items: center; text-align: left; max-width: 650px; padding: 20px; }}
-            .image-container {{ margin-right: 40px; flex-shrink: 0; }}
-            img {{ width: 80px; height: 80px; }}
-            h1 {{ font-size: 24px; font-weight: 500; margin-top: 0; margin-bottom: 16px; }}
-            p {{ font-size: 15px; color: {secondary_text_color}; line-height: 1.5; margin-bottom: 24px;}}
-            .buttons a {{ text-decoration: none; padding: 10px 20px; border-radius: 5px; font-weight: 500; margin-right: 10px; display: inline-block; border: 1px solid transparent;}}
-            .back-button {{ background-color: {button_bg_color}; color: {button_text_color}; border: 1px solid #9a9a9a; }}
-            .proceed-button {{ background-color: transparent; color: {text_color}; border: 1px solid {text_color}; }}
-        </style>
-        </head><body>
-            <div class="container">
-                <div class="image-container">
-                    <img src="{image_data_uri}" alt="Peligro">
-                </div>
-                <div>
-                    <h1>Sitio Engañoso Detectado</h1>
-                    <p>Wemphix ha bloqueado el acceso a <b>{target_url.host()}</b>.<br>Este sitio puede intentar engañarte para que instales software dañino o reveles tu información personal (por ejemplo, contraseñas o tarjetas de crédito).</p>
-                    <div class="buttons">
-                        <a href="javascript:history.back()" class="back-button">Volver a un lugar seguro</a>
-                        <a href="{target_url.toString()}" class="proceed-button">Ignorar y continuar</a>
-                    </div>
-                </div>
-            </div>
-        </body></html>
-        """
-        self.setHtml(html, QUrl("wemphix:malware-warning"))
+        self.setUrl(InternalPageSchemeHandler.page_url("malware-warning", url=target_url.toString()))
 
 class BrowserApi(QObject):
     """
@@ -489,11 +3044,12 @@ class BrowserApi(QObject):
 
     @pyqtSlot(QVariant, result=QVariant)
     def createTab(self, properties):
-        url = properties.get('url', 'https://www.google.com')
+        # Sin URL se abre la página de nueva pestaña, que puede salir ya cargada de la reserva.
+        url = properties.get('url') or None
         active = properties.get('active', True)
-        new_webview = self._main_window.agregar_pestana(url, focus=active)
-        tab_widget = new_webview.parentWidget()
-        return tab_widget.property("tab_id")
+        self._main_window.agregar_pestana(url, focus=active)
+        tabs = self._main_window.tabs
+        return tabs.widget(tabs.count() - 1).property("tab_id")
 
     @pyqtSlot(str, QVariant)
     def updateTab(self, tab_id, update_properties):
@@ -526,13 +3082,13 @@ class BrowserApi(QObject):
     def getAllTabs(self):
         tabs_info = []
         for i in range(self._main_window.tabs.count()):
-            widget = self._main_window.tabs.widget(i)
-            if webview := widget.findChild(QWebEngineView):
+            if widget := self._main_window.tabs.widget(i):
+                # Incluye las pestañas provisionales, que todavía no tienen webview.
                 tabs_info.append({
                     "id": widget.property("tab_id"),
                     "index": i,
                     "title": self._main_window.tabs.tabText(i),
-                    "url": webview.url().toString()
+                    "url": self._main_window._tab_url(widget)
                 })
         return tabs_info
 
@@ -605,6 +3161,19 @@ class SettingsDialog(QDialog):
         self.block_list_edit.setText(self.main_window.settings.value("user_block_list", ""))
         self.block_list_edit.textChanged.connect(self._on_block_list_changed)
         self.layout.addWidget(self.block_list_edit)
+        # Guarda lo que quede pendiente de la lista sin esperar al temporizador.
+        self.finished.connect(self.main_window._apply_user_block_list)
+
+        self.subscriptions_edit = None
+        if getattr(self.main_window, "list_subscriptions", None):
+            self.layout.addWidget(QLabel(self.tr("Listas de bloqueo suscritas (una URL por línea):")))
+            self.subscriptions_edit = QTextEdit()
+            self.subscriptions_edit.setAcceptRichText(False)
+            self.subscriptions_edit.setPlaceholderText(self.tr("https://easylist.to/easylist/easylist.txt"))
+            self.subscriptions_edit.setMinimumHeight(70)
+            self.subscriptions_edit.setPlainText("\n".join(self.main_window.list_subscriptions.urls("adblock")))
+            self.layout.addWidget(self.subscriptions_edit)
+            self.finished.connect(self._save_subscriptions)
 
         self.layout.addStretch()
 
@@ -622,6 +3191,12 @@ class SettingsDialog(QDialog):
         text = self.block_list_edit.toPlainText()
         self.main_window._update_user_block_list(text)
 
+    def _save_subscriptions(self):
+        urls = [url.strip() for url in self.subscriptions_edit.toPlainText().splitlines() if url.strip()]
+        if urls != self.main_window.list_subscriptions.urls("adblock"):
+            self.main_window.list_subscriptions.set_urls("adblock", urls)
+            self.main_window.statusBar().showMessage(self.tr("Listas suscritas guardadas. Usa 'Actualizar Lista de Bloqueo' para descargarlas."), 5000)
+
 class AdvancedSecuritySettings(QGroupBox):
     def __init__(self, main_window: "Navegador", parent=None):
         super().__init__("Seguridad Avanzada", parent)
@@ -885,12 +3460,28 @@ class BookmarkManager:
         self.widget.addItem(item)
 
 class Navegador(QMainWindow):
-    def __init__(self, is_incognito=False, main_window=None):
+    # Cada vez que una pestaña nueva (wemphix:newtab) pinta por primera vez, ya anotada en `newtab_paint_stats`.
+    newTabPainted = pyqtSignal()
+
+    NEW_TAB_URL = "wemphix:newtab"
+    # Pestañas nuevas ya construidas y cargadas que esperan a que se pida una (Ctrl+T).
+    SPARE_TAB_POOL_SIZE = 1
+    SPARE_TAB_REFILL_DELAY_MS = 300
+    # Las de reserva se recargan de vez en cuando para que los sitios frecuentes no queden viejos.
+    SPARE_TAB_MAX_AGE_S = 300
+
+    def __init__(self, is_incognito=False, main_window=None, settings=None, profile_path=None):
+        """
+        `settings` y `profile_path` sustituyen a los ajustes y a la carpeta ~/Wemphix del usuario;
+        con `profile_path` el perfil de Chromium tampoco guarda nada en disco. Los usan las
+        pruebas de benchmarks/browser_benchmarks.py para no tocar el perfil real.
+        """
         super().__init__()
         self.setAcceptDrops(True)
         self.is_incognito = is_incognito
         self.main_window = main_window
         self.other_windows = []
+        self._profile_path_override = profile_path
         self.profile_path = ""
         self.performance_mode = "normal"
         self.session_path = ""
@@ -901,6 +3492,7 @@ class Navegador(QMainWindow):
         self.hibernation_enabled = False
         self.hibernation_timer = QTimer(self)
         self.tab_last_active_time = {}
+        self.tab_registry = TabRegistry()
         self.notes_loaded = False
         self.super_memory_saver_enabled = False
         
@@ -919,8 +3511,17 @@ class Navegador(QMainWindow):
         self.history_list_widget = None
         self.history_path = ""
         self.history = []
+        self.top_sites = None
+        self.newtab_paint_stats = NewTabPaintStats()
+        # Cuándo se han pedido las pestañas nuevas que aún no han pintado (ms desde epoch) y si salieron de la reserva.
+        self._newtab_open_times = deque(maxlen=16)
+        self.spare_tabs = deque()
+        self.spare_tab_timer = QTimer(self)
+        self.spare_tab_timer.setSingleShot(True)
+        self.spare_tab_timer.timeout.connect(self._refill_spare_tabs)
         self.vertical_tabs_dock = None
         self.vertical_tabs_list = None
+        self.vertical_tabs_model = None
         self.notes_dock = None
         self.web_panels_dock = None
         self.notes_editor = None
@@ -931,14 +3532,16 @@ class Navegador(QMainWindow):
         self.extensions = {}
         self.browser_api = BrowserApi(self)
         self.ad_blocker = AdBlockInterceptor()
-        self.malware_blocker_list = set()
+        self.list_subscriptions = None
+        self.url_cleaner = None
+        self.malware_index = CompiledDomainList()
         self.qwebchannel_script_content = ""
         self.password_manager = None
         self.password_handler_script_content = ""
         self.last_app_state = Qt.ApplicationState.ApplicationActive
         self.standard_icons = {}
         self.dominant_color_cache = {}
-        self.settings = QSettings("WemphixOrg", "Wemphix")
+        self.settings = settings if settings is not None else QSettings("WemphixOrg", "Wemphix")
 
         self.rgb_theme_timer = QTimer(self)
         self.rgb_theme_timer.timeout.connect(self._update_rgb_theme)
@@ -949,13 +3552,31 @@ class Navegador(QMainWindow):
         self.suggestion_timer.setInterval(250)
         self.suggestion_timer.timeout.connect(self._perform_url_suggestions)
 
+        self._pending_user_block_list = None
+        self.user_block_list_timer = QTimer(self)
+        self.user_block_list_timer.setSingleShot(True)
+        self.user_block_list_timer.setInterval(500)
+        self.user_block_list_timer.timeout.connect(self._apply_user_block_list)
+        self._pending_adblock_rebuild = {}
+        self._adblock_rebuild_running = False
+
+        self.request_stats_timer = QTimer(self)
+        self.request_stats_timer.setInterval(1000)
+        self.request_stats_timer.timeout.connect(self._refresh_request_stats_badge)
+        self.request_stats_timer.start()
+
         self.threadpool = QThreadPool() 
         self.performance_mode = self.settings.value("performanceMode", "normal")
         self._update_performance_flags(self.performance_mode)
 
         self.vertical_tabs_enabled = self.settings.value("verticalTabsEnabled", False, type=bool)
         self.hibernation_enabled = self.settings.value("hibernationEnabled", False, type=bool)
-        self.hibernation_timer.setInterval(60 * 1000) # Check every minute
+        self.tab_discard_scheduler = TabDiscardScheduler(
+            self.settings.value("tabMemoryBudgetMB", TabDiscardScheduler.DEFAULT_BUDGET_MB, type=int),
+            self.settings.value("minAvailableMemoryMB", TabDiscardScheduler.DEFAULT_MIN_AVAILABLE_MB, type=int))
+        self._discard_pass_running = False
+        # Mirar la memoria es barato; solo se consulta a las páginas cuando falta.
+        self.hibernation_timer.setInterval(15 * 1000)
         self.hibernation_timer.timeout.connect(self._check_tabs_for_hibernation)
         if self.hibernation_enabled: self.hibernation_timer.start()
 
@@ -966,8 +3587,8 @@ class Navegador(QMainWindow):
         self._setup_adblocker()
         self._setup_malware_blocker()
         self.persistent_profile.setUrlRequestInterceptor(self.ad_blocker)
-        self._load_user_block_list()
         self._load_history()
+        self.top_sites = TopSites.load(os.path.join(self.profile_path, "newtab") if self.profile_path else None, self.history)
         self._setup_ui()
         self._setup_password_manager()
         self._setup_shortcuts()
@@ -976,12 +3597,14 @@ class Navegador(QMainWindow):
         custom_color = self.settings.value("custom_theme_color", None)
         self.apply_custom_theme(custom_theme, custom_color)
         self._load_extensions()
+        self._update_browser_action_buttons()
         self._create_menu()
         
         self.restoreGeometry(self.settings.value("geometry", self.saveGeometry()))
         self.restoreState(self.settings.value("windowState", self.saveState()))
 
         self._restore_session()
+        self.spare_tab_timer.start(self.SPARE_TAB_REFILL_DELAY_MS)
 
     def _cache_standard_icons(self):
         """Caches standard icons at startup to speed up new tab creation."""
@@ -1006,24 +3629,31 @@ class Navegador(QMainWindow):
             self.passwords_path = ""
             self.history_path = ""
         else:
-            self.profile_path = os.path.join(os.path.expanduser("~"), "Wemphix")
+            self.profile_path = self._profile_path_override or os.path.join(os.path.expanduser("~"), "Wemphix")
             profile_data_path = os.path.join(self.profile_path, "ProfileData")
             self.bookmarks_path = os.path.join(self.profile_path, "bookmarks.json")
             self.history_path = os.path.join(self.profile_path, "history.json")
             self.extensions_path = os.path.join(self.profile_path, "extensions")
             self.session_path = os.path.join(self.profile_path, "session.json")
             self.notes_path = os.path.join(self.profile_path, "notes.txt")
-            self.malware_block_list_path = os.path.join(self.profile_path, "malware_list.txt")
             self.passwords_path = os.path.join(self.profile_path, "passwords.json.enc")
             self.extensions_manifest_path = os.path.join(self.extensions_path, "extensions.json")
             os.makedirs(self.extensions_path, exist_ok=True)
             os.makedirs(self.profile_path, exist_ok=True)
 
-            self.persistent_profile = QWebEngineProfile("Profile_user", self)
-            self.persistent_profile.setPersistentStoragePath(profile_data_path)
-            self.persistent_profile.setPersistentCookiesPolicy(QWebEngineProfile.PersistentCookiesPolicy.ForcePersistentCookies)
+            if self._profile_path_override:
+                self.persistent_profile = QWebEngineProfile(self)
+            else:
+                self.persistent_profile = QWebEngineProfile("Profile_user", self)
+                self.persistent_profile.setPersistentStoragePath(profile_data_path)
+                self.persistent_profile.setPersistentCookiesPolicy(QWebEngineProfile.PersistentCookiesPolicy.ForcePersistentCookies)
 
         self.persistent_profile.downloadRequested.connect(self._handle_download_request)
+        self.internal_page_handler = InternalPageSchemeHandler(self)
+        self.persistent_profile.installUrlSchemeHandler(InternalPageSchemeHandler.SCHEME, self.internal_page_handler)
+        # En incógnito los resultados de HTTPS primero solo se recuerdan mientras dura la ventana.
+        self.https_upgrader = HttpsUpgrader(get_asset_path("hsts_preload.txt"),
+                                            os.path.join(self.profile_path, "https_upgrades.json") if self.profile_path else None)
 
     def _load_qwebchannel_script(self):
         """Carga el contenido de qwebchannel.js en memoria al inicio para acelerar la creación de pestañas."""
@@ -1056,28 +3686,114 @@ class Navegador(QMainWindow):
             print("ADVERTENCIA: No se encontró 'password_handler.js'. La gestión de contraseñas no funcionará.")
 
     def _setup_adblocker(self):
-        self.adblock_list_path = os.path.join(self.profile_path, "adblock_list.txt")
-        self.ad_blocker.load_ad_block_list(self.adblock_list_path)
+        # Las ventanas de incógnito no tienen perfil propio, pero reutilizan la lista del perfil principal.
+        lists_path = self.profile_path or os.path.join(os.path.expanduser("~"), "Wemphix")
+        self.malware_block_list_path = os.path.join(lists_path, "malware_list.txt")
+        self.malware_compiled_path = os.path.join(lists_path, "malware_list.bin")
+        self.adblock_list_path = os.path.join(lists_path, "adblock_list.txt")
+        self.adblock_compiled_path = os.path.join(lists_path, "adblock_list.bin")
+        self.ad_blocker.set_host_cache_capacity(self.settings.value("adBlockHostCacheSize", 4096, type=int))
+        self.ad_blocker.set_third_party_only(self.settings.value("adBlockThirdPartyOnly", False, type=bool))
+        self.ad_blocker.proxy_auto_config = ListProxyAutoConfig.active
+        self._toggle_url_cleaner(self.settings.value("urlCleanerEnabled", True, type=bool))
+        # Formato compacto opcional (solo hashes) para listas muy grandes; cambiarlo fuerza una recompilación.
+        CompiledDomainList.compact_format = self.settings.value("compactBlockLists", False, type=bool)
+        CompiledDomainList.bloom_bits_per_entry = self.settings.value("blockListBloomBits", 0, type=int)
+        # Al inicio se cargan ambas listas de forma síncrona; abrir la lista compilada es inmediato.
+        self.ad_blocker.load_ad_block_list(self.adblock_list_path, self.settings.value("user_block_list", ""))
+        if not self.is_incognito:
+            self.list_subscriptions = BlocklistSubscriptions(self.profile_path)
 
     def _setup_malware_blocker(self):
-        """Carga la lista de bloqueo de malware desde el archivo local al inicio."""
-        if self.is_incognito or not os.path.exists(self.malware_block_list_path):
-            return
+        """Abre la lista compilada de sitios peligrosos (recompilándola si el texto cambió)."""
         try:
-            with open(self.malware_block_list_path, "r", encoding="utf-8") as f:
-                self.malware_blocker_list = {line.strip() for line in f if line.strip() and not line.startswith('#')}
-            print(f"Lista de bloqueo de malware cargada con {len(self.malware_blocker_list)} dominios.")
-        except IOError:
-            print("No se pudo cargar la lista de bloqueo de malware.")
+            self.malware_index = CompiledDomainList.load(self.malware_block_list_path, self.malware_compiled_path)
+            print(f"Lista de bloqueo de malware cargada con {len(self.malware_index)} dominios.")
+        except FileNotFoundError:
+            self.malware_index = CompiledDomainList()
+        except (OSError, struct.error) as e:
+            print(f"No se pudo cargar la lista de bloqueo de malware: {e}")
+            self.malware_index = CompiledDomainList()
+        self.ad_blocker.set_malware_index(self.malware_index)
+
+    def _toggle_adblock(self, enabled):
+        self.ad_blocker.setEnabled(enabled)
+        self._notify_proxy_auto_config_restart()
+
+    def _toggle_adblock_third_party_only(self, enabled):
+        self.settings.setValue("adBlockThirdPartyOnly", enabled)
+        self.ad_blocker.set_third_party_only(enabled)
+        self._notify_proxy_auto_config_restart()
+
+    def _notify_proxy_auto_config_restart(self):
+        """El PAC de la lista solo se lee al arrancar: avisa de que sus bloqueos no cambian hasta reiniciar."""
+        if self.ad_blocker.proxy_auto_config is not None:
+            self.statusBar().showMessage("Los dominios de la lista seguirán bloqueados dentro de Chromium hasta reiniciar Wemphix.", 8000)
+
+    def _toggle_url_cleaner(self, enabled):
+        self.settings.setValue("urlCleanerEnabled", enabled)
+        if enabled and self.url_cleaner is None:
+            self.url_cleaner = UrlCleaner()
+        elif not enabled:
+            self.url_cleaner = None
+        self.ad_blocker.url_cleaner = self.url_cleaner
+
+    def _toggle_host_resolver_blocking(self, enabled):
+        self.settings.setValue("hostResolverBlocking", enabled)
+        self.statusBar().showMessage("El bloqueo de la lista dentro de Chromium se aplicará al reiniciar Wemphix.", 5000)
 
     def _load_user_block_list(self):
         user_list_text = self.settings.value("user_block_list", "")
-        self.ad_blocker.update_user_block_list(user_list_text)
+        self._schedule_adblock_rebuild(user_text=user_list_text)
+
+    def _schedule_adblock_rebuild(self, reload_list=False, user_text=None):
+        """
+        Reconstruye los índices del bloqueador en un hilo aparte. Si ya hay una reconstrucción
+        en curso, los cambios se acumulan y se aplican en la siguiente, al terminar esta.
+        """
+        if reload_list:
+            self._pending_adblock_rebuild["reload_list"] = True
+        if user_text is not None:
+            self._pending_adblock_rebuild["user_text"] = user_text
+        if self._adblock_rebuild_running or not self._pending_adblock_rebuild:
+            return
+
+        pending, self._pending_adblock_rebuild = self._pending_adblock_rebuild, {}
+        self._adblock_rebuild_running = True
+        worker = Worker(AdBlockInterceptor.build_parts, self.ad_blocker.list_part, self.ad_blocker.user_part,
+                        self.adblock_list_path if pending.get("reload_list") else None, pending.get("user_text"))
+        worker.signals.result.connect(lambda parts: self.ad_blocker.set_parts(*parts))
+        worker.signals.error.connect(self._on_adblock_rebuild_error)
+        worker.signals.finished.connect(self._on_adblock_rebuild_done)
+        self.threadpool.start(worker)
+
+    def _refresh_request_stats_badge(self):
+        """Actualiza el contador de peticiones bloqueadas de la pestaña visible."""
+        record = self.tab_registry.by_widget(self.tabs.currentWidget())
+        # Las pestañas provisionales aún no tienen página.
+        if record is None or record.page is None:
+            return
+        if interceptor := getattr(record.page, "tab_request_interceptor", None):
+            self.security_indicator.update_request_stats(interceptor.stats)
+
+    def _on_adblock_rebuild_error(self, err_tuple):
+        exctype, value, tb_str = err_tuple
+        print(f"ERROR: Falló la reconstrucción de los índices de bloqueo:\n{tb_str}")
+
+    def _on_adblock_rebuild_done(self):
+        self._adblock_rebuild_running = False
+        self._schedule_adblock_rebuild()
 
     def _setup_ui(self):
         self.setWindowTitle("Wemphix")
         self.setGeometry(100, 100, 1300, 900)
 
+        self.nav_bar = self._create_nav_bar()
+        self.find_bar = self._create_find_bar()
+        self.nav_bar.setParent(self)
+        self.find_bar.setParent(self)
+        self.nav_bar.setVisible(False)
+
         self.tabs = QTabWidget()
         self.tabs.setTabsClosable(True)
         self.tabs.setMovable(True)
@@ -1110,34 +3826,40 @@ class Navegador(QMainWindow):
         self.vertical_tabs_dock.setObjectName("VerticalTabsDock")
         self.vertical_tabs_dock.setFeatures(QDockWidget.DockWidgetFeature.NoDockWidgetFeatures)
 
-        self.vertical_tabs_list = QListWidget()
-        self.vertical_tabs_list.currentRowChanged.connect(self._switch_to_tab_from_list)
+        self.vertical_tabs_model = TabListModel(self.tabs, self)
+        self.vertical_tabs_list = QListView()
+        self.vertical_tabs_list.setModel(self.vertical_tabs_model)
+        self.vertical_tabs_list.setItemDelegate(TabListDelegate(self.vertical_tabs_list))
+        # Todas las filas miden lo mismo: la vista no tiene que medirlas una a una.
+        self.vertical_tabs_list.setUniformItemSizes(True)
+        self.vertical_tabs_list.setEditTriggers(QListView.EditTrigger.NoEditTriggers)
+        self.vertical_tabs_list.selectionModel().currentRowChanged.connect(
+            lambda current, previous: self._switch_to_tab_from_list(current.row()))
         self.tabs.currentChanged.connect(self._sync_vertical_tab_selection)
+        self.tabs.tabBar().tabMoved.connect(self._on_tab_moved)
 
         self.vertical_tabs_dock.setWidget(self.vertical_tabs_list)
         self.addDockWidget(Qt.DockWidgetArea.LeftDockWidgetArea, self.vertical_tabs_dock)
         self.vertical_tabs_dock.setVisible(self.vertical_tabs_enabled)
 
-    def _update_vertical_tabs_list(self):
-        if not self.vertical_tabs_list: return
-        with QSignalBlocker(self.vertical_tabs_list):
-            self.vertical_tabs_list.clear()
-            for i in range(self.tabs.count()):
-                item = QListWidgetItem()
-                item.setText(self.tabs.tabText(i))
-                item.setIcon(self.tabs.tabIcon(i))
-                self.vertical_tabs_list.addItem(item)
+    def _vertical_tab_added(self, index: int, tab: QWidget):
+        # La selección del modelo no debe cambiar de pestaña mientras las filas no coinciden con la barra.
+        with QSignalBlocker(self.vertical_tabs_list.selectionModel()):
+            self.vertical_tabs_model.insert_tab(index, self.tab_registry.by_widget(tab))
+        self._sync_vertical_tab_selection(self.tabs.currentIndex())
+
+    def _vertical_tab_removed(self, index: int):
+        with QSignalBlocker(self.vertical_tabs_list.selectionModel()):
+            self.vertical_tabs_model.remove_tab(index)
+
+    def _on_tab_moved(self, source: int, destination: int):
+        with QSignalBlocker(self.vertical_tabs_list.selectionModel()):
+            self.vertical_tabs_model.move_tab(source, destination)
+        self._sync_vertical_tab_selection(self.tabs.currentIndex())
 
     def _update_vertical_tab_item(self, index: int):
-        """Actualiza un único elemento en la lista de pestañas verticales de forma eficiente."""
-        if not self.vertical_tabs_list or index < 0 or index >= self.vertical_tabs_list.count():
-            return
-        
-        with QSignalBlocker(self.vertical_tabs_list):
-            item = self.vertical_tabs_list.item(index)
-            if item:
-                item.setText(self.tabs.tabText(index))
-                item.setIcon(self.tabs.tabIcon(index))
+        """Avisa a la lista de pestañas verticales de que el título o el icono de una pestaña han cambiado."""
+        self.vertical_tabs_model.tab_changed(index)
 
     def _setup_password_manager(self):
         """Initializes the password manager to a locked state (None)."""
@@ -1158,23 +3880,27 @@ class Navegador(QMainWindow):
         QShortcut(QKeySequence("Ctrl+0"), self, self._reset_zoom)
         QShortcut(QKeySequence("Ctrl+Shift+A"), self, self._open_tab_search)
         QShortcut(QKeySequence("Ctrl+Shift+P"), self, self._open_command_palette)
+        QShortcut(QKeySequence("Ctrl+H"), self, lambda: self.agregar_pestana("wemphix:history"))
+        QShortcut(QKeySequence("Ctrl+J"), self, lambda: self.agregar_pestana("wemphix:downloads"))
+        QShortcut(QKeySequence("Ctrl+Shift+O"), self, lambda: self.agregar_pestana("wemphix:bookmarks"))
 
     def _reload_current_tab(self):
         if webview := self._get_current_webview():
             webview.reload()
 
     def _show_find_bar(self):
-        if current_widget := self.tabs.currentWidget():
-            find_bar = current_widget.findChild(QWidget, "find_bar")
-            find_input = find_bar.findChild(QLineEdit, "find_input")
-            find_bar.setVisible(not find_bar.isVisible())
-            find_input.setFocus()
-            find_input.selectAll()
+        if not self._get_current_webview():
+            return
+        if self.find_bar.isVisible():
+            self._close_find_bar()
+            return
+        self.find_bar.setVisible(True)
+        self.find_input.setFocus()
+        self.find_input.selectAll()
 
     def _focus_url_bar(self):
-        if (current_widget := self.tabs.currentWidget()) and (url_bar := current_widget.findChild(QLineEdit)):
-            url_bar.setFocus()
-            url_bar.selectAll()
+        self.url_bar.setFocus()
+        self.url_bar.selectAll()
 
     def _get_current_webview(self) -> QWebEngineView | None:
         if current_widget := self.tabs.currentWidget():
@@ -1183,6 +3909,9 @@ class Navegador(QMainWindow):
 
     def _on_tab_activated(self, index):
         if widget := self.tabs.widget(index):
+            if widget.property("lazy_url") is not None:
+                self._materialize_tab(widget)
+            self._attach_tab_chrome(widget)
             tab_id = widget.property("tab_id")
             self.browser_api.onTabActivated.emit(tab_id)
 
@@ -1196,22 +3925,12 @@ class Navegador(QMainWindow):
             # Marcar la pestaña como activa y despertarla si está hibernada
             self.tab_last_active_time[widget] = time.time()
             if widget.property("is_hibernated"):
-                # Si es una página interna, no la despiertes, solo actualiza la UI
-                if content_stack := widget.findChild(QStackedWidget, "content_stack"):
-                    current_page_widget = content_stack.currentWidget()
-                    if isinstance(current_page_widget, HistoryPageWidget):
-                        self._update_tab_ui_for_internal_page(widget, "history")
-                        return
-
                 self._wake_up_tab(widget)
 
     def _perform_url_suggestions(self):
         """Ejecuta la lógica de autocompletado después de una breve pausa."""
-        if (current_widget := self.tabs.currentWidget()) and \
-           (url_bar := current_widget.findChild(QLineEdit)) and \
-           (completer := url_bar.completer()):
-            model = completer.model()
-            self._update_url_suggestions(url_bar.text(), model)
+        if completer := self.url_bar.completer():
+            self._update_url_suggestions(self.url_bar.text(), completer.model())
 
     def _get_current_tab_widget(self) -> QWidget | None:
         if self.tabs:
@@ -1252,6 +3971,13 @@ class Navegador(QMainWindow):
         battery_saver_action.triggered.connect(lambda: self._set_performance_mode("battery"))
         self.perf_group.addAction(battery_saver_action)
 
+        data_saver_action = performance_menu.addAction(self.tr("Ahorro de datos"))
+        data_saver_action.setToolTip("No descarga vídeo, audio, fuentes web ni scripts de terceros, y limita las imágenes por página.")
+        data_saver_action.setCheckable(True)
+        data_saver_action.setData("data")
+        data_saver_action.triggered.connect(lambda: self._set_performance_mode("data"))
+        self.perf_group.addAction(data_saver_action)
+
         super_saver_action = performance_menu.addAction(self.tr("Eficiencia Máxima (Bajo CPU y Memoria)"))
         super_saver_action.setCheckable(True)
         super_saver_action.setData("super")
@@ -1269,6 +3995,8 @@ class Navegador(QMainWindow):
         hibernation_action.setCheckable(True)
         hibernation_action.setChecked(self.hibernation_enabled)
         hibernation_action.toggled.connect(self._toggle_hibernation)
+        memory_limits_action = performance_menu.addAction(self.tr("Límites de memoria..."))
+        memory_limits_action.triggered.connect(self._configure_memory_limits)
 
         file_menu.addSeparator()
         clear_action = file_menu.addAction(self.tr("Limpiar perfil y salir"))
@@ -1331,7 +4059,23 @@ class Navegador(QMainWindow):
         toggle_adblock_action = tools_menu.addAction(self.tr("Activar Bloqueador de Anuncios"))
         toggle_adblock_action.setCheckable(True)
         toggle_adblock_action.setChecked(True)
-        toggle_adblock_action.toggled.connect(self.ad_blocker.setEnabled)
+        toggle_adblock_action.toggled.connect(self._toggle_adblock)
+        third_party_only_action = tools_menu.addAction(self.tr("Bloquear solo contenido de terceros"))
+        third_party_only_action.setToolTip("No bloquea las peticiones al mismo sitio que la página (p. ej. de www.ejemplo.com a cdn.ejemplo.com).")
+        third_party_only_action.setCheckable(True)
+        third_party_only_action.setChecked(self.ad_blocker.third_party_only)
+        third_party_only_action.toggled.connect(self._toggle_adblock_third_party_only)
+        url_cleaner_action = tools_menu.addAction(self.tr("Limpiar enlaces de seguimiento"))
+        url_cleaner_action.setToolTip("Quita parámetros como utm_* o fbclid y salta los redirectores de rastreo (google.com/url, l.facebook.com...).")
+        url_cleaner_action.setCheckable(True)
+        url_cleaner_action.setChecked(self.url_cleaner is not None)
+        url_cleaner_action.toggled.connect(self._toggle_url_cleaner)
+        host_resolver_action = tools_menu.addAction(self.tr("Bloquear los dominios de la lista dentro de Chromium (PAC)"))
+        host_resolver_action.setToolTip("Chromium rechaza las conexiones a los dominios de la lista, también las de preconnect y precarga de DNS. "
+                                        "Sustituye la configuración de proxy, se aplica al reiniciar y no se desactiva con el interruptor del bloqueador hasta entonces.")
+        host_resolver_action.setCheckable(True)
+        host_resolver_action.setChecked(self.settings.value("hostResolverBlocking", False, type=bool))
+        host_resolver_action.toggled.connect(self._toggle_host_resolver_blocking)
         tools_menu.addSeparator()
         self.update_adblock_action = tools_menu.addAction(self.tr("Actualizar Lista de Bloqueo"))
         self.update_adblock_action.setToolTip("Descarga la última lista de dominios de anuncios y rastreadores.")
@@ -1412,12 +4156,180 @@ class Navegador(QMainWindow):
         btn.clicked.connect(lambda: self.agregar_pestana())
         return btn
 
-    def agregar_pestana(self, url="https://www.google.com", focus=True):
-        tab = QWidget()
+    def agregar_pestana(self, url=None, focus=True, lazy=None, title="", icon=None):
+        """
+        Abre una pestaña y devuelve su webview. Las pestañas en segundo plano (`lazy`, por
+        defecto si no se enfocan) son provisionales: solo guardan URL, título e icono, y el
+        webview se crea la primera vez que se activan (ver `_materialize_tab`); para ellas se
+        devuelve None.
+        """
+        requested_at_ms = time.time() * 1000
+        if url is None:
+            url = self.NEW_TAB_URL
+        if lazy is None:
+            lazy = not focus
+        spare = self._take_spare_tab() if not lazy and url == self.NEW_TAB_URL else None
+        if url == self.NEW_TAB_URL and not lazy:
+            self._newtab_open_times.append((requested_at_ms, spare is not None))
+
+        if spare:
+            tab, webview = spare
+            index = self.tabs.addTab(tab, webview.title() or "Nueva Pestaña")
+            self._update_tab_icon(index)
+        else:
+            tab = QWidget()
+            tab.setProperty("tab_id", str(uuid.uuid4()))
+            self.tab_registry.add(TabRecord(tab.property("tab_id"), tab))
+            if lazy:
+                tab.setProperty("lazy_url", url)
+                index = self.tabs.addTab(tab, icon or QIcon(), title or ("Nueva Pestaña" if url == self.NEW_TAB_URL else url))
+                webview = None
+            else:
+                webview = self._build_tab_contents(tab, url)
+                index = self.tabs.addTab(tab, "Nueva Pestaña")
+        if focus:
+            self.tabs.setCurrentIndex(index)
+            if url == self.NEW_TAB_URL:
+                self.url_bar.setFocus()
+        self.tab_last_active_time[tab] = time.time()
+        self._vertical_tab_added(index, tab)
+
+        if not self.is_incognito:
+            self.browser_api.tabAdded.emit({"index": index, "title": self.tabs.tabText(index), "url": url})
+
+        return webview or tab.findChild(QWebEngineView)
+
+    def _take_spare_tab(self):
+        """Saca una pestaña de la reserva (widget, webview), o None si está vacía, y programa reponerla."""
+        self.spare_tab_timer.start(self.SPARE_TAB_REFILL_DELAY_MS)
+        if not self.spare_tabs:
+            return None
+        tab = self.spare_tabs.popleft()
+        tab.setProperty("spare_since", None)
+        return tab, self.tab_registry.by_widget(tab).webview
+
+    def _refill_spare_tabs(self):
+        """
+        Construye en un momento tranquilo las pestañas de reserva: widgets, página, scripts
+        y wemphix:newtab ya cargada, de modo que abrir una pestaña nueva solo tenga que
+        mostrarla. Hasta que se muestran no están en la barra de pestañas; el registro las
+        conoce, pero sus manejadores de señales las ignoran porque no tienen índice.
+        """
+        now = time.time()
+        for tab in self.spare_tabs:
+            if now - tab.property("spare_since") > self.SPARE_TAB_MAX_AGE_S:
+                tab.setProperty("spare_since", now)
+                self.tab_registry.by_widget(tab).webview.reload()
+        if len(self.spare_tabs) < self.SPARE_TAB_POOL_SIZE:
+            tab = QWidget()
+            tab.setProperty("tab_id", str(uuid.uuid4()))
+            tab.setProperty("spare_since", now)
+            self.tab_registry.add(TabRecord(tab.property("tab_id"), tab))
+            self._build_tab_contents(tab, self.NEW_TAB_URL)
+            self.spare_tabs.append(tab)
+        # De una en una, para no bloquear la interfaz si la reserva es grande; llena, se vuelve a mirar su antigüedad más tarde.
+        if len(self.spare_tabs) < self.SPARE_TAB_POOL_SIZE:
+            self.spare_tab_timer.start(self.SPARE_TAB_REFILL_DELAY_MS)
+        else:
+            self.spare_tab_timer.start(self.SPARE_TAB_MAX_AGE_S * 1000)
+
+    def _discard_spare_tabs(self):
+        while self.spare_tabs:
+            tab = self.spare_tabs.popleft()
+            self.tab_registry.remove(tab)
+            tab.deleteLater()
+
+    def _materialize_tab(self, tab: QWidget):
+        """Crea el webview de una pestaña provisional y empieza a cargar su URL."""
+        url = tab.property("lazy_url")
+        if url is None:
+            return tab.findChild(QWebEngineView)
+        tab.setProperty("lazy_url", None)
+        return self._build_tab_contents(tab, url)
+
+    def _tab_url(self, tab: QWidget) -> str:
+        """URL de una pestaña, aunque todavía sea provisional o esté hibernada."""
+        if (lazy_url := tab.property("lazy_url")) is not None:
+            return lazy_url
+        if tab.property("is_hibernated") and tab.property("hibernation_url"):
+            return tab.property("hibernation_url")
+        webview = tab.findChild(QWebEngineView)
+        return webview.url().toString() if webview else ""
+
+    def _build_tab_contents(self, tab: QWidget, url: str) -> QWebEngineView:
+        """
+        Contenido de una pestaña: la pila con el webview (y la vista previa si se hiberna) y
+        la barra de progreso. La barra de navegación y la de búsqueda son de la ventana y se
+        colocan en la pestaña activa (ver `_attach_tab_chrome`).
+        """
         layout = QVBoxLayout(tab)
         layout.setContentsMargins(0, 0, 0, 0)
         layout.setSpacing(0)
 
+        webview = QWebEngineView()
+
+        # --- MEJORA: QStackedWidget para poder mostrar la vista previa de las pestañas hibernadas ---
+        content_stack = QStackedWidget()
+        content_stack.setObjectName("content_stack")
+        web_container = QWidget()
+        web_container_layout = QGridLayout(web_container)
+        web_container_layout.setContentsMargins(0, 0, 0, 0)
+        web_container_layout.setSpacing(0)
+
+        progress_bar = QProgressBar()
+        progress_bar.setFixedHeight(2)
+        progress_bar.setTextVisible(False)
+        progress_bar.setVisible(False)
+
+        web_container_layout.addWidget(webview, 0, 0)
+        web_container_layout.addWidget(progress_bar, 0, 0, Qt.AlignmentFlag.AlignTop)
+        content_stack.addWidget(web_container)
+        layout.addWidget(content_stack, 1)
+
+        page = CustomWebEnginePage(self.persistent_profile, webview)
+        page.featurePermissionRequested.connect(self.handle_permission_request)
+        page.customDownloadRequested.connect(self._start_custom_download)
+        page.fullScreenRequested.connect(self._handle_fullscreen_request)
+        page.tab_request_interceptor = TabRequestInterceptor(self.ad_blocker, page)
+        page.setUrlRequestInterceptor(page.tab_request_interceptor)
+        page.findTextFinished.connect(lambda result, wv=webview: self._update_find_results(result, wv))
+
+        self._setup_page_scripts(page)
+
+        channel = QWebChannel(page)
+        page.setWebChannel(channel)
+        channel.registerObject("browser_api", self.browser_api)
+
+        self._apply_page_settings(page)
+
+        if hasattr(page, 'isAudibleChanged'):
+            page.isAudibleChanged.connect(self._handle_audio_state_change)
+        if hasattr(page, 'audioMutedChanged'):
+            page.audioMutedChanged.connect(self._handle_audio_state_change)
+
+        webview.setPage(page)
+        webview.setUrl(QUrl(url))
+
+        webview.loadStarted.connect(lambda: progress_bar.setVisible(True))
+        webview.loadProgress.connect(progress_bar.setValue)
+        webview.loadFinished.connect(lambda: progress_bar.setVisible(False))
+
+        webview.loadFinished.connect(lambda ok, webview=webview: self._on_page_load_finished(ok, webview))
+        webview.loadFinished.connect(self.actualizar_estado_botones_nav)
+        webview.urlChanged.connect(self.actualizar_ui_pestana)
+
+        webview.titleChanged.connect(self.actualizar_titulo_pestana)
+        webview.iconChanged.connect(self.actualizar_icono_pestana)
+
+        if record := self.tab_registry.by_widget(tab):
+            self.tab_registry.set_contents(record, webview, page)
+        return webview
+
+    def _create_nav_bar(self) -> QWidget:
+        """
+        Barra de navegación de la ventana. Solo hay una: se mueve a la pestaña activa cuando
+        cambia (`_attach_tab_chrome`) y muestra el estado de su webview (`_sync_nav_bar`).
+        """
         nav_bar_widget = QWidget()
         nav_bar_widget.setObjectName("NavBarWidget")
         nav_bar = QHBoxLayout(nav_bar_widget)
@@ -1431,31 +4343,31 @@ class Navegador(QMainWindow):
         url_container_layout.setContentsMargins(0, 0, 0, 0)
         url_container_layout.setSpacing(0)
 
-        webview = QWebEngineView() # Se necesita el webview para el indicador
-        security_indicator = SecurityIndicatorWidget(webview, self)
+        self.security_indicator = SecurityIndicatorWidget(None, self)
 
-        url_bar = UrlBar()
-        url_bar.setPlaceholderText("Escribe una URL o busca...")
-        url_bar.setObjectName("UrlBar")
+        self.url_bar = UrlBar()
+        self.url_bar.setPlaceholderText("Escribe una URL o busca...")
+        self.url_bar.setObjectName("UrlBar")
 
-        completer_model = QStringListModel(url_bar)
-        url_completer = QCompleter(completer_model, url_bar)
+        completer_model = QStringListModel(self.url_bar)
+        url_completer = QCompleter(completer_model, self.url_bar)
         url_completer.setCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
         url_completer.setFilterMode(Qt.MatchFlag.MatchContains)
         url_completer.setCompletionMode(QCompleter.CompletionMode.PopupCompletion)
-        url_bar.setCompleter(url_completer)
-        url_bar.textChanged.connect(self.suggestion_timer.start)
-
-        atras_btn = QPushButton()
-        atras_btn.setIcon(self.standard_icons["back"])
-        atras_btn.setObjectName("atras_btn")
-        atras_btn.setFixedSize(28, 28)
-        atras_btn.setEnabled(False)
-        adelante_btn = QPushButton()
-        adelante_btn.setIcon(self.standard_icons["forward"])
-        adelante_btn.setObjectName("adelante_btn")
-        adelante_btn.setFixedSize(28, 28)
-        adelante_btn.setEnabled(False)
+        self.url_bar.setCompleter(url_completer)
+        # Solo lo que escribe el usuario; los cambios de pestaña también reescriben la barra.
+        self.url_bar.textEdited.connect(self.suggestion_timer.start)
+
+        self.atras_btn = QPushButton()
+        self.atras_btn.setIcon(self.standard_icons["back"])
+        self.atras_btn.setObjectName("atras_btn")
+        self.atras_btn.setFixedSize(28, 28)
+        self.atras_btn.setEnabled(False)
+        self.adelante_btn = QPushButton()
+        self.adelante_btn.setIcon(self.standard_icons["forward"])
+        self.adelante_btn.setObjectName("adelante_btn")
+        self.adelante_btn.setFixedSize(28, 28)
+        self.adelante_btn.setEnabled(False)
         recargar_btn = QPushButton()
         recargar_btn.setIcon(self.standard_icons["reload"])
         recargar_btn.setFixedSize(28, 28)
@@ -1464,143 +4376,130 @@ class Navegador(QMainWindow):
         home_btn.setToolTip("Ir a la página de inicio")
         home_btn.setFixedSize(28, 28)
 
-        add_bookmark_btn = QPushButton()
-        add_bookmark_btn.setObjectName("add_bookmark_btn")
-        add_bookmark_btn.setIcon(self.standard_icons["save"])
-        add_bookmark_btn.setToolTip("Añadir esta página a Favoritos")
-        add_bookmark_btn.setFixedSize(28, 28)
+        self.add_bookmark_btn = QPushButton()
+        self.add_bookmark_btn.setObjectName("add_bookmark_btn")
+        self.add_bookmark_btn.setIcon(self.standard_icons["save"])
+        self.add_bookmark_btn.setToolTip("Añadir esta página a Favoritos")
+        self.add_bookmark_btn.setFixedSize(28, 28)
         downloads_btn = QPushButton()
         downloads_btn.setIcon(self.standard_icons["downloads"])
         downloads_btn.setToolTip("Abrir carpeta de descargas")
         downloads_btn.setFixedSize(28, 28)
         settings_btn = QPushButton()
         settings_btn.setIcon(self.standard_icons["settings"])
-        settings_btn.setToolTip("Configuración")
-        settings_btn.setFixedSize(28, 28)
-        personalize_btn = QPushButton()
-        personalize_btn.setIcon(self.standard_icons["personalize"])
-        personalize_btn.setToolTip("Personalizar apariencia")
-        personalize_btn.setFixedSize(28, 28)
-
-        nav_bar.addWidget(atras_btn)
-        nav_bar.addWidget(adelante_btn)
-        nav_bar.addWidget(recargar_btn)
-        nav_bar.addWidget(home_btn)
-
-        url_container_layout.addWidget(security_indicator)
-        url_container_layout.addWidget(url_bar, 1)
-        nav_bar.addWidget(url_container, 1)
-        # --- FIN MEJORA ---
-        
-        reader_mode_btn = QPushButton("📖")
-        reader_mode_btn.setObjectName("reader_mode_btn")
-        reader_mode_btn.setToolTip("Entrar en Modo Lectura")
-        reader_mode_btn.setFixedSize(28, 28)
-        reader_mode_btn.setVisible(True)
-        reader_mode_btn.clicked.connect(self._toggle_reader_mode)
-        nav_bar.addWidget(reader_mode_btn)
-
-        nav_bar.addWidget(add_bookmark_btn)
-        
-        for ext_id, ext_data in self.extensions.items():
-            if not ext_data.get("enabled", False): continue
-            manifest = ext_data.get("manifest", {})
-            if "browser_action" in manifest:
-                action_btn = QPushButton()
-                action_btn.setObjectName(f"browser_action_{ext_id}")
-                action_btn.setFixedSize(28, 28)
-                self._configure_browser_action_button(action_btn, ext_id, manifest["browser_action"])
-                action_btn.clicked.connect(lambda checked, e_id=ext_id: self._handle_browser_action_click(e_id))
-                nav_bar.addWidget(action_btn)
-
-        nav_bar.addWidget(personalize_btn)
-        nav_bar.addWidget(downloads_btn)
-        nav_bar.addWidget(settings_btn)
-        layout.addWidget(nav_bar_widget)
-        
-        # --- MEJORA: Usar QStackedWidget para páginas internas como wemphix:history ---
-        content_stack = QStackedWidget()
-        content_stack.setObjectName("content_stack")
-        web_container = QWidget()
-        web_container_layout = QGridLayout(web_container)
-        web_container_layout.setContentsMargins(0, 0, 0, 0)
-        web_container_layout.setSpacing(0)
-
-        progress_bar = QProgressBar()
-        progress_bar.setFixedHeight(2)
-        progress_bar.setTextVisible(False)
-        progress_bar.setVisible(False)
-
-        find_bar = self._create_find_bar(webview)
-
-        web_container_layout.addWidget(webview, 0, 0)
-        web_container_layout.addWidget(progress_bar, 0, 0, Qt.AlignmentFlag.AlignTop)
-        web_container_layout.addWidget(find_bar, 0, 0, Qt.AlignmentFlag.AlignTop | Qt.AlignmentFlag.AlignRight)
-        content_stack.addWidget(web_container)
-        layout.addWidget(content_stack, 1)
-
-        url_completer.activated.connect(lambda text, wv=webview, bar=url_bar: self._suggestion_selected(text, wv, bar))
+        settings_btn.setToolTip("Configuración")
+        settings_btn.setFixedSize(28, 28)
+        personalize_btn = QPushButton()
+        personalize_btn.setIcon(self.standard_icons["personalize"])
+        personalize_btn.setToolTip("Personalizar apariencia")
+        personalize_btn.setFixedSize(28, 28)
 
-        page = CustomWebEnginePage(self.persistent_profile, webview)
-        page.featurePermissionRequested.connect(self.handle_permission_request)
-        page.customDownloadRequested.connect(self._start_custom_download)
-        page.fullScreenRequested.connect(self._handle_fullscreen_request)
+        nav_bar.addWidget(self.atras_btn)
+        nav_bar.addWidget(self.adelante_btn)
+        nav_bar.addWidget(recargar_btn)
+        nav_bar.addWidget(home_btn)
 
-        self._setup_page_scripts(page)
+        url_container_layout.addWidget(self.security_indicator)
+        url_container_layout.addWidget(self.url_bar, 1)
+        nav_bar.addWidget(url_container, 1)
+        # --- FIN MEJORA ---
 
-        channel = QWebChannel(page)
-        page.setWebChannel(channel)
-        channel.registerObject("browser_api", self.browser_api)
+        self.reader_mode_btn = QPushButton("📖")
+        self.reader_mode_btn.setObjectName("reader_mode_btn")
+        self.reader_mode_btn.setToolTip("Entrar en Modo Lectura")
+        self.reader_mode_btn.setFixedSize(28, 28)
+        self.reader_mode_btn.clicked.connect(self._toggle_reader_mode)
+        nav_bar.addWidget(self.reader_mode_btn)
 
-        self._apply_page_settings(page)
+        nav_bar.addWidget(self.add_bookmark_btn)
 
-        if hasattr(page, 'isAudibleChanged'):
-            page.isAudibleChanged.connect(self._handle_audio_state_change)
-        if hasattr(page, 'audioMutedChanged'):
-            page.audioMutedChanged.connect(self._handle_audio_state_change)
+        # Los botones de las extensiones se añaden al cargarlas (`_update_browser_action_buttons`).
+        self.browser_actions_layout = QHBoxLayout()
+        self.browser_actions_layout.setContentsMargins(0, 0, 0, 0)
+        self.browser_actions_layout.setSpacing(4)
+        nav_bar.addLayout(self.browser_actions_layout)
 
-        webview.setPage(page)
-        webview.setUrl(QUrl(url))
+        nav_bar.addWidget(personalize_btn)
+        nav_bar.addWidget(downloads_btn)
+        nav_bar.addWidget(settings_btn)
 
-        atras_btn.clicked.connect(webview.back)
+        url_completer.activated.connect(lambda text: self._suggestion_selected(text, self._get_current_webview(), self.url_bar))
+        self.atras_btn.clicked.connect(lambda: (webview := self._get_current_webview()) and webview.back())
+        self.adelante_btn.clicked.connect(lambda: (webview := self._get_current_webview()) and webview.forward())
+        recargar_btn.clicked.connect(self._reload_current_tab)
         home_btn.clicked.connect(self._go_home)
 
-        url_bar.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
-        url_bar.customContextMenuRequested.connect(lambda point, bar=url_bar, wv=webview: self._show_url_bar_context_menu(point, bar, wv))
-
-        adelante_btn.clicked.connect(webview.forward)
-        recargar_btn.clicked.connect(webview.reload)
-        url_bar.returnPressed.connect(lambda: self.navegar(webview, url_bar))
-        add_bookmark_btn.clicked.connect(self._add_current_page_to_bookmarks)
+        self.url_bar.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
+        self.url_bar.customContextMenuRequested.connect(lambda point: self._show_url_bar_context_menu(point, self.url_bar, self._get_current_webview()))
+        self.url_bar.returnPressed.connect(lambda: (webview := self._get_current_webview()) and self.navegar(webview, self.url_bar))
+        self.add_bookmark_btn.clicked.connect(self._add_current_page_to_bookmarks)
         downloads_btn.clicked.connect(self._open_downloads_folder)
         settings_btn.clicked.connect(self._open_settings_dialog)
         personalize_btn.clicked.connect(self._open_personalization_dialog)
 
-        webview.loadStarted.connect(lambda: progress_bar.setVisible(True))
-        webview.loadProgress.connect(progress_bar.setValue)
-        webview.loadFinished.connect(lambda: progress_bar.setVisible(False))
-
-        webview.loadFinished.connect(lambda ok, webview=webview: self._on_page_load_finished(ok, webview))
-        webview.loadFinished.connect(self.actualizar_estado_botones_nav)
-        webview.urlChanged.connect(self.actualizar_ui_pestana)
-        # Conectar señales para actualizar el indicador de seguridad
-        webview.urlChanged.connect(lambda qurl, indicator=security_indicator: indicator.update_status())
-        webview.loadFinished.connect(lambda ok, indicator=security_indicator: indicator.update_status())
-
-        index = self.tabs.addTab(tab, "Nueva Pestaña")
-        tab.setProperty("tab_id", str(uuid.uuid4()))
-        if focus:
-            self.tabs.setCurrentIndex(index)
-        self.tab_last_active_time[tab] = time.time()
-        self._update_vertical_tabs_list()
-
-        if not self.is_incognito:
-            self.browser_api.tabAdded.emit({"index": index, "title": "Nueva Pestaña", "url": url})
+        return nav_bar_widget
 
-        webview.titleChanged.connect(self.actualizar_titulo_pestana)
-        webview.iconChanged.connect(self.actualizar_icono_pestana)
+    def _update_browser_action_buttons(self):
+        """Pone en la barra de navegación un botón por cada extensión activa con `browser_action`."""
+        while (item := self.browser_actions_layout.takeAt(0)) is not None:
+            if button := item.widget():
+                button.deleteLater()
+        for ext_id, ext_data in self.extensions.items():
+            if not ext_data.get("enabled", False): continue
+            manifest = ext_data.get("manifest", {})
+            if "browser_action" in manifest:
+                action_btn = QPushButton()
+                action_btn.setObjectName(f"browser_action_{ext_id}")
+                action_btn.setFixedSize(28, 28)
+                self._configure_browser_action_button(action_btn, ext_id, manifest["browser_action"])
+                action_btn.clicked.connect(lambda checked, e_id=ext_id: self._handle_browser_action_click(e_id))
+                self.browser_actions_layout.addWidget(action_btn)
 
-        return webview
+    def _attach_tab_chrome(self, tab: QWidget):
+        """Lleva la barra de navegación y la de búsqueda de la ventana a la pestaña que se acaba de activar."""
+        if not (record := self.tab_registry.by_widget(tab)) or not record.webview:
+            return
+        previous_webview = self.security_indicator.webview
+        if self.find_bar.isVisible() and previous_webview is not None and previous_webview is not record.webview:
+            previous_webview.findText("") # Quita los resaltados de la búsqueda en la pestaña anterior.
+        self.find_bar.setVisible(False)
+
+        tab.layout().insertWidget(0, self.nav_bar)
+        self.nav_bar.setVisible(True)
+        record.webview.parentWidget().layout().addWidget(self.find_bar, 0, 0, Qt.AlignmentFlag.AlignTop | Qt.AlignmentFlag.AlignRight)
+        self.security_indicator.set_webview(record.webview)
+        self._refresh_request_stats_badge()
+        self._sync_nav_bar(record.webview)
+
+    def _detach_tab_chrome(self, tab: QWidget):
+        """Saca las barras de la ventana de una pestaña que se va a destruir, para que no se destruyan con ella."""
+        for bar in (self.nav_bar, self.find_bar):
+            if tab.isAncestorOf(bar):
+                bar.setVisible(False)
+                bar.setParent(self)
+        if (webview := self.security_indicator.webview) is not None and tab.isAncestorOf(webview):
+            self.security_indicator.set_webview(None)
+
+    def _sync_nav_bar(self, webview: QWebEngineView, keep_typed_url=False):
+        """
+        Refleja en la barra de navegación el estado de `webview` si es el de la pestaña activa.
+        Con `keep_typed_url` no se pisa lo que el usuario esté escribiendo en la barra de URL.
+        """
+        if webview is None or webview is not self._get_current_webview():
+            return
+        url = webview.url().toString()
+        if not (keep_typed_url and self.url_bar.hasFocus() and self.url_bar.isModified()):
+            # En la página de nueva pestaña la barra queda vacía, lista para escribir.
+            self.url_bar.setText("" if url == self.NEW_TAB_URL else url)
+        history = webview.history()
+        self.atras_btn.setEnabled(history.canGoBack())
+        self.adelante_btn.setEnabled(history.canGoForward())
+        self.add_bookmark_btn.setIcon(self.standard_icons["apply" if self._is_bookmarked(url) else "save"])
+        tab = self._find_widget_for_webview(webview)
+        in_reader_mode = bool(tab and tab.property("in_reader_mode"))
+        self.reader_mode_btn.setText("❌" if in_reader_mode else "📖")
+        self.reader_mode_btn.setToolTip("Salir del Modo Lectura" if in_reader_mode else "Entrar en Modo Lectura")
+        self.security_indicator.update_status()
 
     def _configure_browser_action_button(self, button: QPushButton, ext_id: str, action_info: dict):
         icon_path_str = action_info.get("default_icon")
@@ -1613,7 +4512,8 @@ class Navegador(QMainWindow):
         if title:
             button.setToolTip(title)
 
-    def _create_find_bar(self, webview: QWebEngineView):
+    def _create_find_bar(self) -> QFrame:
+        """Barra de búsqueda en la página, compartida por todas las pestañas como la de navegación."""
         find_bar = QFrame()
         find_bar.setObjectName("find_bar")
         find_bar.setFrameShape(QFrame.Shape.StyledPanel)
@@ -1633,11 +4533,11 @@ class Navegador(QMainWindow):
         find_layout = QHBoxLayout(find_bar)
         find_layout.setContentsMargins(5, 2, 5, 2)
 
-        find_input = QLineEdit()
+        self.find_input = find_input = QLineEdit()
         find_input.setPlaceholderText("Buscar en la página...")
         find_input.setObjectName("find_input")
         
-        find_results_label = QLabel("0/0")
+        self.find_results_label = find_results_label = QLabel("0/0")
         find_results_label.setObjectName("find_results_label")
 
         prev_btn = QPushButton("<")
@@ -1657,18 +4557,21 @@ class Navegador(QMainWindow):
         find_layout.addWidget(close_btn)
         find_bar.setVisible(False)
 
-        close_btn.clicked.connect(lambda: find_bar.setVisible(False))
+        close_btn.clicked.connect(self._close_find_bar)
 
-        # Conectar señales aquí, donde tenemos la referencia al webview
-        find_input.textChanged.connect(lambda text, wv=webview: self._find_text(text, wv))
-        prev_btn.clicked.connect(lambda wv=webview: self._find_previous(wv))
-        next_btn.clicked.connect(lambda wv=webview: self._find_next(wv))
+        # Siempre se busca en la pestaña activa; los resultados llegan por `findTextFinished` de cada página.
+        find_input.textChanged.connect(lambda text: self._find_text(text, self._get_current_webview()))
+        prev_btn.clicked.connect(lambda: self._find_previous(self._get_current_webview()))
+        next_btn.clicked.connect(lambda: self._find_next(self._get_current_webview()))
         find_input.returnPressed.connect(next_btn.click)
-        webview.page().findTextFinished.connect(
-            lambda result, label=find_results_label: self._update_find_results(result, label))
 
         return find_bar
 
+    def _close_find_bar(self):
+        self.find_bar.setVisible(False)
+        if webview := self._get_current_webview():
+            webview.findText("")
+
     def _on_page_load_finished(self, ok, webview):
         """
         Centraliza las acciones que ocurren cuando una página termina de cargar.
@@ -1677,19 +4580,54 @@ class Navegador(QMainWindow):
             return
 
         self._add_to_history(ok, webview)
-        
-        # Si la página cargada es una página web normal, asegurarse de que se muestra
-        tab_widget = self._find_widget_for_webview(webview)
-        if tab_widget:
-            content_stack = tab_widget.findChild(QStackedWidget, "content_stack")
-            if content_stack and content_stack.currentWidget() != webview.parentWidget():
-                content_stack.setCurrentWidget(webview.parentWidget())
+        if self.top_sites.needs_thumbnail(TopSites.site_key(webview.url().toString())):
+            # Se espera un poco para que la miniatura no salga a medio pintar. El temporizador
+            # es hijo del webview, así que desaparece con él si se cierra la pestaña antes.
+            timer = QTimer(webview)
+            timer.setSingleShot(True)
+            timer.timeout.connect(lambda wv=webview: self._capture_top_site_thumbnail(wv))
+            timer.timeout.connect(timer.deleteLater)
+            timer.start(1500)
+
+    def _capture_top_site_thumbnail(self, webview: QWebEngineView):
+        key = TopSites.site_key(webview.url().toString())
+        # Solo se puede capturar lo que se está viendo.
+        if not webview.isVisible() or not self.top_sites.needs_thumbnail(key):
+            return
+        size = QSize(320, 200)
+        pixmap = webview.grab().scaled(size, Qt.AspectRatioMode.KeepAspectRatioByExpanding,
+                                       Qt.TransformationMode.SmoothTransformation).copy(0, 0, size.width(), size.height())
+        self.top_sites.set_image(key, "thumb", self._encode_pixmap(pixmap, "JPG", 80))
+
+    @staticmethod
+    def _encode_pixmap(pixmap: QPixmap, image_format: str, quality=-1) -> bytes:
+        data = QByteArray()
+        buffer = QBuffer(data)
+        buffer.open(QIODevice.OpenModeFlag.WriteOnly)
+        pixmap.save(buffer, image_format, quality)
+        buffer.close()
+        return bytes(data)
+
+    def _record_newtab_paint(self, first_paint_ms: float, painted_at_ms: float):
+        """Lo llama wemphix:newtab al pintar por primera vez (ver NewTabPaintStats)."""
+        # Las pestañas nuevas que nunca llegaron a pintar no cuentan.
+        while self._newtab_open_times and painted_at_ms - self._newtab_open_times[0][0] > 5000:
+            self._newtab_open_times.popleft()
+        open_to_paint_ms, pooled = None, False
+        if self._newtab_open_times and self._newtab_open_times[0][0] <= painted_at_ms:
+            opened_at_ms, pooled = self._newtab_open_times.popleft()
+            open_to_paint_ms = painted_at_ms - opened_at_ms
+        # Una pestaña de reserva no pinta hasta que se muestra: su first-contentful-paint
+        # incluye el tiempo que pasó esperando y no dice nada de la carga.
+        self.newtab_paint_stats.record(None if pooled else first_paint_ms, open_to_paint_ms, pooled)
+        self.newTabPainted.emit()
 
     def navegar(self, webview, url_bar):
         url = url_bar.text()
         
         if url.startswith("wemphix:"):
-            self._handle_internal_url(url, webview)
+            # Las páginas internas las sirve InternalPageSchemeHandler.
+            webview.setUrl(QUrl(url))
             return
 
         parsed_url = urlparse(url)
@@ -1703,31 +4641,6 @@ class Navegador(QMainWindow):
                 url = "https://" + url
             webview.setUrl(QUrl(url))
 
-    def _handle_internal_url(self, url: str, webview: QWebEngineView):
-        tab_widget = self._find_widget_for_webview(webview)
-        if not tab_widget: return
-
-        content_stack = tab_widget.findChild(QStackedWidget, "content_stack")
-        if not content_stack: return
-
-        if url == "wemphix:history":
-            history_page = tab_widget.findChild(HistoryPageWidget)
-            if not history_page:
-                history_page = HistoryPageWidget(self)
-                content_stack.addWidget(history_page)
-            
-            content_stack.setCurrentWidget(history_page)
-            self._update_tab_ui_for_internal_page(tab_widget, "history")
-
-    def _update_tab_ui_for_internal_page(self, tab_widget: QWidget, page_name: str):
-        index = self.tabs.indexOf(tab_widget)
-        if index == -1: return
-
-        if page_name == "history":
-            self.tabs.setTabText(index, "Historial")
-            self.tabs.setTabIcon(index, self.style().standardIcon(QStyle.StandardPixmap.SP_FileDialogDetailedView))
-            self._update_vertical_tabs_list()
-
     def _set_user_agent(self, user_agent):
         self.persistent_profile.setHttpUserAgent(user_agent)
         QMessageBox.information(self, "User-Agent Cambiado", "El User-Agent ha sido actualizado. Recarga las pestañas para aplicar el cambio.")
@@ -1755,12 +4668,17 @@ class Navegador(QMainWindow):
 
     def closeEvent(self, event):
         self._stop_rgb_theme()
+        self._apply_user_block_list()
         if not self.is_incognito:
             self.settings.setValue("geometry", self.saveGeometry())
             self.settings.setValue("windowState", self.saveState())
             self._save_session()
             self._save_history()
+            self.top_sites.save()
             self._save_notes()
+            if ListProxyAutoConfig.active is not None:
+                ListProxyAutoConfig.save_allowed(self.profile_path, self.ad_blocker.allowed_listed_hosts)
+            self.https_upgrader.save()
             for window in list(self.other_windows):
                 window.close()
         elif self.main_window and self in self.main_window.other_windows:
@@ -1771,6 +4689,10 @@ class Navegador(QMainWindow):
                 webview.setPage(None) # Libera la página
 
         # Limpieza explícita de pestañas para evitar fugas de memoria
+        self.vertical_tabs_model.clear()
+        self.spare_tab_timer.stop()
+        self._discard_spare_tabs()
+        self.tab_registry.clear()
         while self.tabs.count() > 0:
             widget = self.tabs.widget(0)
             self.tabs.removeTab(0)
@@ -1904,6 +4826,7 @@ class Navegador(QMainWindow):
                             self.bookmark_manager.bookmarks.append(bm)
                     self.bookmark_manager.save()
                     self.bookmark_manager.populate_widget()
+                    self._notify_internal_pages("bookmarks")
 
                 if "history" in keys_to_import and "history" in data:
                     existing_urls = {h['url'] for h in self.history}
@@ -1912,6 +4835,7 @@ class Navegador(QMainWindow):
                             self.history.append(h)
                     self._save_history()
                     self._update_history_list_widget()
+                    self._broadcast_history_update()
                 
                 QMessageBox.information(self, "Importación Completa", "Los datos seleccionados han sido importados.\nAlgunos cambios pueden requerir un reinicio para tener efecto.")
 
@@ -1979,6 +4903,8 @@ class Navegador(QMainWindow):
 
     def _suggestion_selected(self, text: str, webview: QWebEngineView, url_bar: QLineEdit):
         """Navega a la URL de una sugerencia seleccionada."""
+        if not webview:
+            return
         try:
             start_index = max(text.rfind("http://"), text.rfind("https://"))
             if start_index != -1:
@@ -2034,29 +4960,29 @@ class Navegador(QMainWindow):
         popup.show()
 
     def _find_text(self, text, webview):
+        if not webview:
+            return
         if text:
             webview.findText(text)
         else:
             webview.findText("")
-            label = webview.parentWidget().findChild(QWidget, "find_bar").findChild(QLabel, "find_results_label")
-            if label:
-                label.setText("0/0")
+            self.find_results_label.setText("0/0")
 
     def _find_next(self, webview):
-        find_input = webview.parentWidget().findChild(QWidget, "find_bar").findChild(QLineEdit, "find_input")
-        if find_input:
-            webview.findText(find_input.text())
+        if webview:
+            webview.findText(self.find_input.text())
 
     def _find_previous(self, webview):
-        find_input = webview.parentWidget().findChild(QWidget, "find_bar").findChild(QLineEdit, "find_input")
-        if find_input:
-            webview.findText(find_input.text(), QWebEnginePage.FindFlag.FindBackward)
+        if webview:
+            webview.findText(self.find_input.text(), QWebEnginePage.FindFlag.FindBackward)
 
-    def _update_find_results(self, result, label):
+    def _update_find_results(self, result, webview):
+        if webview is not self._get_current_webview():
+            return
         if result.numberOfMatches() > 0:
-            label.setText(f"{result.activeMatch()}/{result.numberOfMatches()}")
+            self.find_results_label.setText(f"{result.activeMatch()}/{result.numberOfMatches()}")
         else:
-            label.setText("0/0")
+            self.find_results_label.setText("0/0")
 
     def _zoom_in(self):
         if webview := self._get_current_webview():
@@ -2115,20 +5041,42 @@ class Navegador(QMainWindow):
 
     def _save_session(self):
         if self.is_incognito: return
-        urls = [self.tabs.widget(i).findChild(QWebEngineView).url().toString() for i in range(self.tabs.count()) if self.tabs.widget(i)]
+        saved_tabs = []
+        for i in range(self.tabs.count()):
+            if not (widget := self.tabs.widget(i)): continue
+            entry = {"url": self._tab_url(widget), "title": widget.property("original_title") or self.tabs.tabText(i)}
+            # Con el icono guardado, las pestañas restauradas se ven bien aunque aún no hayan cargado.
+            if not (icon := self.tabs.tabIcon(i)).isNull():
+                entry["icon"] = base64.b64encode(self._encode_pixmap(icon.pixmap(16, 16), "PNG")).decode("ascii")
+            saved_tabs.append(entry)
         try:
-            with open(self.session_path, "w", encoding="utf-8") as f: json.dump(urls, f)
+            with open(self.session_path, "w", encoding="utf-8") as f: json.dump(saved_tabs, f)
         except IOError: pass
 
+    @staticmethod
+    def _decode_session_icon(data):
+        pixmap = QPixmap()
+        try:
+            if data and pixmap.loadFromData(base64.b64decode(data), "PNG"):
+                return QIcon(pixmap)
+        except (ValueError, TypeError):
+            pass
+        return None
+
     def _restore_session(self, open_default_if_empty=True):
         if self.is_incognito or not os.path.exists(self.session_path):
             if open_default_if_empty:
                 self.agregar_pestana(self.settings.value("homepage", "https://www.google.com"))
             return
         try:
-            with open(self.session_path, "r", encoding="utf-8") as f: urls = json.load(f)
-            if urls:
-                for url in urls: self.agregar_pestana(url, focus=False)
+            with open(self.session_path, "r", encoding="utf-8") as f: saved_tabs = json.load(f)
+            if saved_tabs:
+                # Solo se crea el webview de la pestaña activa; el resto se quedan provisionales hasta que se abran.
+                for entry in saved_tabs:
+                    if isinstance(entry, str):
+                        entry = {"url": entry} # Sesiones antiguas: solo la URL.
+                    self.agregar_pestana(entry.get("url") or self.NEW_TAB_URL, focus=False, title=entry.get("title", ""),
+                                         icon=self._decode_session_icon(entry.get("icon")))
                 if self.tabs.count() > 0: self.tabs.setCurrentIndex(0)
             elif open_default_if_empty:
                 self.agregar_pestana(self.settings.value("homepage", "https://www.google.com"))
@@ -2198,7 +5146,12 @@ class Navegador(QMainWindow):
         self.bookmarks_list_widget.itemDoubleClicked.connect(self._go_to_bookmark)
         
         # Instantiate the manager, which will load data and populate the widget
-        self.bookmark_manager = BookmarkManager(self.bookmarks_path, self.bookmarks_list_widget)
+        if self.bookmark_manager is None:
+            self.bookmark_manager = BookmarkManager(self.bookmarks_path, self.bookmarks_list_widget)
+        else:
+            # Ya lo había creado wemphix:bookmarks; solo le falta la lista del panel.
+            self.bookmark_manager.widget = self.bookmarks_list_widget
+            self.bookmark_manager.populate_widget()
         
         # Add the (now populated) list widget to the layout
         layout.addWidget(self.bookmarks_list_widget)
@@ -2296,13 +5249,23 @@ class Navegador(QMainWindow):
     def _paste_and_go(self, webview: QWebEngineView, url_bar: QLineEdit):
         clipboard = QApplication.instance().clipboard()
         text = clipboard.text()
-        if text:
+        if text and webview:
             url_bar.setText(text)
             self.navegar(webview, url_bar)
 
     def _update_user_block_list(self, text: str):
+        """Se llama con cada pulsación; el guardado y la reconstrucción esperan a que se deje de escribir."""
+        self._pending_user_block_list = text
+        self.user_block_list_timer.start()
+
+    def _apply_user_block_list(self):
+        self.user_block_list_timer.stop()
+        if self._pending_user_block_list is None:
+            return
+        text, self._pending_user_block_list = self._pending_user_block_list, None
         self.settings.setValue("user_block_list", text)
-        self.ad_blocker.update_user_block_list(text)
+        self._schedule_adblock_rebuild(user_text=text)
+        self._notify_proxy_auto_config_restart()
 
     def _open_profile_folder(self):
         if self.is_incognito:
@@ -2417,7 +5380,7 @@ class Navegador(QMainWindow):
         
         for i in range(self.tabs.count()):
             title = self.tabs.tabText(i)
-            url = self.tabs.widget(i).findChild(QWebEngineView).url().toString()
+            url = self._tab_url(self.tabs.widget(i))
             commands.append({'type': 'tab', 'text': f"Pestaña: {title}", 'icon': self.tabs.tabIcon(i), 'data': i, 'keywords': f"pestaña tab {title} {url}"})
 
         
@@ -2431,6 +5394,9 @@ class Navegador(QMainWindow):
 
         
         commands.append({'type': 'command', 'text': "Nueva Pestaña", 'icon': style.standardIcon(QStyle.StandardPixmap.SP_FileIcon), 'data': 'new_tab', 'keywords': 'nueva pestaña new tab'})
+        commands.append({'type': 'command', 'text': "Historial", 'icon': style.standardIcon(QStyle.StandardPixmap.SP_FileDialogDetailedView), 'data': 'history', 'keywords': 'historial history'})
+        commands.append({'type': 'command', 'text': "Favoritos", 'icon': style.standardIcon(QStyle.StandardPixmap.SP_DialogSaveButton), 'data': 'bookmarks', 'keywords': 'favoritos bookmarks marcadores'})
+        commands.append({'type': 'command', 'text': "Descargas", 'icon': self.standard_icons["downloads"], 'data': 'downloads', 'keywords': 'descargas downloads'})
         commands.append({'type': 'command', 'text': "Configuración", 'icon': style.standardIcon(QStyle.StandardPixmap.SP_FileDialogDetailedView), 'data': 'settings', 'keywords': 'configuracion settings opciones'})
         commands.append({'type': 'command', 'text': "Limpiar Datos de Navegación", 'icon': style.standardIcon(QStyle.StandardPixmap.SP_TrashIcon), 'data': 'clear_data', 'keywords': 'limpiar borrar datos cache cookies'})
 
@@ -2444,6 +5410,7 @@ class Navegador(QMainWindow):
         elif cmd_type in ('bookmark', 'history'): self.agregar_pestana(cmd_data)
         elif cmd_type == 'command':
             if cmd_data == 'new_tab': self.agregar_pestana(focus=True)
+            elif cmd_data in ('history', 'bookmarks', 'downloads'): self.agregar_pestana(f"wemphix:{cmd_data}")
             elif cmd_data == 'settings': self._open_settings_dialog()
             elif cmd_data == 'clear_data': self._clear_browsing_data()
 
@@ -2469,12 +5436,13 @@ class Navegador(QMainWindow):
         feature_key = feature_key_map.get(feature)
         if not feature_key: return
 
-        host = origin.host()
+        # Los permisos se guardan por sitio (eTLD+1): lo decidido en www.ejemplo.com vale para mapas.ejemplo.com.
+        site = registrable_domain(origin.host())
         page = self.sender()
         if not isinstance(page, QWebEnginePage): return
 
-        saved_permissions = self.settings.value("site_permissions", {}, type=dict)
-        permission_status = saved_permissions.get(host, {}).get(feature_key)
+        saved_permissions = self._load_site_permissions()
+        permission_status = saved_permissions.get(site, {}).get(feature_key)
 
         if permission_status == "granted":
             page.setFeaturePermission(origin, feature, QWebEnginePage.PermissionPolicy.PermissionGrantedByUser)
@@ -2499,11 +5467,32 @@ class Navegador(QMainWindow):
         page.setFeaturePermission(origin, feature, permission_to_set)
 
         if dialog.is_remember_checked():
-            host_permissions = saved_permissions.get(host, {})
-            host_permissions[feature_key] = status_to_save
-            saved_permissions[host] = host_permissions
+            site_permissions = saved_permissions.get(site, {})
+            site_permissions[feature_key] = status_to_save
+            saved_permissions[site] = site_permissions
             self.settings.setValue("site_permissions", saved_permissions)
 
+    def _load_site_permissions(self):
+        """
+        Devuelve los permisos guardados, indexados por sitio. Las entradas antiguas,
+        guardadas por host, se agrupan bajo su sitio (sin pisar lo ya guardado para el
+        sitio) y se vuelven a guardar.
+        """
+        saved_permissions = self.settings.value("site_permissions", {}, type=dict)
+        by_site = {}
+        for host, permissions in saved_permissions.items():
+            if registrable_domain(host) == host:
+                by_site.setdefault(host, {}).update(permissions)
+        for host, permissions in saved_permissions.items():
+            site = registrable_domain(host)
+            if site != host:
+                site_permissions = by_site.setdefault(site, {})
+                for feature_key, status in permissions.items():
+                    site_permissions.setdefault(feature_key, status)
+        if by_site != saved_permissions:
+            self.settings.setValue("site_permissions", by_site)
+        return by_site
+
     def _start_custom_download(self, url: QUrl):
         """Inicia una descarga mediante programación desde una acción del menú contextual."""
         self.persistent_profile.download(url)
@@ -2514,7 +5503,19 @@ class Navegador(QMainWindow):
             QMessageBox.information(self, "Modo Incógnito", "Las descargas no están soportadas en este modo.")
             download.cancel()
             return
-        
+
+        download_url = download.url()
+        if self.malware_index.contains(download_url.host()):
+            download.cancel()
+            page = download.page() if hasattr(download, "page") else None
+            if interceptor := getattr(page, "tab_request_interceptor", None):
+                interceptor.log_security_event("malware", download_url.toString(), f"Descarga cancelada: {download.suggestedFileName()}")
+            print(f"Descarga bloqueada desde un sitio peligroso: {download_url.toString()}")
+            QMessageBox.warning(self, "Descarga bloqueada",
+                                f"Se ha cancelado la descarga de <b>{html.escape(download.suggestedFileName())}</b> porque "
+                                f"<b>{html.escape(download_url.host())}</b> está en la lista de sitios peligrosos.")
+            return
+
         download.accept()
         
         if self.downloads_dock is None:
@@ -2637,6 +5638,7 @@ class Navegador(QMainWindow):
             if info["status_item"].text() != "Descargando":
                 info["speed_item"].setText("-")
                 info["time_remaining_item"].setText("-")
+            self._notify_internal_pages("downloads")
 
             if download.isFinished():
                 self._finalize_download(download)
@@ -2737,6 +5739,21 @@ class Navegador(QMainWindow):
         for i, download in enumerate(self.downloads.keys()):
             self.downloads[download]['row'] = i
 
+    def _describe_download(self, download: QWebEngineDownloadRequest, info: dict) -> dict:
+        """Resumen de una descarga para la página wemphix:downloads."""
+        final_path = info.get("final_path")
+        return {
+            "id": download.id(),
+            "file": os.path.basename(final_path or download.suggestedFileName()),
+            "url": download.url().toString(),
+            "status": info["status_item"].text(),
+            "received": download.receivedBytes(),
+            "total": download.totalBytes(),
+            "finished": download.isFinished(),
+            "paused": download.isPaused(),
+            "saved": bool(final_path),
+        }
+
     def _open_downloads_folder(self):
         downloads_path = os.path.join(os.path.expanduser("~"), "Downloads")
         QDesktopServices.openUrl(QUrl.fromLocalFile(downloads_path))
@@ -2764,19 +5781,18 @@ class Navegador(QMainWindow):
         settings.setAttribute(QWebEngineSettings.WebAttribute.JavascriptEnabled, True)
         settings.setAttribute(QWebEngineSettings.WebAttribute.LocalStorageEnabled, True)
 
+        # Las imágenes, fuentes y vídeos de los modos de ahorro los bloquea el interceptor (DataSaverPolicy).
         if self.super_memory_saver_enabled: # Modo Eficiencia Máxima
-            settings.setAttribute(QWebEngineSettings.WebAttribute.AutoLoadImages, False)
             settings.setAttribute(QWebEngineSettings.WebAttribute.JavascriptEnabled, False)
             settings.setAttribute(QWebEngineSettings.WebAttribute.LocalStorageEnabled, False)
-        elif self.battery_saver_enabled: # Modo Ahorro de Batería
-            settings.setAttribute(QWebEngineSettings.WebAttribute.AutoLoadImages, False)
 
     def _update_performance_flags(self, mode: str):
         self.battery_saver_enabled = (mode == "battery")
         self.super_memory_saver_enabled = (mode == "super")
+        self.ad_blocker.set_data_saver(DataSaverPolicy.for_mode(mode))
 
     def _set_performance_mode(self, mode: str):
-        """Establece el modo de rendimiento y recarga las pestañas."""
+        """Establece el modo de rendimiento. El interceptor lo aplica a las peticiones nuevas, sin recargar."""
         if mode == self.performance_mode:
             return
 
@@ -2800,12 +5816,12 @@ class Navegador(QMainWindow):
         self.performance_mode = mode
         self._update_performance_flags(mode)
 
-        for i in range(self.tabs.count()):
-            if webview := self.tabs.widget(i).findChild(QWebEngineView):
-                self._apply_page_settings(webview.page())
-                webview.reload()
+        for record in self.tab_registry:
+            if record.page is not None:
+                # Los ajustes de la página (JavaScript, almacenamiento) se aplican en su próxima navegación.
+                self._apply_page_settings(record.page)
 
-        QMessageBox.information(self, "Modo de Rendimiento Cambiado", "El modo de rendimiento ha sido actualizado. Las pestañas se han recargado para aplicar los cambios.")
+        self.statusBar().showMessage("Modo de rendimiento actualizado. Se aplica a los recursos que se carguen a partir de ahora.", 5000)
 
     def _toggle_hibernation(self, enabled):
         """Activa o desactiva la hibernación de pestañas."""
@@ -2813,31 +5829,130 @@ class Navegador(QMainWindow):
         self.settings.setValue("hibernationEnabled", enabled)
         if enabled:
             self.hibernation_timer.start()
-            QMessageBox.information(self, "Hibernación Activada", "Las pestañas inactivas se suspenderán automáticamente para ahorrar recursos.")
+            QMessageBox.information(self, "Hibernación Activada", "Cuando falte memoria, se suspenderán las pestañas que lleven más tiempo sin usarse.")
         else:
             self.hibernation_timer.stop()
             QMessageBox.information(self, "Hibernación Desactivada", "Las pestañas ya no se suspenderán.")
 
-    def _check_tabs_for_hibernation(self):
-        """Comprueba periódicamente si alguna pestaña debe ser hibernada."""
-        if not self.hibernation_enabled or self.tabs.count() <= 1:
-            return
+    def _configure_memory_limits(self):
+        scheduler = self.tab_discard_scheduler
+        budget, ok = QInputDialog.getInt(self, "Límites de memoria",
+                                         "Memoria máxima del navegador, con sus procesos (MB, 0 = sin límite):",
+                                         scheduler.budget_mb, 0, 1024 * 1024, 256)
+        if not ok: return
+        min_available, ok = QInputDialog.getInt(self, "Límites de memoria",
+                                                "Memoria del sistema que se intenta dejar libre (MB, 0 = no vigilar):",
+                                                scheduler.min_available_mb, 0, 1024 * 1024, 256)
+        if not ok: return
+        scheduler.budget_mb, scheduler.min_available_mb = budget, min_available
+        self.settings.setValue("tabMemoryBudgetMB", budget)
+        self.settings.setValue("minAvailableMemoryMB", min_available)
+
+    # Si algún campo de formulario tiene un valor distinto del inicial, descartar la pestaña perdería lo escrito.
+    FORM_DIRTY_SCRIPT = """
+    (() => {
+        for (const field of document.querySelectorAll("input, textarea, select")) {
+            if (field.type === "checkbox" || field.type === "radio") {
+                if (field.checked !== field.defaultChecked) return true;
+            } else if (field.tagName === "SELECT") {
+                for (const option of field.options) if (option.selected !== option.defaultSelected) return true;
+            } else if (field.type !== "hidden" && field.value !== field.defaultValue) {
+                return true;
+            }
+        }
+        return false;
+    })()
+    """
 
-        current_time = time.time()
-        current_index = self.tabs.currentIndex()
-        hibernation_threshold = 5 * 60  # 5 minutos
+    def _check_tabs_for_hibernation(self, on_done=None):
+        """
+        Comprueba periódicamente la memoria y, si falta, hiberna las pestañas que elija
+        TabDiscardScheduler. Antes pregunta a cada candidata si tiene un formulario a medio
+        rellenar, así que la decisión llega de forma asíncrona; `on_done` recibe entonces la
+        lista de decisiones (la usa benchmarks/browser_benchmarks.py).
+        """
+        if (on_done is None and not self.hibernation_enabled) or self._discard_pass_running or self.tabs.count() <= 1:
+            return
+        scheduler = self.tab_discard_scheduler
+        browser_mb, memory_by_pid = scheduler.process_memory_mb()
+        available_mb = scheduler.available_mb()
+        current_widget = self.tabs.currentWidget()
+        records = []
+        if scheduler.excess_mb(browser_mb, available_mb) > 0:
+            for i in range(self.tabs.count()):
+                widget = self.tabs.widget(i)
+                if widget is current_widget or widget.property("is_hibernated"):
+                    continue
+                if (record := self.tab_registry.by_widget(widget)) and record.page:
+                    records.append(record)
+        if not records:
+            if on_done: on_done([])
+            return
 
-        for i in range(self.tabs.count()):
-            if i == current_index:
-                continue
-            
-            widget = self.tabs.widget(i)
-            if not widget or widget.property("is_hibernated"):
+        self._discard_pass_running = True
+        form_dirty = {}
+        finished = []
+
+        def finish():
+            if finished: return
+            finished.append(True)
+            self._discard_pass_running = False
+            decisions = self._finish_discard_pass(records, form_dirty, memory_by_pid, browser_mb, available_mb)
+            if on_done: on_done(decisions)
+
+        def collect(widget, dirty):
+            form_dirty[widget] = bool(dirty)
+            if len(form_dirty) == len(records):
+                finish()
+
+        for record in records:
+            record.page.runJavaScript(self.FORM_DIRTY_SCRIPT, QWebEngineScript.ScriptWorldId.ApplicationWorld,
+                                      lambda dirty, widget=record.widget: collect(widget, dirty))
+        # Las páginas que no contesten se tratan como si tuvieran un formulario sin enviar. El
+        # temporizador es hijo de la ventana para que no salte si esta se cierra antes.
+        timeout = QTimer(self)
+        timeout.setSingleShot(True)
+        timeout.timeout.connect(finish)
+        timeout.timeout.connect(timeout.deleteLater)
+        timeout.start(2000)
+
+    def _finish_discard_pass(self, records, form_dirty, memory_by_pid, browser_mb, available_mb) -> list:
+        scheduler = self.tab_discard_scheduler
+        now = time.time()
+        candidates = []
+        for record in records:
+            index = record.index
+            # Puede haberse cerrado, activado o hibernado mientras se esperaba a las páginas.
+            if index == -1 or record.widget is self.tabs.currentWidget() or record.widget.property("is_hibernated"):
                 continue
-
-            last_active = self.tab_last_active_time.get(widget, current_time)
-            if current_time - last_active > hibernation_threshold:
-                self._hibernate_tab(i)
+            page = record.page
+            candidates.append(TabDiscardCandidate(
+                record.widget, self.tabs.tabText(index), self.tab_last_active_time.get(record.widget, now),
+                audible=hasattr(page, 'isAudible') and page.isAudible(),
+                form_dirty=form_dirty.get(record.widget, True),
+                grouped=bool(record.widget.property("tab_group")),
+                renderer_pid=page.renderProcessPid() if hasattr(page, 'renderProcessPid') else 0))
+
+        excess_mb = scheduler.excess_mb(browser_mb, available_mb)
+        simulated = " (simulada)" if scheduler.simulated_available_mb is not None else ""
+        print(f"INFO: Memoria: navegador {browser_mb:.0f} MB, disponible en el sistema {available_mb:.0f} MB{simulated}; "
+              f"hay que liberar {excess_mb:.0f} MB.")
+        recent = sum(1 for c in candidates if now - c.last_active < scheduler.MIN_IDLE_S)
+        audible = sum(1 for c in candidates if c.audible)
+        dirty = sum(1 for c in candidates if c.form_dirty)
+        if recent or audible or dirty:
+            print(f"INFO: Pestañas protegidas: {audible} con audio, {dirty} con formularios sin enviar, "
+                  f"{recent} usadas hace menos de {scheduler.MIN_IDLE_S} s.")
+
+        decisions = scheduler.plan(candidates, memory_by_pid, browser_mb, available_mb, now)
+        if not decisions:
+            print("INFO: No hay pestañas que se puedan hibernar.")
+        for candidate, estimate_mb in decisions:
+            print(f"INFO: Se hiberna «{candidate.title}»: inactiva {(now - candidate.last_active) / 60:.0f} min"
+                  f"{', en un grupo' if candidate.grouped else ''}, libera ≈{estimate_mb:.0f} MB.")
+            if (record := self.tab_registry.by_widget(candidate.key)) and record.index != -1:
+                self._hibernate_tab(record.index)
+        return decisions
 
     def _hibernate_tab(self, index):
         """Suspende una pestaña para liberar recursos."""
@@ -2866,7 +5981,16 @@ class Navegador(QMainWindow):
         
         
         webview.stop()
-        webview.setUrl(QUrl("about:blank"))
+        # Descartar la página libera su renderizador y conserva el historial de la pestaña. Qt
+        # no lo permite en todos los casos (p. ej. con las herramientas de desarrollo abiertas);
+        # entonces se vacía cargando about:blank.
+        page = webview.page()
+        if hasattr(QWebEnginePage, "LifecycleState"):
+            page.setLifecycleState(QWebEnginePage.LifecycleState.Discarded)
+        if hasattr(QWebEnginePage, "LifecycleState") and page.lifecycleState() == QWebEnginePage.LifecycleState.Discarded:
+            widget.setProperty("hibernation_discarded", True)
+        else:
+            webview.setUrl(QUrl("about:blank"))
 
         
         self.tabs.setTabText(index, f"💤 {original_title}")
@@ -2884,7 +6008,13 @@ class Navegador(QMainWindow):
                 hibernation_page.deleteLater()
 
         webview = widget.findChild(QWebEngineView)
-        webview.setUrl(QUrl(widget.property("hibernation_url")))
+        if widget.property("hibernation_discarded"):
+            # Al volver a estar activa, la página se recarga con su historial.
+            if webview.page().lifecycleState() != QWebEnginePage.LifecycleState.Active:
+                webview.page().setLifecycleState(QWebEnginePage.LifecycleState.Active)
+            widget.setProperty("hibernation_discarded", False)
+        else:
+            webview.setUrl(QUrl(widget.property("hibernation_url")))
         widget.setProperty("is_hibernated", False)
 
     def _update_blocklist(self):
@@ -2901,13 +6031,12 @@ class Navegador(QMainWindow):
             self.statusBar().showMessage("Actualizando lista de bloqueo...", 4000)
 
     def _download_blocklist_task(self):
-        """Tarea que se ejecuta en segundo plano para descargar y guardar la lista de bloqueo."""
-        url = "https://pgl.yoyo.org/adservers/serverlist.php?hostformat=nohtml&showintro=0&mimetype=plaintext"
-        with urllib.request.urlopen(url, timeout=20) as response:
-            data = response.read().decode('utf-8')
-            with open(self.adblock_list_path, "w", encoding="utf-8") as f:
-                f.write(data)
-        return True
+        """Tarea que se ejecuta en segundo plano para actualizar las listas de bloqueo suscritas."""
+        result = self.list_subscriptions.update_category("adblock", self.adblock_list_path)
+        if result["changed"]:
+            # Compila la lista aquí para que la recarga en el hilo de la UI solo tenga que mapear el archivo.
+            CompiledDomainList.compile_file(self.adblock_list_path, self.adblock_compiled_path)
+        return result
 
     def _on_blocklist_download_error(self, err_tuple):
         exctype, value, tb_str = err_tuple
@@ -2915,11 +6044,19 @@ class Navegador(QMainWindow):
         self.statusBar().showMessage("Error al actualizar la lista de bloqueo.", 5000)
         QMessageBox.critical(self, "Error de Actualización", f"No se pudo descargar la lista de bloqueo:\n{value}")
 
-    def _on_blocklist_download_finished(self, success):
-        if success:
-            self.ad_blocker.load_ad_block_list(self.adblock_list_path)
+    def _describe_list_update(self, result):
+        summary = f"{result['updated']} actualizadas, {result['not_modified']} sin cambios"
+        if result["failed"]:
+            summary += f", {len(result['failed'])} con errores:\n" + "\n".join(f"{url}: {err}" for url, err in result["failed"])
+        return summary
+
+    def _on_blocklist_download_finished(self, result):
+        if result["changed"]:
+            self._schedule_adblock_rebuild(reload_list=True)
             self.statusBar().showMessage("Lista de bloqueo actualizada con éxito.", 5000)
-            QMessageBox.information(self, "Éxito", "La lista de bloqueo de anuncios ha sido actualizada.")
+        else:
+            self.statusBar().showMessage("Las listas de bloqueo ya estaban al día.", 5000)
+        QMessageBox.information(self, "Listas de bloqueo", f"Listas de bloqueo de anuncios: {self._describe_list_update(result)}.")
 
     def _update_malware_list(self):
         """Inicia la actualización de la lista de malware en un hilo separado."""
@@ -2935,24 +6072,24 @@ class Navegador(QMainWindow):
             self.statusBar().showMessage("Actualizando lista de sitios peligrosos...", 4000)
 
     def _download_malware_list_task(self):
-        """Tarea que descarga la lista de sitios maliciosos."""
-        url = "https://urlhaus.abuse.ch/downloads/hostfile/"
-        with urllib.request.urlopen(url, timeout=20) as response:
-            data = response.read().decode('utf-8')
-            with open(self.malware_block_list_path, "w", encoding="utf-8") as f:
-                f.write(data)
-        return True
-
-    def _on_malware_list_download_finished(self, success):
-        if success:
+        """Tarea que actualiza las listas de sitios maliciosos suscritas."""
+        result = self.list_subscriptions.update_category("malware", self.malware_block_list_path)
+        if result["changed"]:
+            CompiledDomainList.compile_file(self.malware_block_list_path, self.malware_compiled_path)
+        return result
+
+    def _on_malware_list_download_finished(self, result):
+        if result["changed"]:
             self._setup_malware_blocker() # Recarga la lista en memoria
             self.statusBar().showMessage("Lista de sitios peligrosos actualizada.", 5000)
-            QMessageBox.information(self, "Éxito", "La lista de sitios peligrosos ha sido actualizada.")
+        else:
+            self.statusBar().showMessage("Las listas de sitios peligrosos ya estaban al día.", 5000)
+        QMessageBox.information(self, "Listas de sitios peligrosos", f"Listas de sitios peligrosos: {self._describe_list_update(result)}.")
 
     def _add_current_page_to_bookmarks(self):
         if not (current_widget := self.tabs.currentWidget()) or not (webview := current_widget.findChild(QWebEngineView)):
             return
-        if self.is_incognito or not self.bookmark_manager:
+        if self.is_incognito or not self._get_bookmark_manager():
             QMessageBox.information(self, "Modo Incógnito", "Los favoritos no se pueden gestionar en este modo.\n"
                                      "Abre una ventana normal para guardar esta página.")
             return
@@ -2962,21 +6099,32 @@ class Navegador(QMainWindow):
         if not self.bookmark_manager.add(title, url):
             QMessageBox.information(self, "Favorito existente", "Esta página ya está en tus favoritos.")
         else:
-            self.actualizar_ui_pestana(webview.url())
+            self._sync_nav_bar(webview)
+            self._notify_internal_pages("bookmarks")
 
     def _delete_selected_bookmarks(self):
         if not self.bookmark_manager or not self.bookmarks_list_widget or not self.bookmarks_list_widget.selectedItems():
             return
         
         selected_items = self.bookmarks_list_widget.selectedItems()
-        urls_to_delete = {item.data(Qt.ItemDataRole.UserRole) for item in selected_items}
-
-        if self.bookmark_manager.delete(urls_to_delete):
-            
-            for i in range(self.tabs.count()):
-                if widget := self.tabs.widget(i):
-                    if webview := widget.findChild(QWebEngineView):
-                        self.actualizar_ui_pestana(webview.url())
+        self._delete_bookmarks({item.data(Qt.ItemDataRole.UserRole) for item in selected_items})
+
+    def _delete_bookmarks(self, urls_to_delete: set) -> int:
+        """Elimina los favoritos con esas URL y devuelve cuántos se han eliminado."""
+        if not (manager := self._get_bookmark_manager()):
+            return 0
+        initial_count = len(manager.bookmarks)
+        if manager.delete(urls_to_delete):
+            # Solo la pestaña activa muestra el botón de favoritos; las demás lo recalculan al activarse.
+            self._sync_nav_bar(self._get_current_webview())
+            self._notify_internal_pages("bookmarks")
+        return initial_count - len(manager.bookmarks)
+
+    def _get_bookmark_manager(self):
+        """El gestor de favoritos se crea con su panel, pero wemphix:bookmarks lo necesita aunque el panel no exista."""
+        if self.bookmark_manager is None and not self.is_incognito:
+            self.bookmark_manager = BookmarkManager(self.bookmarks_path, None)
+        return self.bookmark_manager
 
     def _go_to_bookmark(self, item: QListWidgetItem):
         url = item.data(Qt.ItemDataRole.UserRole)
@@ -3012,10 +6160,12 @@ class Navegador(QMainWindow):
         url = sender_webview.url().toString()
         title = sender_webview.title() or url
 
-        if url == "about:blank" or (self.history and self.history[-1]['url'] == url):
+        if url == "about:blank" or url.startswith("wemphix:") or (self.history and self.history[-1]['url'] == url):
             return
 
-        self.history.append({'url': url, 'title': title, 'timestamp': time.time()})
+        timestamp = time.time()
+        self.history.append({'url': url, 'title': title, 'timestamp': timestamp})
+        self.top_sites.record(url, title, timestamp)
         self._update_history_list_widget()
 
     def _clear_history(self):
@@ -3058,10 +6208,17 @@ class Navegador(QMainWindow):
 
     def _broadcast_history_update(self):
         """Notifica a las páginas de historial abiertas que los datos han cambiado."""
+        # Solo al borrar o importar; las visitas nuevas se suman una a una en `_add_to_history`.
+        self.top_sites.rebuild(self.history)
+        self._notify_internal_pages("history")
+
+    def _notify_internal_pages(self, page_name: str):
+        """Avisa a las pestañas que muestran `wemphix:<page_name>` de que vuelvan a pedir sus datos."""
         for i in range(self.tabs.count()):
-            if tab_widget := self.tabs.widget(i):
-                if history_page := tab_widget.findChild(HistoryPageWidget):
-                    history_page.refresh_data()
+            if (tab_widget := self.tabs.widget(i)) and (webview := tab_widget.findChild(QWebEngineView)):
+                url = webview.url()
+                if url.scheme() == "wemphix" and url.path() == page_name:
+                    webview.page().runJavaScript("window.dispatchEvent(new Event('wemphix-data-changed'));")
 
     def _go_to_history_item(self, item: QListWidgetItem):
         url = item.data(Qt.ItemDataRole.UserRole)
@@ -3126,7 +6283,59 @@ class Navegador(QMainWindow):
         
         dialog = ExtensionsDialog(self)
         dialog.exec()
-        self._load_extensions() 
+        self._load_extensions()
+        self._update_browser_action_buttons()
+    def _create_cosmetic_script(self, name: str, css: str, runs_on_subframes: bool) -> QWebEngineScript:
+        """Crea un script que añade la hoja de ocultación al documento antes de que se analice el HTML."""
+        source = f"""
+        (function() {{
+            var css = {json.dumps(css)};
+            try {{
+                var sheet = new CSSStyleSheet();
+                sheet.replaceSync(css);
+                document.adoptedStyleSheets = document.adoptedStyleSheets.concat([sheet]);
+            }} catch (e) {{
+                var style = document.createElement('style');
+                style.textContent = css;
+                (document.head || document.documentElement).appendChild(style);
+            }}
+        }})();
+        """
+        script = QWebEngineScript()
+        script.setSourceCode(source)
+        script.setName(name)
+        script.setWorldId(QWebEngineScript.ScriptWorldId.ApplicationWorld)
+        script.setInjectionPoint(QWebEngineScript.InjectionPoint.DocumentCreation)
+        script.setRunsOnSubFrames(runs_on_subframes)
+        return script
+
+    def _update_cosmetic_filters(self, page: QWebEnginePage, url: QUrl):
+        """
+        Sustituye los scripts de ocultación de la página por los del sitio de destino: la hoja
+        genérica (compartida y también en subframes) y la hoja propia del dominio.
+        """
+        index = self.ad_blocker.state.cosmetic_index
+        use_generic, domain_css = False, ""
+        if self.ad_blocker.enabled and index and url.scheme() in ("http", "https"):
+            use_generic, domain_css = index.stylesheets_for_host(url.host())
+        use_generic = use_generic and bool(index.generic_css)
+
+        # El nombre incluye la generación del índice para detectar hojas genéricas obsoletas.
+        generic_name = f"wemphixCosmeticGeneric-{index.generation}"
+        scripts = page.scripts()
+        has_generic = False
+        for script in scripts.toList():
+            name = script.name()
+            if name == generic_name and use_generic:
+                has_generic = True
+            elif name.startswith(("wemphixCosmeticGeneric", "wemphixCosmeticDomain")):
+                scripts.remove(script)
+
+        if use_generic and not has_generic:
+            scripts.insert(self._create_cosmetic_script(generic_name, index.generic_css, True))
+        if domain_css:
+            scripts.insert(self._create_cosmetic_script("wemphixCosmeticDomain", domain_css, False))
+
     def _setup_page_scripts(self, page: QWebEnginePage):
         """
         Configura e inyecta todos los scripts necesarios (API, extensiones)
@@ -3240,94 +6449,88 @@ class Navegador(QMainWindow):
         if not isinstance(sender_webview, QWebEngineView):
             return
 
-        current_tab = self._find_widget_for_webview(sender_webview)
-        if current_tab:
-            if url_bar := current_tab.findChild(QLineEdit, "UrlBar"):
-                url_bar.setText(qurl.toString())
-            if add_bookmark_btn := current_tab.findChild(QPushButton, "add_bookmark_btn"):
-                if self._is_bookmarked(qurl.toString()):
-                    add_bookmark_btn.setIcon(self.standard_icons["apply"])
-                else:
-                    add_bookmark_btn.setIcon(self.standard_icons["save"])
+        self._sync_nav_bar(sender_webview)
 
     def actualizar_titulo_pestana(self, title: str):
-        sender_webview = self.sender()
-        if sender_webview:
-            for i in range(self.tabs.count()):
-                widget = self.tabs.widget(i)
-                if widget and widget.findChild(QWebEngineView) == sender_webview:
-                    if not self.is_incognito:
-                        tab_info = {"index": i, "title": title, "url": sender_webview.url().toString()}
-                        self.browser_api.tabUpdated.emit(tab_info)
-                    
-                    # Si la pestaña estaba hibernada, restaurar el título original
-                    if widget.property("is_hibernated"):
-                        title = widget.property("hibernation_title")
-
-                    group_info = widget.property("tab_group")
-                    if group_info:
-                        widget.setProperty("original_title", title)
-                        color_map = {"blue": "🔵", "red": "🔴", "green": "🟢", "yellow": "🟡", "purple": "🟣", "gray": "⚪"}
-                        emoji = color_map.get(group_info["color"], "⚫")
-                        self.tabs.setTabText(i, f'{emoji} {group_info["name"]} | {title}')
-                    else:
-                        self.tabs.setTabText(i, title)
-                    break
-            self._update_vertical_tab_item(i)
+        if sender_webview := self.sender():
+            self._set_tab_title(sender_webview, title)
+
+    def _set_tab_title(self, webview: QWebEngineView, title: str):
+        if not (record := self.tab_registry.by_webview(webview)):
+            return
+        widget = record.widget
+        if (i := record.index) == -1:
+            return
+        if not self.is_incognito:
+            tab_info = {"index": i, "title": title, "url": webview.url().toString()}
+            self.browser_api.tabUpdated.emit(tab_info)
+
+        # Si la pestaña estaba hibernada, restaurar el título original
+        if widget.property("is_hibernated"):
+            title = widget.property("hibernation_title")
+
+        group_info = widget.property("tab_group")
+        if group_info:
+            widget.setProperty("original_title", title)
+            color_map = {"blue": "🔵", "red": "🔴", "green": "🟢", "yellow": "🟡", "purple": "🟣", "gray": "⚪"}
+            emoji = color_map.get(group_info["color"], "⚫")
+            self.tabs.setTabText(i, f'{emoji} {group_info["name"]} | {title}')
+        else:
+            self.tabs.setTabText(i, title)
+        self._update_vertical_tab_item(i)
 
     def actualizar_icono_pestana(self, icon: QIcon):
         sender_webview = self.sender()
-        if sender_webview:
+        if sender_webview and (record := self.tab_registry.by_webview(sender_webview)):
             # No actualizar el icono si la pestaña está hibernada
-            widget = self._find_widget_for_webview(sender_webview)
-            if widget and widget.property("is_hibernated"):
+            widget = record.widget
+            if widget.property("is_hibernated"):
                 return
 
-            for i in range(self.tabs.count()):
-                if self.tabs.widget(i) and self.tabs.widget(i).findChild(QWebEngineView) == sender_webview:
-                    widget = self.tabs.widget(i)
-                    self._update_tab_icon(i)
-
-                    if self.settings.value("custom_theme") == "Adaptativo" and not self.rgb_theme_timer.isActive():
-                        if not icon.isNull():
-                            icon_cache_key = icon.cacheKey()
-                            if icon_cache_key in self.dominant_color_cache:
-                                
-                                dominant_color = self.dominant_color_cache[icon_cache_key]
-                                self._on_dominant_color_ready(dominant_color, widget, i)
-                            else:
-
-                                image = icon.pixmap(16, 16).toImage().convertToFormat(QImage.Format.Format_RGBA8888)
-                                worker = Worker(self._get_dominant_color_from_image, image)
-
-                                worker.signals.result.connect(
-                                    lambda color, w=widget, tab_idx=i, key=icon_cache_key: self._on_dominant_color_ready(color, w, tab_idx, key_to_cache=key)
-                                )
-                                self.threadpool.start(worker)
-                        else:
+            if not icon.isNull() and self.top_sites.needs_icon(key := TopSites.site_key(sender_webview.url().toString())):
+                self.top_sites.set_image(key, "icon", self._encode_pixmap(icon.pixmap(32, 32), "PNG"))
+
+            if (i := record.index) != -1:
+                self._update_tab_icon(i)
+
+                if self.settings.value("custom_theme") == "Adaptativo" and not self.rgb_theme_timer.isActive():
+                    if not icon.isNull():
+                        icon_cache_key = icon.cacheKey()
+                        if icon_cache_key in self.dominant_color_cache:
                             
-                            widget.setProperty("dominant_color", None)
-                            if self.tabs.currentIndex() == i:
-                                self.apply_custom_theme("Default")
-                    self._update_vertical_tab_item(i)
-                    break
+                            dominant_color = self.dominant_color_cache[icon_cache_key]
+                            self._on_dominant_color_ready(dominant_color, widget, i)
+                        else:
+
+                            image = icon.pixmap(16, 16).toImage().convertToFormat(QImage.Format.Format_RGBA8888)
+                            worker = Worker(self._get_dominant_color_from_image, image)
+
+                            worker.signals.result.connect(
+                                lambda color, w=widget, tab_idx=i, key=icon_cache_key: self._on_dominant_color_ready(color, w, tab_idx, key_to_cache=key)
+                            )
+                            self.threadpool.start(worker)
+                    else:
+                        
+                        widget.setProperty("dominant_color", None)
+                        if self.tabs.currentIndex() == i:
+                            self.apply_custom_theme("Default")
+                self._update_vertical_tab_item(i)
 
     def _update_tab_icon(self, index: int):
-        if widget := self.tabs.widget(index):
-            if webview := widget.findChild(QWebEngineView):
-                page = webview.page()
-                icon = QIcon()
+        if (record := self.tab_registry.by_widget(self.tabs.widget(index))) and record.page:
+            page = record.page
+            icon = QIcon()
 
-                is_muted = hasattr(page, 'isAudioMuted') and page.isAudioMuted()
-                is_audible = hasattr(page, 'isAudible') and page.isAudible()
+            is_muted = hasattr(page, 'isAudioMuted') and page.isAudioMuted()
+            is_audible = hasattr(page, 'isAudible') and page.isAudible()
 
-                if is_muted:
-                    icon = QIcon(get_asset_path("muted.svg"))
-                elif is_audible:
-                    icon = QIcon(get_asset_path("volume.svg"))
-                else:
-                    icon = page.icon() or QIcon()
-                self.tabs.setTabIcon(index, icon)
+            if is_muted:
+                icon = QIcon(get_asset_path("muted.svg"))
+            elif is_audible:
+                icon = QIcon(get_asset_path("volume.svg"))
+            else:
+                icon = page.icon() or QIcon()
+            self.tabs.setTabIcon(index, icon)
 
     def actualizar_estado_botones_nav(self):
         """
@@ -3338,15 +6541,7 @@ class Navegador(QMainWindow):
         if not isinstance(sender_webview, QWebEngineView):
             return
 
-        current_tab = self._find_widget_for_webview(sender_webview)
-        if current_tab:
-            atras_btn = current_tab.findChild(QPushButton, "atras_btn")
-            adelante_btn = current_tab.findChild(QPushButton, "adelante_btn")
-
-            if atras_btn and adelante_btn:
-                history = sender_webview.history()
-                atras_btn.setEnabled(history.canGoBack())
-                adelante_btn.setEnabled(history.canGoForward())
+        self._sync_nav_bar(sender_webview, keep_typed_url=True)
 
     def cerrar_pestana(self, index):
         widget_to_close = self.tabs.widget(index)
@@ -3358,38 +6553,34 @@ class Navegador(QMainWindow):
 
         if self.tabs.count() > 1:
             widget_a_cerrar = self.tabs.widget(index)
+            # La fila se quita antes que la pestaña para que la selección de la lista siga a la barra.
+            self._vertical_tab_removed(index)
+            self.tab_registry.remove(widget_a_cerrar)
             self.tabs.removeTab(index)
+            self._detach_tab_chrome(widget_a_cerrar)
             if not self.is_incognito:
                 self.browser_api.tabRemoved.emit(index)
 
             if widget_a_cerrar:
                 widget_a_cerrar.deleteLater()
-            self._update_vertical_tabs_list()
         else:
             self.close()
 
     def _find_widget_for_webview(self, webview: QWebEngineView) -> QWidget | None:
         """Encuentra el widget de la pestaña que contiene un webview específico."""
-        for i in range(self.tabs.count()):
-            widget = self.tabs.widget(i)
-            if widget and widget.findChild(QWebEngineView) == webview:
-                return widget
-        return None
+        record = self.tab_registry.by_webview(webview)
+        return record.widget if record else None
 
     def _close_tab_by_id(self, tab_id: str):
-        for i in range(self.tabs.count()):
-            if widget := self.tabs.widget(i):
-                if widget.property("tab_id") == tab_id:
-                    self.cerrar_pestana(i)
-                    return
+        if (record := self.tab_registry.by_id(tab_id)) and record.index != -1:
+            self.cerrar_pestana(record.index)
 
     def _update_tab_url(self, tab_id: str, new_url: str):
-        for i in range(self.tabs.count()):
-            if widget := self.tabs.widget(i):
-                if widget.property("tab_id") == tab_id:
-                    if webview := widget.findChild(QWebEngineView):
-                        webview.setUrl(QUrl(new_url))
-                    return
+        if record := self.tab_registry.by_id(tab_id):
+            if record.widget.property("lazy_url") is not None:
+                record.widget.setProperty("lazy_url", new_url)
+            elif record.webview:
+                record.webview.setUrl(QUrl(new_url))
 
     def _query_tabs(self, query_info: dict) -> list:
         results = []
@@ -3401,17 +6592,13 @@ class Navegador(QMainWindow):
         return results
 
     def _handle_audio_state_change(self):
-        page = self.sender()
-        if page:
-            for i in range(self.tabs.count()):
-                widget = self.tabs.widget(i)
-                if widget and widget.findChild(QWebEngineView).page() == page:
-                    self._update_tab_icon(i)
-                    break
+        if (page := self.sender()) and (record := self.tab_registry.by_page(page)):
+            if record.index != -1:
+                self._update_tab_icon(record.index)
 
     def _toggle_mute_tab(self, index: int):
-        if widget := self.tabs.widget(index):
-            if page := widget.findChild(QWebEngineView).page():
+        if (widget := self.tabs.widget(index)) and (webview := widget.findChild(QWebEngineView)):
+            if page := webview.page():
                 if hasattr(page, 'setAudioMuted'):
                     page.setAudioMuted(not page.isAudioMuted())
 
@@ -3436,7 +6623,7 @@ class Navegador(QMainWindow):
             add_to_web_panel_action.triggered.connect(self._add_current_page_to_web_panels)
             menu.addSeparator()
 
-            page = widget.findChild(QWebEngineView).page()
+            page = webview.page() if (webview := widget.findChild(QWebEngineView)) else None
 
             menu.addSeparator()
             group_menu = menu.addMenu("Grupos de Pestañas")
@@ -3463,8 +6650,7 @@ class Navegador(QMainWindow):
 
     def _duplicate_tab(self, index: int):
         if widget := self.tabs.widget(index):
-            if webview := widget.findChild(QWebEngineView):
-                self.agregar_pestana(webview.url().toString())
+            self.agregar_pestana(self._tab_url(widget))
 
     def _close_other_tabs(self, index: int):
         for i in range(self.tabs.count() - 1, -1, -1):
@@ -3501,7 +6687,7 @@ class Navegador(QMainWindow):
             name, color = dialog.get_group_info()
             if widget := self.tabs.widget(index):
                 webview = widget.findChild(QWebEngineView)
-                original_title = webview.title() if webview else "Pestaña"
+                original_title = webview.title() if webview else self.tabs.tabText(index)
 
                 widget.setProperty("original_title", original_title)
                 widget.setProperty("tab_group", {"name": name, "color": color})
@@ -3511,7 +6697,7 @@ class Navegador(QMainWindow):
                 color_map = {"blue": "🔵", "red": "🔴", "green": "🟢", "yellow": "🟡", "purple": "🟣", "gray": "⚪"}
                 emoji = color_map.get(group_info["color"], "⚫")
                 self.tabs.setTabText(index, f'{emoji} {group_info["name"]} | {original_title}')
-                self._update_vertical_tabs_list()
+                self._update_vertical_tab_item(index)
 
     def _remove_from_group(self, index: int):
         widget = self.tabs.widget(index)
@@ -3520,7 +6706,7 @@ class Navegador(QMainWindow):
             widget.setProperty("tab_group", None)
             widget.setProperty("original_title", None)
             self.tabs.setTabText(index, original_title or "Pestaña")
-            self._update_vertical_tabs_list()
+            self._update_vertical_tab_item(index)
 
     def event(self, event: QEvent) -> bool:
         """Maneja eventos de la aplicación, como la reanudación desde la suspensión."""
@@ -3550,8 +6736,10 @@ class Navegador(QMainWindow):
 
     def _sync_vertical_tab_selection(self, index: int):
         """Sincroniza la selección del QTabWidget con la lista de pestañas verticales."""
-        if self.vertical_tabs_list and self.vertical_tabs_list.currentRow() != index:
-            self.vertical_tabs_list.setCurrentRow(index)
+        if self.vertical_tabs_list and self.vertical_tabs_list.currentIndex().row() != index:
+            model_index = self.vertical_tabs_model.index(index)
+            if model_index.isValid():
+                self.vertical_tabs_list.setCurrentIndex(model_index)
 
     def _switch_to_tab_from_list(self, index: int):
         """Cambia a la pestaña correspondiente cuando se hace clic en la lista vertical."""
@@ -3706,7 +6894,7 @@ class Navegador(QMainWindow):
         if not (webview := self._get_current_webview()):
             return
 
-        tab_widget = webview.parentWidget().parentWidget()
+        tab_widget = self._find_widget_for_webview(webview)
         if not tab_widget:
             return
 
@@ -3717,10 +6905,7 @@ class Navegador(QMainWindow):
             if original_url := tab_widget.property("original_url"):
                 webview.setUrl(QUrl(original_url))
             tab_widget.setProperty("in_reader_mode", False)
-
-            if reader_btn := tab_widget.findChild(QPushButton, "reader_mode_btn"):
-                reader_btn.setText("📖")
-                reader_btn.setToolTip("Entrar en Modo Lectura")
+            self._sync_nav_bar(webview)
 
             self.reader_mode_action.setChecked(False)
         else:
@@ -3761,14 +6946,11 @@ class Navegador(QMainWindow):
         </style></head><body><h1>{title}</h1>{content}</body></html>
         """
 
-        if tab_widget := webview.parentWidget().parentWidget():
+        if tab_widget := self._find_widget_for_webview(webview):
             tab_widget.setProperty("original_url", base_url.toString())
             webview.page().setHtml(reader_html, base_url)
             tab_widget.setProperty("in_reader_mode", True)
-
-            if reader_btn := tab_widget.findChild(QPushButton, "reader_mode_btn"):
-                reader_btn.setText("❌")
-                reader_btn.setToolTip("Salir del Modo Lectura")
+            self._sync_nav_bar(webview)
 
             self.reader_mode_action.setChecked(True)
 
@@ -3890,7 +7072,7 @@ class Navegador(QMainWindow):
             tab_index = tab_bar.tabAt(pos_in_tab_bar)
             if tab_index != -1:
                 if widget := self.tabs.widget(tab_index):
-                    target_webview = widget.findChild(QWebEngineView)
+                    target_webview = self._materialize_tab(widget)
         
         
         if not target_webview:
@@ -3917,7 +7099,7 @@ class TaskManagerDialog(QDialog):
         super().__init__(parent)
         self.main_window = parent
         self.setWindowTitle("Administrador de Tareas de Wemphix")
-        self.setMinimumSize(500, 400)
+        self.setMinimumSize(600, 550)
 
         self.layout = QVBoxLayout(self)
         self.table = QTableWidget()
@@ -3928,6 +7110,27 @@ class TaskManagerDialog(QDialog):
         self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
         self.layout.addWidget(self.table)
 
+        self.adblock_table = QTableWidget()
+        self.adblock_table.setColumnCount(4)
+        self.adblock_table.setHorizontalHeaderLabels(["Bloqueador", "Peticiones", "Bloqueadas", "Permitidas"])
+        self.adblock_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        self.adblock_table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.layout.addWidget(self.adblock_table)
+
+        self.adblock_latency_label = QLabel()
+        self.layout.addWidget(self.adblock_latency_label)
+        self.adblock_cache_label = QLabel()
+        self.layout.addWidget(self.adblock_cache_label)
+        self.data_saver_label = QLabel()
+        self.data_saver_label.setWordWrap(True)
+        self.layout.addWidget(self.data_saver_label)
+        self.url_cleaner_label = QLabel()
+        self.url_cleaner_label.setWordWrap(True)
+        self.layout.addWidget(self.url_cleaner_label)
+        self.newtab_label = QLabel()
+        self.newtab_label.setWordWrap(True)
+        self.layout.addWidget(self.newtab_label)
+
         self.process = psutil.Process(os.getpid())
         self.process.cpu_percent(interval=None)
 
@@ -3958,9 +7161,52 @@ class TaskManagerDialog(QDialog):
             font = total_row[0].font(); font.setBold(True)
             for item in total_row: item.setFont(font)
 
+            self.update_adblock_stats()
+            cache = self.main_window.ad_blocker.state.host_cache.stats()
+            self.adblock_cache_label.setText(
+                f"Caché del bloqueador: {cache['size']}/{cache['capacity']} hosts · "
+                f"{cache['hits']} aciertos · {cache['misses']} fallos · {cache['evictions']} expulsiones "
+                f"({cache['hit_rate']:.0%} de aciertos)")
+            savings = self.main_window.ad_blocker.data_saver_savings.items()
+            self.data_saver_label.setText("Ahorro de datos: " + (" · ".join(
+                f"modo {mode}: {requests} peticiones evitadas (~{estimated_bytes / (1024 * 1024):.1f} MB)"
+                for mode, requests, estimated_bytes in savings) or "sin peticiones evitadas"))
+            url_cleaner = self.main_window.url_cleaner
+            applied_rules = [rule for rule in url_cleaner.rules() if rule.hits] if url_cleaner else []
+            self.url_cleaner_label.setText("Limpieza de enlaces: " + (" · ".join(
+                f"{rule.name}: {rule.hits}" for rule in applied_rules) or "ninguna URL modificada"))
+            self.newtab_label.setText(f"Nueva pestaña: {self.main_window.newtab_paint_stats.summary()}")
+
         except psutil.NoSuchProcess:
             self.timer.stop()
 
+    def update_adblock_stats(self):
+        """Filas del bloqueador: total, cada pestaña y los orígenes con más bloqueos."""
+        stats = self.main_window.ad_blocker.stats
+        rows = [("Total", stats)]
+        tabs = self.main_window.tabs
+        for i in range(tabs.count()):
+            if (webview := tabs.widget(i).findChild(QWebEngineView)) and \
+               (interceptor := getattr(webview.page(), "tab_request_interceptor", None)):
+                rows.append((f"Pestaña: {tabs.tabText(i)}", interceptor.stats))
+
+        self.adblock_table.setRowCount(0)
+        for label, row_stats in rows:
+            self._add_adblock_row(label, row_stats.seen, row_stats.blocked, row_stats.allowed)
+        for origin, seen, blocked in stats.top_origins():
+            self._add_adblock_row(f"Origen: {origin}", seen, blocked, seen - blocked)
+
+        self.adblock_latency_label.setText(
+            f"Tiempo en interceptRequest: media {stats.mean_latency_us():.1f} µs · "
+            f"p50 < {stats.latency_percentile_us(0.5)} µs · p90 < {stats.latency_percentile_us(0.9)} µs · "
+            f"p99 < {stats.latency_percentile_us(0.99)} µs")
+
+    def _add_adblock_row(self, label, seen, blocked, allowed):
+        row = self.adblock_table.rowCount()
+        self.adblock_table.insertRow(row)
+        for column, value in enumerate((label, str(seen), str(blocked), str(allowed))):
+            self.adblock_table.setItem(row, column, QTableWidgetItem(value))
+
     def add_row(self, task, cpu, mem, cpu_time):
         row = self.table.rowCount()
         self.table.insertRow(row)
@@ -4091,6 +7337,107 @@ class ExtensionsDialog(QDialog):
                 self.main_window._save_extensions()
                 self._populate_list()
 
+class TabListModel(QAbstractListModel):
+    """
+    Pestañas de la ventana, en el orden de la barra, para la lista de pestañas verticales.
+    Cada fila es el `TabRecord` de la pestaña; el texto y el icono se leen del QTabWidget
+    al pintar. Los cambios se avisan fila a fila (insertar, quitar, mover, `dataChanged`),
+    así que abrir o cerrar una pestaña no reconstruye la lista entera.
+
+    Como sigue el orden de la barra, también mantiene `TabRecord.index`: los manejadores de
+    señales leen de ahí la posición de su pestaña en vez de llamar a `QTabWidget.indexOf`,
+    que recorre todas las pestañas.
+    """
+    TabIdRole = Qt.ItemDataRole.UserRole
+
+    def __init__(self, tabs: QTabWidget, parent=None):
+        super().__init__(parent)
+        self._tabs = tabs
+        self._records = []
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._records)
+
+    def data(self, index: QModelIndex, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or not 0 <= index.row() < len(self._records):
+            return None
+        row = index.row()
+        if role == Qt.ItemDataRole.DisplayRole:
+            return self._tabs.tabText(row)
+        if role == Qt.ItemDataRole.DecorationRole:
+            return self._tabs.tabIcon(row)
+        if role == Qt.ItemDataRole.ToolTipRole:
+            return self._tabs.tabText(row)
+        if role == self.TabIdRole:
+            return self._records[row].tab_id
+        return None
+
+    def _renumber(self, first: int, last: int):
+        for row in range(first, min(last, len(self._records) - 1) + 1):
+            self._records[row].index = row
+
+    def insert_tab(self, row: int, record: TabRecord):
+        self.beginInsertRows(QModelIndex(), row, row)
+        self._records.insert(row, record)
+        # Las pestañas nuevas se añaden al final, así que normalmente solo se numera esta.
+        self._renumber(row, len(self._records) - 1)
+        self.endInsertRows()
+
+    def remove_tab(self, row: int):
+        if 0 <= row < len(self._records):
+            self.beginRemoveRows(QModelIndex(), row, row)
+            self._records.pop(row).index = -1
+            self._renumber(row, len(self._records) - 1)
+            self.endRemoveRows()
+
+    def move_tab(self, source: int, destination: int):
+        if source == destination or not (0 <= source < len(self._records) and 0 <= destination < len(self._records)):
+            return
+        # beginMoveRows espera la posición *antes* de la que se inserta, contando la fila que se mueve.
+        if self.beginMoveRows(QModelIndex(), source, source, QModelIndex(), destination + 1 if destination > source else destination):
+            self._records.insert(destination, self._records.pop(source))
+            self._renumber(min(source, destination), max(source, destination))
+            self.endMoveRows()
+
+    def tab_changed(self, row: int):
+        if 0 <= row < len(self._records):
+            index = self.index(row)
+            self.dataChanged.emit(index, index, [Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.DecorationRole, Qt.ItemDataRole.ToolTipRole])
+
+    def clear(self):
+        self.beginResetModel()
+        for record in self._records:
+            record.index = -1
+        self._records.clear()
+        self.endResetModel()
+
+class TabListDelegate(QStyledItemDelegate):
+    """Pinta cada pestaña de la lista vertical (icono y título recortado) con una altura fija."""
+    ROW_HEIGHT = 30
+    ICON_SIZE = 16
+
+    def paint(self, painter: QPainter, option: QStyleOptionViewItem, index: QModelIndex):
+        style = option.widget.style() if option.widget else QApplication.style()
+        style.drawPrimitive(QStyle.PrimitiveElement.PE_PanelItemViewItem, option, painter, option.widget)
+
+        rect = option.rect.adjusted(8, 0, -8, 0)
+        icon = index.data(Qt.ItemDataRole.DecorationRole)
+        if isinstance(icon, QIcon) and not icon.isNull():
+            icon_top = rect.top() + (rect.height() - self.ICON_SIZE) // 2
+            icon.paint(painter, rect.left(), icon_top, self.ICON_SIZE, self.ICON_SIZE)
+        rect.setLeft(rect.left() + self.ICON_SIZE + 6)
+
+        selected = bool(option.state & QStyle.StateFlag.State_Selected)
+        color_role = QPalette.ColorRole.HighlightedText if selected else QPalette.ColorRole.Text
+        text = option.fontMetrics.elidedText(index.data(Qt.ItemDataRole.DisplayRole) or "", Qt.TextElideMode.ElideRight, rect.width())
+        painter.save()
+        painter.setPen(option.palette.color(color_role))
+        painter.drawText(rect, Qt.AlignmentFlag.AlignVCenter | Qt.AlignmentFlag.AlignLeft, text)
+        painter.restore()
+
+    def sizeHint(self, option: QStyleOptionViewItem, index: QModelIndex) -> QSize:
+        return QSize(option.rect.width(), self.ROW_HEIGHT)
+
 class TabSearchDialog(QDialog):
     def __init__(self, parent: "Navegador"):
         super().__init__(parent)
@@ -4152,11 +7499,9 @@ class TabSearchDialog(QDialog):
             if not widget: continue
             
             webview = widget.findChild(QWebEngineView)
-            if not webview: continue
-
             title = self.main_window.tabs.tabText(i)
-            url = webview.url().toString()
-            icon = webview.page().icon()
+            url = self.main_window._tab_url(widget)
+            icon = webview.page().icon() if webview else self.main_window.tabs.tabIcon(i)
 
             item = QListWidgetItem()
             item.setData(Qt.ItemDataRole.UserRole, i)
@@ -4225,141 +7570,6 @@ class TabGroupDialog(QDialog):
     def get_group_info(self):
         return self.name_input.text() or "Grupo", self.selected_color
 
-class HistoryTableModel(QAbstractTableModel):
-    def __init__(self, data, parent=None):
-        super().__init__(parent)
-        self._data = data
-        self._headers = ["Fecha y Hora", "Título", "URL"]
-
-    def rowCount(self, parent=None):
-        return len(self._data)
-
-    def columnCount(self, parent=None):
-        return len(self._headers)
-
-    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
-        if not index.isValid():
-            return None
-        
-        entry = self._data[index.row()]
-        
-        if role == Qt.ItemDataRole.DisplayRole:
-            column = index.column()
-            if column == 0:
-                ts = entry.get('timestamp', 0)
-                try:
-                    from datetime import datetime
-                    return datetime.fromtimestamp(ts).strftime('%Y-%m-%d %H:%M:%S')
-                except (ValueError, TypeError):
-                    return "Fecha desconocida"
-            elif column == 1:
-                return entry.get('title', '')
-            elif column == 2:
-                return entry.get('url', '')
-        elif role == Qt.ItemDataRole.UserRole:
-            return entry
-
-        return None
-
-    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
-        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
-            return self._headers[section]
-        return None
-
-    def sort(self, column, order):
-        self.layoutAboutToBeChanged.emit()
-        key = None
-        if column == 0: # Time
-            key = lambda x: x.get('timestamp', 0)
-        elif column == 1: # Title
-            key = lambda x: x.get('title', '').lower()
-        elif column == 2: # URL
-            key = lambda x: x.get('url', '').lower()
-        
-        if key:
-            self._data.sort(key=key, reverse=(order == Qt.SortOrder.DescendingOrder))
-        
-        self.layoutChanged.emit()
-
-    def refresh_data(self, new_data):
-        self.beginResetModel()
-        self._data = new_data
-        self.endResetModel()
-
-class HistoryPageWidget(QWidget):
-    def __init__(self, main_window: "Navegador"):
-        super().__init__()
-        self.main_window = main_window
-        self.setObjectName("HistoryPageWidget")
-
-        layout = QVBoxLayout(self)
-        
-        # Barra superior con búsqueda y botones
-        top_bar_layout = QHBoxLayout()
-        self.search_input = QLineEdit()
-        self.search_input.setPlaceholderText("Buscar en el historial...")
-        delete_button = QPushButton("Eliminar Seleccionado(s)")
-        delete_button.clicked.connect(self._delete_selected_history)
-        top_bar_layout.addWidget(self.search_input)
-        top_bar_layout.addWidget(delete_button)
-        layout.addLayout(top_bar_layout)
-
-        # Tabla de historial
-        self.table_view = QTableView()
-        self.table_view.setSortingEnabled(True)
-        self.table_view.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
-        self.table_view.verticalHeader().setVisible(False)
-        self.table_view.horizontalHeader().setSectionResizeMode(1, QHeaderView.ResizeMode.Stretch)
-        self.table_view.horizontalHeader().setSectionResizeMode(2, QHeaderView.ResizeMode.Stretch)
-        self.table_view.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
-        self.table_view.doubleClicked.connect(self._go_to_history_item)
-        layout.addWidget(self.table_view)
-
-        self.model = HistoryTableModel(list(reversed(self.main_window.history)))
-        self.proxy_model = QSortFilterProxyModel()
-        self.proxy_model.setSourceModel(self.model)
-        self.proxy_model.setFilterCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
-        self.proxy_model.setFilterKeyColumn(-1) 
-        self.table_view.setModel(self.proxy_model)
-
-        self.search_input.textChanged.connect(self.proxy_model.setFilterFixedString)
-
-    def refresh_data(self):
-        self.model.refresh_data(list(reversed(self.main_window.history)))
-
-    def _go_to_history_item(self, index: QModelIndex):
-        source_index = self.proxy_model.mapToSource(index)
-        entry = self.model.data(source_index, Qt.ItemDataRole.UserRole)
-        if entry and 'url' in entry:
-            self.main_window.agregar_pestana(entry['url'])
-
-    def _delete_selected_history(self):
-        selection_model = self.table_view.selectionModel()
-        if not selection_model.hasSelection():
-            QMessageBox.information(self, "Sin selección", "Por favor, selecciona las filas que deseas eliminar.")
-            return
-
-        selected_rows = selection_model.selectedRows()
-        
-        reply = QMessageBox.question(self, "Confirmar Eliminación",
-                                     f"¿Estás seguro de que quieres eliminar {len(selected_rows)} entrada(s) del historial?\n"
-                                     "Esta acción no se puede deshacer.",
-                                     QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
-                                     QMessageBox.StandardButton.No)
-
-        if reply == QMessageBox.StandardButton.No:
-            return
-
-        entries_to_delete = []
-        for proxy_index in selected_rows:
-            source_index = self.proxy_model.mapToSource(proxy_index)
-            entry = self.model.data(source_index, Qt.ItemDataRole.UserRole)
-            if entry:
-                entries_to_delete.append(entry)
-        
-        if entries_to_delete:
-            self.main_window._delete_history_entries(entries_to_delete)
-
 class HibernationWidget(QWidget):
     """
     Un widget que se muestra en lugar de una pestaña hibernada,
@@ -4560,7 +7770,7 @@ class SecurityIndicatorWidget(QWidget):
     """
     Un widget que muestra el estado de seguridad de la página actual (p. ej., un candado para HTTPS).
     """
-    def __init__(self, webview: QWebEngineView, parent_window: "Navegador"):
+    def __init__(self, webview: QWebEngineView | None, parent_window: "Navegador"):
         super().__init__(parent_window)
         self.webview = webview
         self.parent_window = parent_window
@@ -4574,14 +7784,35 @@ class SecurityIndicatorWidget(QWidget):
 
         self.icon_label = QLabel()
         self.text_label = QLabel()
+        self.blocked_label = QLabel()
+        self.blocked_label.setVisible(False)
+        self._shown_request_count = -1
 
         self.layout.addWidget(self.icon_label)
         self.layout.addWidget(self.text_label)
+        self.layout.addWidget(self.blocked_label)
+
+        self.update_status()
 
+    def set_webview(self, webview: QWebEngineView | None):
+        """Pasa a mostrar el estado de otro webview (el de la pestaña activa)."""
+        self.webview = webview
+        self._shown_request_count = -1
+        self.blocked_label.setVisible(False)
         self.update_status()
 
+    def update_request_stats(self, stats: "RequestStats"):
+        """Muestra cuántas peticiones de la página ha bloqueado el bloqueador de anuncios."""
+        if stats.seen == self._shown_request_count:
+            return
+        self._shown_request_count = stats.seen
+        self.blocked_label.setVisible(stats.blocked > 0)
+        self.blocked_label.setText(f"🛡 {stats.blocked}")
+        self.blocked_label.setToolTip(f"{stats.blocked} de {stats.seen} peticiones bloqueadas en esta página "
+                                      f"({stats.allowed} permitidas)")
+
     def update_status(self):
-        url = self.webview.url()
+        url = self.webview.url() if self.webview else QUrl()
         scheme = url.scheme()
 
         if scheme == "https":
@@ -4599,7 +7830,7 @@ class SecurityIndicatorWidget(QWidget):
             self.setToolTip(f"Viendo página local: {url.toString()}")
 
     def mousePressEvent(self, event: QMouseEvent):
-        if event.button() == Qt.MouseButton.LeftButton:
+        if event.button() == Qt.MouseButton.LeftButton and self.webview:
             url = self.webview.url()
             scheme = url.scheme()
             host = url.host()
@@ -4616,8 +7847,20 @@ class SecurityIndicatorWidget(QWidget):
             else:
                 QMessageBox.information(self, "Información del Sitio",
                                         f"Estás viendo una página local o interna del navegador.\n\nURL: {url.toString()}")
+
+            if events_summary := self._security_events_summary():
+                QMessageBox.warning(self, "Eventos de Seguridad", events_summary)
         super().mousePressEvent(event)
 
+    def _security_events_summary(self) -> str:
+        """Resume el registro de seguridad de la pestaña (recursos, navegaciones y descargas bloqueadas)."""
+        interceptor = getattr(self.webview.page(), "tab_request_interceptor", None) if self.webview else None
+        if not interceptor or not interceptor.security_events:
+            return ""
+        lines = [f"{time.strftime('%H:%M:%S', time.localtime(event['time']))} · {html.escape(event['detail'])}<br>"
+                 f"<small>{html.escape(event['url'])}</small>" for event in reversed(interceptor.security_events)]
+        return "<b>Se han bloqueado contenidos de sitios peligrosos en esta pestaña:</b><br><br>" + "<br>".join(lines[:20])
+
 class PersonalizationDialog(QDialog):
     def __init__(self, parent: "Navegador"):
         super().__init__(parent)
@@ -4763,7 +8006,7 @@ class SitePermissionsDialog(QDialog):
     def _populate_table(self):
         self.permissions_table.setSortingEnabled(False)
         self.permissions_table.setRowCount(0)
-        saved_permissions = self.main_window.settings.value("site_permissions", {}, type=dict)
+        saved_permissions = self.main_window._load_site_permissions()
 
         for host, permissions in saved_permissions.items():
             for feature_key, status in permissions.items():
@@ -5132,19 +8375,30 @@ class ManagePasswordsDialog(QDialog):
             self.main_window.password_manager.delete_password(url, username)
             self.table.removeRow(row)
 
+CHROMIUM_FLAGS = (
+    "--enable-gpu-rasterization"
+    " --enable-oop-rasterization"
+    " --num-raster-threads=4"     
+    " --disable-features=TranslateUI"
+    " --ignore-gpu-blocklist" 
+    " --disable-gpu-vsync" 
+)
+
 def main():
-    os.environ["QTWEBENGINE_CHROMIUM_FLAGS"] = (
-        "--enable-gpu-rasterization"
-        " --enable-oop-rasterization"
-        " --num-raster-threads=4"     
-        " --disable-features=TranslateUI"
-        " --ignore-gpu-blocklist" 
-        " --disable-gpu-vsync" 
-    )
+    os.environ["QTWEBENGINE_CHROMIUM_FLAGS"] = CHROMIUM_FLAGS
     
     server_name = "WemphixBrowserInstance_v1.3"
 
-    app = QApplication(sys.argv)
+    # Los esquemas propios (wemphix:) tienen que registrarse antes de crear QApplication.
+    InternalPageSchemeHandler.register_scheme()
+
+    # El PAC de la lista se pasa como argumento y no en QTWEBENGINE_CHROMIUM_FLAGS, que tiene un tamaño limitado.
+    qt_arguments = list(sys.argv)
+    if (pac_argument := ListProxyAutoConfig.command_line_argument(QSettings("WemphixOrg", "Wemphix"),
+                                                                  os.path.join(os.path.expanduser("~"), "Wemphix"))):
+        qt_arguments.append(pac_argument)
+
+    app = QApplication(qt_arguments)
 
     
     socket = QLocalSocket()
@@ -5208,6 +8462,7 @@ def main():
             ventana.agregar_pestana(url, focus=True)
 
     ventana.show()
+
     exit_code = app.exec()
 
     if ventana.about_to_clear_profile and os.path.exists(ventana.profile_path):
@@ -0,0 +1,7 @@
+// Comportamiento compartido de las páginas internas wemphix:. Las páginas no admiten scripts en línea.
+for (const link of document.querySelectorAll("a[data-action='back']")) {
+    link.addEventListener("click", (event) => {
+        event.preventDefault();
+        history.back();
+    });
+}
@@ -0,0 +1,229 @@
+// Páginas internas con listas largas (wemphix:history, wemphix:bookmarks, wemphix:downloads).
+// Los datos se piden por páginas a wemphix:api/<lista> siguiendo el cursor que devuelve la
+// API, y solo existen en el DOM las filas visibles, así que abrir la página o desplazarse
+// cuesta lo mismo con mil entradas que con un millón.
+"use strict";
+
+const ROW_HEIGHT = 56;  // Igual que .list-row en internal.css.
+const OVERSCAN = 8;
+const PAGE_SIZE = 100;
+const DOWNLOADS_POLL_MS = 1000;
+
+const kind = document.body.dataset.kind;
+const endpoint = `wemphix:api/${kind}`;
+const viewport = document.getElementById("list-viewport");
+const spacer = document.getElementById("list-spacer");
+const searchInput = document.getElementById("list-search");
+const deleteButton = document.getElementById("list-delete");
+const emptyMessage = document.getElementById("list-empty");
+
+const state = {
+    items: [],
+    cursor: null,   // null: desde el principio.
+    done: false,    // La API ha devuelto el último trozo.
+    loading: false,
+    generation: 0,  // Descarta las respuestas de búsquedas anteriores.
+    selected: new Map(),
+};
+
+function apiUrl(path, params) {
+    const query = new URLSearchParams(params).toString();
+    return query ? `${endpoint}${path}?${query}` : `${endpoint}${path}`;
+}
+
+async function fetchPage(cursor, limit) {
+    const params = { q: searchInput.value, limit };
+    if (cursor !== null) params.cursor = cursor;
+    const response = await fetch(apiUrl("", params));
+    if (!response.ok) throw new Error(`HTTP ${response.status}`);
+    return response.json();
+}
+
+function post(path, params) {
+    return fetch(apiUrl(path, params), { method: "POST" }).then((response) => response.json());
+}
+
+async function loadMore() {
+    if (state.loading || state.done) return;
+    state.loading = true;
+    const generation = state.generation;
+    try {
+        const data = await fetchPage(state.cursor, PAGE_SIZE);
+        if (generation !== state.generation) return;
+        state.items.push(...data.items);
+        state.cursor = data.next;
+        state.done = data.next === null;
+    } catch (error) {
+        if (generation !== state.generation) return;
+        console.error(`No se pudo cargar ${endpoint}:`, error);
+        state.done = true;
+    }
+    state.loading = false;
+    render();
+}
+
+// Vuelve a pedir lo que ya se muestra sin perder la posición (datos cambiados, progreso de descargas).
+async function refresh() {
+    const generation = ++state.generation;
+    state.loading = true;
+    try {
+        const data = await fetchPage(null, Math.max(PAGE_SIZE, state.items.length));
+        if (generation !== state.generation) return;
+        state.items = data.items;
+        state.cursor = data.next;
+        state.done = data.next === null;
+    } catch (error) {
+        if (generation !== state.generation) return;
+        console.error(`No se pudo actualizar ${endpoint}:`, error);
+    }
+    state.loading = false;
+    render();
+}
+
+// Empieza de cero (nueva búsqueda).
+function reset() {
+    state.generation++;
+    state.items = [];
+    state.cursor = null;
+    state.done = false;
+    state.loading = false;
+    state.selected.clear();
+    updateDeleteButton();
+    viewport.scrollTop = 0;
+    render();
+}
+
+function render() {
+    spacer.style.height = `${state.items.length * ROW_HEIGHT}px`;
+    const first = Math.max(0, Math.floor(viewport.scrollTop / ROW_HEIGHT) - OVERSCAN);
+    const last = Math.min(state.items.length, Math.ceil((viewport.scrollTop + viewport.clientHeight) / ROW_HEIGHT) + OVERSCAN);
+    const rows = [];
+    for (let index = first; index < last; index++) {
+        const row = renderers[kind](state.items[index]);
+        row.style.top = `${index * ROW_HEIGHT}px`;
+        rows.push(row);
+    }
+    spacer.replaceChildren(...rows);
+    emptyMessage.hidden = !(state.done && state.items.length === 0);
+    // Se pide el siguiente trozo antes de llegar al final de lo cargado.
+    if (!state.done && last >= state.items.length - OVERSCAN) loadMore();
+    if (kind === "downloads") schedulePoll();
+}
+
+function element(tag, className, text) {
+    const node = document.createElement(tag);
+    if (className) node.className = className;
+    if (text !== undefined) node.textContent = text;
+    return node;
+}
+
+function button(text, onClick) {
+    const node = element("button", "", text);
+    node.type = "button";
+    node.addEventListener("click", onClick);
+    return node;
+}
+
+function link(title, url) {
+    const node = element("a", "list-link");
+    // Solo se enlaza a destinos web o locales, nunca a `javascript:`.
+    if (/^(https?|file):/i.test(url)) node.href = url;
+    node.title = url;
+    node.append(element("span", "list-title", title || url), element("span", "list-url", url));
+    return node;
+}
+
+function formatBytes(bytes) {
+    if (bytes < 1024 * 1024) return `${(bytes / 1024).toFixed(1)} KB`;
+    return `${(bytes / 1024 / 1024).toFixed(1)} MB`;
+}
+
+function updateDeleteButton() {
+    if (deleteButton) deleteButton.disabled = state.selected.size === 0;
+}
+
+const renderers = {
+    history(entry) {
+        const row = element("div", "list-row");
+        const key = `${entry.timestamp} ${entry.url}`;
+        const checkbox = element("input");
+        checkbox.type = "checkbox";
+        checkbox.checked = state.selected.has(key);
+        checkbox.addEventListener("change", () => {
+            if (checkbox.checked) state.selected.set(key, entry);
+            else state.selected.delete(key);
+            updateDeleteButton();
+        });
+        const time = element("span", "list-time", new Date(entry.timestamp * 1000).toLocaleString());
+        row.append(checkbox, time, link(entry.title, entry.url));
+        return row;
+    },
+
+    bookmarks(bookmark) {
+        const row = element("div", "list-row");
+        row.append(link(bookmark.title, bookmark.url), button("Eliminar", () => {
+            post("/delete", { url: bookmark.url }).then(refresh);
+        }));
+        return row;
+    },
+
+    downloads(download) {
+        const row = element("div", "list-row");
+        const active = !download.finished;
+        let status = download.status;
+        if (download.total > 0 && active) status += ` · ${formatBytes(download.received)} de ${formatBytes(download.total)}`;
+        else if (download.received > 0) status += ` · ${formatBytes(download.received)}`;
+        row.append(link(download.file, download.url), element("span", active ? "list-status active" : "list-status", status));
+        const action = (name) => () => post("/action", { id: download.id, action: name }).then(refresh);
+        if (active) {
+            row.append(button(download.paused ? "Reanudar" : "Pausar", action("pause")), button("Cancelar", action("cancel")));
+        } else if (download.saved) {
+            row.append(button("Abrir", action("open")), button("Mostrar en carpeta", action("show")));
+        }
+        return row;
+    },
+};
+
+// Mientras haya descargas en curso se refresca el progreso; el resto de páginas solo
+// se actualiza cuando el navegador avisa con `wemphix-data-changed`.
+let pollTimer = 0;
+function schedulePoll() {
+    if (pollTimer || !state.items.some((download) => !download.finished)) return;
+    pollTimer = setTimeout(() => {
+        pollTimer = 0;
+        refresh();
+    }, DOWNLOADS_POLL_MS);
+}
+
+let scrollFrame = 0;
+viewport.addEventListener("scroll", () => {
+    if (!scrollFrame) scrollFrame = requestAnimationFrame(() => {
+        scrollFrame = 0;
+        render();
+    });
+});
+window.addEventListener("resize", render);
+window.addEventListener("wemphix-data-changed", refresh);
+
+let searchTimer = 0;
+searchInput.addEventListener("input", () => {
+    clearTimeout(searchTimer);
+    searchTimer = setTimeout(reset, 200);
+});
+
+if (deleteButton) {
+    deleteButton.addEventListener("click", () => {
+        const entries = [...state.selected.values()];
+        if (!entries.length || !confirm(`¿Eliminar ${entries.length} entrada(s) del historial? Esta acción no se puede deshacer.`)) return;
+        const params = new URLSearchParams();
+        for (const entry of entries) {
+            params.append("t", entry.timestamp);
+            params.append("u", entry.url);
+        }
+        state.selected.clear();
+        updateDeleteButton();
+        post("/delete", params).then(refresh);
+    });
+}
+
+render();
@@ -0,0 +1,22 @@
+// wemphix:newtab. Los mosaicos ya vienen en el HTML; aquí solo está la búsqueda y la medida del primer pintado.
+"use strict";
+
+const searchForm = document.getElementById("newtab-search");
+searchForm.addEventListener("submit", (event) => {
+    event.preventDefault();
+    const query = searchForm.elements.q.value.trim();
+    const template = document.body.dataset.search;
+    if (query && template) location.href = template.replace("{}", encodeURIComponent(query));
+});
+
+// El navegador acumula estos tiempos en NewTabPaintStats (Administrador de tareas y --benchmark-newtab).
+new PerformanceObserver((list, observer) => {
+    for (const entry of list.getEntriesByName("first-contentful-paint")) {
+        observer.disconnect();
+        const params = new URLSearchParams({
+            fcp: entry.startTime.toFixed(1),
+            painted_at: (performance.timeOrigin + entry.startTime).toFixed(1),
+        });
+        fetch(`wemphix:api/newtab/paint?${params}`, { method: "POST" }).catch(() => {});
+    }
+}).observe({ type: "paint", buffered: true });